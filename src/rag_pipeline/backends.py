@@ -0,0 +1,92 @@
+"""
+Backend selection for the vector index (INDEX_BACKEND=qdrant|local).
+
+make_index() returns the ingest-side writer, make_search_client() the
+read-side client used by the service, eval and tools. Both backends share
+the same method names, so callers don't branch on the backend.
+"""
+import os
+from typing import TYPE_CHECKING, Any, Optional, Union
+
+from rag_pipeline.settings import InfraSettings
+
+# implementations are imported by the factories: only the backend in use
+# (and its numpy/httpx dependencies) gets loaded
+if TYPE_CHECKING:
+    from rag_pipeline.http.async_qdrant_http import AsyncQdrantHttp
+    from rag_pipeline.http.qdrant_http import QdrantHttp
+    from rag_pipeline.indexing.local_index import LocalIndex
+    from rag_pipeline.indexing.qdrant_index import QdrantIndex
+
+SearchClient = Union["QdrantHttp", "LocalIndex"]
+IndexWriter = Union["QdrantIndex", "LocalIndex"]
+
+
+def _check(infra: InfraSettings) -> None:
+    if infra.index_backend not in ("qdrant", "local"):
+        raise ValueError(f"INDEX_BACKEND must be 'qdrant' or 'local', got {infra.index_backend!r}")
+
+
+def make_index(infra: InfraSettings, **qdrant_kwargs: Any) -> IndexWriter:
+    _check(infra)
+    if infra.index_backend == "local":
+        from rag_pipeline.indexing.local_index import LocalIndex
+
+        return LocalIndex(infra.local_index_dir, infra.qdrant_collection)
+    from rag_pipeline.indexing.qdrant_index import QdrantIndex
+
+    return QdrantIndex(infra.qdrant_url, infra.qdrant_collection, **qdrant_kwargs)
+
+
+def make_search_client(infra: InfraSettings, **qdrant_kwargs: Any) -> SearchClient:
+    _check(infra)
+    if infra.index_backend == "local":
+        from rag_pipeline.indexing.local_index import LocalIndex
+
+        return LocalIndex(infra.local_index_dir, infra.qdrant_collection)
+    from rag_pipeline.http.qdrant_http import QdrantHttp
+
+    return QdrantHttp(infra.qdrant_url, **qdrant_kwargs)
+
+
+def make_async_search_client(infra: InfraSettings, **qdrant_kwargs: Any) -> Optional["AsyncQdrantHttp"]:
+    """
+    AsyncQdrantHttp configured from the QDRANT_* settings, or None for the
+    local backend (in-process; callers keep using the sync client).
+    """
+    _check(infra)
+    if infra.index_backend == "local":
+        return None
+    from rag_pipeline.http.async_qdrant_http import AsyncQdrantHttp
+
+    kwargs: Any = {
+        "http2": infra.qdrant_http2,
+        "keepalive_expiry_s": infra.qdrant_keepalive_s,
+        "breaker_failures": infra.qdrant_breaker_failures,
+        "breaker_reset_s": infra.qdrant_breaker_reset_s,
+        "hedge": infra.qdrant_hedge,
+        "hedge_min_delay_s": infra.qdrant_hedge_min_delay_ms / 1000.0,
+        "hedge_max_ratio": infra.qdrant_hedge_max_ratio,
+    }
+    kwargs.update(qdrant_kwargs)
+    return AsyncQdrantHttp(infra.qdrant_url, **kwargs)
+
+
+def chunk_store_path(infra: InfraSettings) -> str:
+    return os.path.join(infra.chunk_store_dir, infra.qdrant_collection)
+
+
+def chunk_shard_path(infra: InfraSettings, run_id: str, worker_id: str) -> str:
+    # distributed ingest: each worker writes its own store, merged at finalize
+    return os.path.join(chunk_store_path(infra), "shards", run_id, worker_id)
+
+
+def sparse_index_path(infra: InfraSettings, config_fingerprint: str) -> str:
+    # chunks depend on the pipeline config, so each fingerprint gets its own index
+    return os.path.join(infra.sparse_index_dir, infra.qdrant_collection, config_fingerprint[:16])
+
+
+def describe(infra: InfraSettings) -> str:
+    if infra.index_backend == "local":
+        return f"local:{infra.local_index_dir}"
+    return infra.qdrant_url
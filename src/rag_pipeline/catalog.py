@@ -0,0 +1,126 @@
+"""
+Per-collection document catalog: one small JSON file that ingest rewrites
+(atomically) from the state store at the end of every run, so listing
+docs never has to touch the vector index.
+
+reconcile() rebuilds the same view from the index itself, for when the
+catalog is missing or suspected stale: the UUID point-ID space is split
+into partitions that are scrolled in parallel, fetching only doc_id and
+file_name.
+"""
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from rag_pipeline.backends import SearchClient
+from rag_pipeline.manifest import utc_now_iso
+
+CATALOG_FIELDS = ("file_name", "chunks", "corpus_version", "ingested_at_utc", "partial")
+
+
+def catalog_path(ingested_dir: str, collection: str) -> str:
+    return os.path.join(ingested_dir, f"catalog_{collection}.json")
+
+
+def write_catalog(
+    path: str,
+    *,
+    collection: str,
+    config_fingerprint: str,
+    corpus_version: str,
+    docs: Dict[str, Dict[str, Any]],
+) -> None:
+    catalog = {
+        "collection": collection,
+        "config_fingerprint": config_fingerprint,
+        "corpus_version": corpus_version,
+        "updated_at_utc": utc_now_iso(),
+        "docs": {d: {k: doc.get(k) for k in CATALOG_FIELDS} for d, doc in docs.items()},
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def read_catalog(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def uuid_partitions(n: int) -> List[Tuple[Optional[str], Optional[str]]]:
+    """
+    n contiguous [start, end) ranges over the UUID space; None = open end.
+    Qdrant orders UUID point IDs by their 128-bit value, i.e. as lowercase hex.
+    """
+    n = max(1, n)
+    bounds = [str(uuid.UUID(int=(i << 128) // n)) for i in range(1, n)]
+    starts: List[Optional[str]] = [None] + list(bounds)
+    ends: List[Optional[str]] = list(bounds) + [None]
+    return list(zip(starts, ends))
+
+
+def _scroll_range(
+    client: SearchClient,
+    collection: str,
+    start: Optional[str],
+    end: Optional[str],
+    filter_payload: Optional[Dict[str, Any]],
+    page_size: int,
+) -> Dict[str, Dict[str, Any]]:
+    docs: Dict[str, Dict[str, Any]] = {}
+    offset: Any = start
+    while True:
+        points, offset = client.scroll(
+            collection=collection,
+            limit=page_size,
+            offset=offset,
+            filter_payload=filter_payload,
+            with_payload=["doc_id", "file_name"],
+            with_vectors=False,
+        )
+        for p in points:
+            if end is not None and str(p["id"]) >= end:
+                return docs
+            payload = p.get("payload") or {}
+            doc_id = payload.get("doc_id")
+            if not doc_id:
+                continue
+            d = docs.setdefault(doc_id, {"file_name": payload.get("file_name"), "chunks": 0})
+            d["chunks"] += 1
+        if offset is None or (end is not None and str(offset) >= end):
+            return docs
+
+
+def reconcile(
+    client: SearchClient,
+    collection: str,
+    *,
+    filter_payload: Optional[Dict[str, Any]] = None,
+    partitions: int = 8,
+    page_size: int = 1024,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    {doc_id: {"file_name", "chunks"}} straight from the index.
+    """
+    from rag_pipeline.indexing.local_index import LocalIndex
+
+    # LocalIndex scroll offsets are row numbers, not IDs: one sequential pass
+    ranges = uuid_partitions(1 if isinstance(client, LocalIndex) else partitions)
+    with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+        parts = list(pool.map(
+            lambda r: _scroll_range(client, collection, r[0], r[1], filter_payload, page_size), ranges
+        ))
+    docs: Dict[str, Dict[str, Any]] = {}
+    for part in parts:
+        for doc_id, d in part.items():
+            if doc_id in docs:
+                docs[doc_id]["chunks"] += d["chunks"]
+            else:
+                docs[doc_id] = d
+    return docs
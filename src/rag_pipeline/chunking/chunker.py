@@ -1,30 +1,250 @@
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
 
-def chunk_text(text: str, 
-               chunk_chars: int, 
-               overlap: int, 
+import numpy as np
+
+from rag_pipeline.metrics import METRICS
+from rag_pipeline.settings import enforce_hf_offline
+
+
+def iter_char_chunks(pages: Iterable[str], chunk_chars: int, overlap: int, max_chunks: int = 0) -> Iterator[str]:
+    """
+    chars_v1 over a stream of pages: the same chunks chunk_text() cuts from
+    the pages joined by blank lines, but only about one page plus one
+    window of text is held at a time, and no page after the last needed
+    chunk is pulled.
+    """
+    step = max(1, chunk_chars - overlap)
+    buf = ""
+    base = 0     # offset of buf[0] in the joined text
+    start = 0    # next window start
+    n = 0
+    for page in pages:
+        buf += ("\n\n" + page) if (buf or base) else page
+        # windows that end before the text seen so far are final
+        while base + len(buf) > start + chunk_chars:
+            c = buf[start - base: start - base + chunk_chars].strip()
+            if c:
+                yield c
+                n += 1
+            if max_chunks > 0 and n >= max_chunks:
+                return
+            start += step
+            if start - base > len(buf) // 2:
+                buf = buf[start - base:]
+                base = start
+
+    total = base + len(buf)
+    while start < total:
+        end = min(total, start + chunk_chars)
+        c = buf[start - base: end - base].strip()
+        if c:
+            yield c
+            n += 1
+        if end >= total:
+            break
+        if max_chunks > 0 and n >= max_chunks:
+            break
+        start += step
+
+
+def chunk_text(text: str,
+               chunk_chars: int,
+               overlap: int,
                max_chunks: int = 0) -> list[str]:
     if not text:
         return []
-    
-    step = max(1, chunk_chars - overlap)
-    chunks: list[str] = []
+    return list(iter_char_chunks([text], chunk_chars, overlap, max_chunks))
 
-    for start in range(0, len(text), step):
-        end = min(len(text), start + chunk_chars)
-        c = text[start: end].strip()
 
-        if c:
-            chunks.append(c)
+# sentence ends, plus the paragraph breaks the PDF loader puts between pages
+_SENT_BREAK = re.compile(r"(?<=[.!?])\s+|\n\n")
 
-        if end >= len(text):
-            break
+_TOKENIZERS: Dict[str, Any] = {}
 
-        if max_chunks > 0 and len(chunks) >= max_chunks:
-            break
 
-    return chunks
-    
+@dataclass(frozen=True)
+class ChunkingSpec:
+    """
+    Everything extract workers need to chunk a document (picklable).
+
+    chars_v1  - fixed chunk_chars windows with `overlap` characters shared
+    tokens_v1 - sentence-packed windows of at most max_tokens word-pieces of
+                `tokenizer`, overlap_tokens shared; token IDs are kept so
+                the embedder does not tokenize the text again
+    """
+    version: str = "chars_v1"
+    chunk_chars: int = 1200
+    overlap: int = 200
+    max_chunks: int = 0
+    tokenizer: str = ""
+    max_tokens: int = 0
+    overlap_tokens: int = 0
+    hf_cache_dir: str = ""     # load the tokenizer from here, offline
+
 
+def get_tokenizer(name: str, hf_cache_dir: str = "") -> Any:
+    # one fast tokenizer per process; extract workers load it on first use
+    tok = _TOKENIZERS.get(name)
+    if tok is None:
+        enforce_hf_offline(hf_cache_dir)
+        from transformers import AutoTokenizer
+        kw = {"cache_dir": hf_cache_dir, "local_files_only": True} if hf_cache_dir else {}
+        tok = AutoTokenizer.from_pretrained(name, use_fast=True, **kw)
+        _TOKENIZERS[name] = tok
+    return tok
 
 
+def _sentence_spans(text: str, starts: np.ndarray, n_tokens: int, max_tokens: int) -> List[Tuple[int, int]]:
+    """
+    [start, end) token ranges, one per sentence; sentences longer than
+    max_tokens are cut into max_tokens pieces.
+    """
+    cuts = np.searchsorted(starts, [m.end() for m in _SENT_BREAK.finditer(text)])
+    bounds = np.unique(np.concatenate(([0], cuts, [n_tokens])))
+    spans: List[Tuple[int, int]] = []
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        for s in range(int(a), int(b), max_tokens):
+            spans.append((s, min(int(b), s + max_tokens)))
+    return spans
+
+
+@dataclass
+class _Unit:
+    # one sentence (or max_tokens piece of one) at [c0, c1) of the joined text
+    c0: int
+    c1: int
+    ids: List[int]
+
+
+def iter_token_chunks(
+    pages: Iterable[str],
+    tokenizer: Any,
+    max_tokens: int,
+    overlap_tokens: int,
+    max_chunks: int = 0,
+) -> Iterator[Tuple[str, List[int]]]:
+    """
+    Pack whole sentences into chunks of at most max_tokens tokens (no
+    special tokens), repeating up to overlap_tokens worth of trailing
+    sentences at the start of the next chunk. Each page is tokenized once,
+    as it arrives; chunk text is cut from the pages by the tokenizer's
+    offsets, so page breaks inside a chunk read as blank lines.
+
+    Yields (chunk text, token IDs).
+    """
+    max_tokens = max(1, max_tokens)
+    buf = ""
+    base = 0
+    pending: Deque[_Unit] = deque()
+    n = 0
+
+    def pack(final: bool) -> Iterator[Tuple[str, List[int]]]:
+        nonlocal buf, base, n
+        while pending:
+            k = total = 0
+            while k < len(pending) and total + len(pending[k].ids) <= max_tokens:
+                total += len(pending[k].ids)
+                k += 1
+            if k == len(pending) and not final:
+                return  # the next page may still fit in this chunk
+            units = [pending[i] for i in range(k)]
+            c = buf[units[0].c0 - base: units[-1].c1 - base].strip()
+            if c:
+                yield c, [t for u in units for t in u.ids]
+                n += 1
+            if k == len(pending) or (max_chunks > 0 and n >= max_chunks):
+                pending.clear()
+                return
+
+            # step back over trailing sentences that fit in the overlap budget,
+            # but always make progress past the chunk's first sentence
+            j, tail = k, 0
+            while j - 1 > 0 and tail + len(units[j - 1].ids) <= overlap_tokens:
+                tail += len(units[j - 1].ids)
+                j -= 1
+            for _ in range(j):
+                pending.popleft()
+            if pending[0].c0 - base > len(buf) // 2:
+                buf = buf[pending[0].c0 - base:]
+                base = pending[0].c0
+
+    for page in pages:
+        if buf or base:
+            buf += "\n\n"
+        page_at = base + len(buf)
+        buf += page
+        enc = tokenizer(page, add_special_tokens=False, return_offsets_mapping=True,
+                        return_attention_mask=False, verbose=False)
+        ids: List[int] = enc["input_ids"]
+        offsets: List[Tuple[int, int]] = enc["offset_mapping"]
+        if ids:
+            starts = np.fromiter((s for s, _ in offsets), dtype=np.int64, count=len(offsets))
+            for a, b in _sentence_spans(page, starts, len(ids), max_tokens):
+                pending.append(_Unit(page_at + offsets[a][0], page_at + offsets[b - 1][1], ids[a:b]))
+        yield from pack(final=False)
+        if max_chunks > 0 and n >= max_chunks:
+            return
+    yield from pack(final=True)
+
+
+def chunk_tokens(
+    text: str,
+    tokenizer: Any,
+    max_tokens: int,
+    overlap_tokens: int,
+    max_chunks: int = 0,
+) -> Tuple[List[str], List[List[int]]]:
+    """
+    Returns (chunk texts, token IDs per chunk); see iter_token_chunks.
+    """
+    chunks: List[str] = []
+    chunk_ids: List[List[int]] = []
+    if text:
+        for c, ids in iter_token_chunks([text], tokenizer, max_tokens, overlap_tokens, max_chunks):
+            chunks.append(c)
+            chunk_ids.append(ids)
+    return chunks, chunk_ids
+
+
+def chunk_pages(pages: Iterable[str], spec: ChunkingSpec) -> Tuple[List[str], Optional[List[List[int]]]]:
+    """
+    Chunk a stream of page texts as they arrive. Stops pulling pages once
+    spec.max_chunks chunks are cut.
+    """
+    pulled = 0.0   # time spent producing pages, not chunking
+
+    def timed(it: Iterable[str]) -> Iterator[str]:
+        nonlocal pulled
+        it = iter(it)
+        while True:
+            t0 = time.perf_counter()
+            page = next(it, None)
+            pulled += time.perf_counter() - t0
+            if page is None:
+                return
+            yield page
+
+    t0 = time.perf_counter()
+    chunk_ids: Optional[List[List[int]]] = None
+    if spec.version == "tokens_v1":
+        chunks: List[str] = []
+        chunk_ids = []
+        for c, ids in iter_token_chunks(timed(pages), get_tokenizer(spec.tokenizer, spec.hf_cache_dir),
+                                        spec.max_tokens, spec.overlap_tokens, spec.max_chunks):
+            chunks.append(c)
+            chunk_ids.append(ids)
+    elif spec.version == "chars_v1":
+        chunks = list(iter_char_chunks(timed(pages), spec.chunk_chars, spec.overlap, spec.max_chunks))
+    else:
+        raise ValueError(f"unknown chunker_version {spec.version!r}")
+    METRICS.observe("rag_chunk_doc_seconds", time.perf_counter() - t0 - pulled, version=spec.version)
+    METRICS.inc("rag_chunks_total", len(chunks), version=spec.version)
+    return chunks, chunk_ids
+
 
+def chunk_document(text: str, spec: ChunkingSpec) -> Tuple[List[str], Optional[List[List[int]]]]:
+    return chunk_pages([text] if text else [], spec)
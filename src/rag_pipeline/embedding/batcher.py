@@ -0,0 +1,110 @@
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+from rag_pipeline.embedding.embedder import Embedder
+
+T = TypeVar("T")
+
+
+@dataclass
+class _PendingDoc(Generic[T]):
+    item: T
+    vectors: np.ndarray
+    remaining: int
+
+
+class StreamingBatcher(Generic[T]):
+    """
+    Packs chunks from many documents into full, length-sorted embedding batches.
+
+    add() queues a document's chunks and returns the documents whose vectors
+    are all computed, in the order they were added, each with a float32
+    (n_chunks, dim) matrix in chunk_index order. Chunks are taken FIFO in
+    whole batches once window_batches * batch_size are queued; flush()
+    drains the tail. Chunks that come with token IDs (tokens_v1) are
+    embedded from those instead of being tokenized again.
+    """
+    def __init__(self, embedder: Embedder, batch_size: int, window_batches: int = 8) -> None:
+        self.embedder = embedder
+        self.batch_size = max(1, batch_size)
+        self.window = self.batch_size * max(1, window_batches)
+        self.dim = embedder.dim
+
+        self._docs: Dict[int, _PendingDoc[T]] = {}
+        self._order: Deque[int] = deque()
+        # (slot, chunk_index, text, token_ids or None)
+        self._queue: Deque[Tuple[int, int, str, Optional[Sequence[int]]]] = deque()
+        self._next_slot = 0
+
+        self.batches = 0
+        self.chunks = 0
+        self.encode_s = 0.0
+
+    def add(
+        self,
+        item: T,
+        chunks: List[str],
+        token_ids: Optional[List[List[int]]] = None,
+    ) -> List[Tuple[T, np.ndarray]]:
+        slot = self._next_slot
+        self._next_slot += 1
+        vectors = np.empty((len(chunks), self.dim), dtype=np.float32)
+        self._docs[slot] = _PendingDoc(item=item, vectors=vectors, remaining=len(chunks))
+        self._order.append(slot)
+        for idx, chunk in enumerate(chunks):
+            self._queue.append((slot, idx, chunk, token_ids[idx] if token_ids is not None else None))
+
+        if len(self._queue) >= self.window:
+            self._run(len(self._queue) - len(self._queue) % self.batch_size)
+        return self._pop_ready()
+
+    def flush(self) -> List[Tuple[T, np.ndarray]]:
+        self._run(len(self._queue))
+        return self._pop_ready()
+
+    def _run(self, n: int) -> None:
+        if n <= 0:
+            return
+        work = [self._queue.popleft() for _ in range(n)]
+        # similar lengths in one batch -> less padding per forward pass
+        work.sort(key=lambda w: len(w[3]) if w[3] is not None else len(w[2]))
+
+        batches = [work[i : i + self.batch_size] for i in range(0, len(work), self.batch_size)]
+        t0 = time.time()
+        # all batches at once, so an embedding pool can run them in parallel
+        results = self.embedder.encode_many([
+            ([w[2] for w in batch],
+             [w[3] for w in batch] if all(w[3] is not None for w in batch) else None)  # type: ignore[misc]
+            for batch in batches
+        ])
+        self.encode_s += time.time() - t0
+        self.batches += len(batches)
+        self.chunks += len(work)
+
+        for batch, vecs in zip(batches, results):
+            for (slot, idx, _, _), vec in zip(batch, vecs):
+                doc = self._docs[slot]
+                doc.vectors[idx] = vec
+                doc.remaining -= 1
+
+    def _pop_ready(self) -> List[Tuple[T, np.ndarray]]:
+        ready: List[Tuple[T, np.ndarray]] = []
+        while self._order and self._docs[self._order[0]].remaining == 0:
+            doc = self._docs.pop(self._order.popleft())
+            ready.append((doc.item, doc.vectors))
+        return ready
+
+    def stats(self) -> Dict[str, Any]:
+        fill = self.chunks / (self.batches * self.batch_size) if self.batches else 0.0
+        return {
+            "batch_size": self.batch_size,
+            "batches": self.batches,
+            "chunks": self.chunks,
+            "batch_fill": round(fill, 4),
+            "encode_seconds": round(self.encode_s, 3),
+            "chunks_per_s": round(self.chunks / self.encode_s, 2) if self.encode_s > 0 else 0.0,
+        }
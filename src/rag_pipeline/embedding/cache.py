@@ -0,0 +1,268 @@
+import fcntl
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Content-addressed on-disk embedding cache.
+
+    One namespace per (model, normalize, backend variant); inside it vectors
+    live in a memory-mapped float32 matrix (vectors.f32) and index.json maps
+    sha256(chunk text) -> [row, last_used]. Least recently used entries are
+    evicted in blocks once max_entries is reached.
+
+    A row freed by eviction is only reused after the index without it has
+    been written, so a crash never leaves the on-disk index pointing at a
+    row that holds another text's vector.
+
+    Several processes may share a namespace (distributed ingest workers on
+    one host). Rows are reserved, evicted and the index written under an
+    exclusive flock on the namespace's lock file; the file size of
+    vectors.f32 is the shared high-water mark, and save() merges entries
+    other processes wrote since this one last read the index. Each row also
+    carries a tag of the key it holds (tags.u64): an entry whose row another
+    process has since reused no longer matches its tag and is a miss.
+    """
+    _GROW_ROWS = 4096
+    _EVICT_FRACTION = 0.1
+
+    def __init__(self, cache_dir: str, model_name: str, normalize: bool, dim: int, max_entries: int,
+                 variant: str = "") -> None:
+        # variant "" (torch fp32) keeps the namespace caches had before backends existed
+        ns_key = f"{model_name}|normalize={normalize}" + (f"|backend={variant}" if variant else "")
+        ns = hashlib.sha256(ns_key.encode("utf-8")).hexdigest()[:16]
+        self.dir = os.path.join(cache_dir, ns)
+        os.makedirs(self.dir, exist_ok=True)
+        self.model_name = model_name
+        self.normalize = normalize
+        self.variant = variant
+        self.dim = dim
+        self.max_entries = max(1, max_entries)
+
+        self._vec_path = os.path.join(self.dir, "vectors.f32")
+        self._tag_path = os.path.join(self.dir, "tags.u64")
+        self._idx_path = os.path.join(self.dir, "index.json")
+        self._lock_path = os.path.join(self.dir, "lock")
+
+        self._entries: Dict[str, List[int]] = {}
+        self._clock = 0
+        self._free: List[int] = []
+        self._stamp: Optional[Tuple[int, int]] = None   # index.json as last read or written here
+
+        self._mm = None
+        self._tags = None
+        self._capacity = 0
+        with self._locked():
+            untagged = not os.path.exists(self._tag_path)
+            self._load_index()
+            self._open(max([self._disk_rows()] + [row + 1 for row, _ in self._entries.values()]))
+            if untagged:
+                # cache written before rows were tagged
+                for k, (row, _) in self._entries.items():
+                    self._tags[row] = self._tag(k)
+
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    # ---- persistence ----
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _disk_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self._idx_path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _disk_rows(self) -> int:
+        return os.path.getsize(self._vec_path) // (4 * self.dim) if os.path.exists(self._vec_path) else 0
+
+    def _read_index(self) -> Optional[Dict[str, Any]]:
+        stamp = self._disk_stamp()
+        if stamp is None:
+            return None
+        with open(self._idx_path, "r", encoding="utf-8") as f:
+            idx = json.load(f)
+        self._stamp = stamp
+        if idx.get("dim") != self.dim:
+            # different model head -> start over
+            return None
+        return idx
+
+    def _load_index(self) -> None:
+        idx = self._read_index()
+        if idx is not None:
+            self._entries = {k: list(v) for k, v in idx.get("entries", {}).items()}
+            self._clock = int(idx.get("clock", 0))
+        # every row of vectors.f32 the index doesn't reference is free: eviction
+        # holes, and rows filled after the last save by a run that crashed
+        used = {row for row, _ in self._entries.values()}
+        self._free = [r for r in range(self._disk_rows()) if r not in used]
+
+    def _merge_index(self) -> None:
+        # caller holds the lock: pick up what other processes saved since
+        if self._disk_stamp() == self._stamp:
+            return
+        idx = self._read_index()
+        if idx is None:
+            return
+        mine: Set[int] = {row for row, _ in self._entries.values()}
+        mine.update(self._free)
+        for k, (row, used) in idx.get("entries", {}).items():
+            e = self._entries.get(k)
+            if e is not None:
+                e[1] = max(e[1], used)
+            elif row not in mine:
+                self._entries[k] = [row, used]
+                mine.add(row)
+        self._clock = max(self._clock, int(idx.get("clock", 0)))
+        if mine and max(mine) >= self._capacity:
+            self._open(self._disk_rows())
+
+    def _open(self, rows: int) -> None:
+        for mm in (self._mm, self._tags):
+            if mm is not None:
+                mm.flush()
+        self._mm = self._tags = None
+        rows = max(rows, 1)
+        for path, width in ((self._vec_path, 4 * self.dim), (self._tag_path, 8)):
+            with open(path, "ab") as f:
+                if f.tell() < rows * width:
+                    f.truncate(rows * width)
+        self._mm = np.memmap(self._vec_path, dtype=np.float32, mode="r+", shape=(rows, self.dim))
+        self._tags = np.memmap(self._tag_path, dtype=np.uint64, mode="r+", shape=(rows,))
+        self._capacity = rows
+
+    def save(self) -> None:
+        with self._locked():
+            self._save()
+
+    def _save(self) -> None:
+        # caller holds the lock
+        self._merge_index()
+        if self._mm is not None:
+            self._mm.flush()
+            self._tags.flush()
+        tmp = f"{self._idx_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "model": self.model_name,
+                "normalize": self.normalize,
+                "variant": self.variant,
+                "dim": self.dim,
+                "rows": self._capacity,
+                "clock": self._clock,
+                "entries": self._entries,
+            }, f, separators=(",", ":"))
+        os.replace(tmp, self._idx_path)
+        self._stamp = self._disk_stamp()
+
+    # ---- lookup / insert ----
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _tag(key: str) -> int:
+        return int(key[:16], 16) or 1
+
+    def _valid(self, key: str) -> bool:
+        e = self._entries.get(key)
+        return e is not None and int(self._tags[e[0]]) == self._tag(key)
+
+    def get_many(self, keys: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (vectors, hit_mask); rows for misses are left as zeros.
+        """
+        out = np.zeros((len(keys), self.dim), dtype=np.float32)
+        hit = np.zeros(len(keys), dtype=bool)
+        self._clock += 1
+        for i, k in enumerate(keys):
+            e = self._entries.get(k)
+            if e is None:
+                continue
+            out[i] = self._mm[e[0]]
+            # the tag is checked after the copy: a writer clears it first
+            if int(self._tags[e[0]]) != self._tag(k):
+                out[i] = 0.0
+                del self._entries[k]
+                continue
+            e[1] = self._clock
+            hit[i] = True
+        n_hit = int(hit.sum())
+        self.hits += n_hit
+        self.misses += len(keys) - n_hit
+        return out, hit
+
+    def put_many(self, keys: List[str], vectors: np.ndarray) -> None:
+        new = [(k, v) for k, v in zip(keys, vectors) if not self._valid(k)]
+        if not new:
+            return
+        with self._locked():
+            for k, v in new:
+                if self._valid(k):
+                    continue
+                row = self._alloc_row()
+                if row is None:
+                    return   # every row is held by another process's unsaved inserts
+                self._tags[row] = 0
+                self._mm[row] = v
+                self._tags[row] = self._tag(k)
+                self._entries[k] = [row, self._clock]
+
+    def _alloc_row(self) -> Optional[int]:
+        # caller holds the lock
+        if not self._free:
+            self._reserve()
+        return self._free.pop() if self._free else None
+
+    def _reserve(self) -> None:
+        # rows past the end of vectors.f32 belong to whoever extends the file
+        disk = max(self._disk_rows(), self._capacity)
+        if disk >= self.max_entries:
+            self._evict()
+            return
+        n = min(self._GROW_ROWS, self.max_entries - disk)
+        self._open(disk + n)
+        self._free.extend(range(disk + n - 1, disk - 1, -1))
+
+    def _evict(self) -> None:
+        self._merge_index()
+        n = max(1, int(len(self._entries) * self._EVICT_FRACTION))
+        victims = sorted(self._entries.items(), key=lambda kv: kv[1][1])[:n]
+        rows = []
+        for k, (row, _) in victims:
+            del self._entries[k]
+            rows.append(row)
+        # persist the index without the victims before their rows are overwritten
+        self._free.extend(rows)
+        self._save()
+        self.evicted += len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "dir": self.dir,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evicted": self.evicted,
+        }
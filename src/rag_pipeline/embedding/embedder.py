@@ -1,23 +1,271 @@
-from typing import List
-from sentence_transformers import SentenceTransformer
+import threading
+import time
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from rag_pipeline.embedding.cache import EmbeddingCache
+from rag_pipeline.embedding.pool import Batch, EmbedPool
+from rag_pipeline.metrics import METRICS
+from rag_pipeline.settings import enforce_hf_offline
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+# torch       - the model as published (fp32)
+# torch_int8  - torch with Linear layers dynamically quantized to int8 (CPU)
+# onnx        - ONNX Runtime on CPU; onnx_file picks a pre-exported variant
+BACKENDS = ("torch", "torch_int8", "onnx")
+
+
+def backend_variant(backend: str, onnx_file: str = "") -> str:
+    """
+    Short name for what produces the vectors, "" for the default torch fp32.
+    Used as the embedding cache namespace suffix.
+    """
+    if backend == "torch":
+        return ""
+    if backend == "onnx" and onnx_file:
+        return f"onnx:{onnx_file}"
+    return backend
+
+
+def load_model(model_name: str, backend: str = "torch", onnx_file: str = "",
+               hf_cache_dir: Optional[str] = None, threads: int = 0) -> "SentenceTransformer":
+    """
+    With hf_cache_dir set the model is read from that cache only, never
+    downloaded. torch and sentence_transformers are imported here, on the
+    first load, not with the package. threads > 0 caps the ONNX Runtime
+    session's intra-op threads (torch threads are set by the caller).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"embedding.backend must be one of {BACKENDS}, got {backend!r}")
+    enforce_hf_offline(hf_cache_dir or "")
+    from sentence_transformers import SentenceTransformer
+
+    kw = {"cache_folder": hf_cache_dir, "local_files_only": True} if hf_cache_dir else {}
+    if backend == "onnx":
+        model_kwargs = {"provider": "CPUExecutionProvider"}
+        if onnx_file:
+            model_kwargs["file_name"] = onnx_file
+        if threads > 0:
+            import onnxruntime
+
+            opts = onnxruntime.SessionOptions()
+            opts.intra_op_num_threads = threads
+            opts.inter_op_num_threads = 1
+            model_kwargs["session_options"] = opts
+        return SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs, **kw)
+    if backend == "torch_int8":
+        import torch
+
+        model = SentenceTransformer(model_name, device="cpu", **kw)
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return SentenceTransformer(model_name, **kw)
 
 
 class Embedder:
-    def __init__(self, model_name: str, batch_size: int, normalize: bool) -> None:
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int,
+        normalize: bool,
+        cache_dir: Optional[str] = None,
+        cache_max_entries: int = 0,
+        backend: str = "torch",
+        onnx_file: str = "",
+        hf_cache_dir: Optional[str] = None,
+        workers: int = 0,
+        threads_per_worker: int = 0,
+        threads: int = 0,
+    ) -> None:
         self.model_name = model_name
         self.batch_size = batch_size
         self.normalize = normalize
-        self.model = SentenceTransformer(model_name)
+        self.backend = backend
+        self.variant = backend_variant(backend, onnx_file)
+        self.load_s = 0.0
+
+        # the model (and the cache, which needs its dim) load on first use
+        self._load_args = (model_name, backend, onnx_file, hf_cache_dir, threads)
+        self._cache_args = (cache_dir, cache_max_entries)
+        self._model: Optional["SentenceTransformer"] = None
+        self._cache: Optional[EmbeddingCache] = None
+        self._load_lock = threading.Lock()
+
+        # workers > 0: chunks are embedded by a process pool whose workers
+        # report dim/max_tokens, so no model is loaded here
+        self.pool: Optional[EmbedPool] = None
+        if workers > 0:
+            self.pool = EmbedPool(model_name, batch_size, normalize, workers=workers,
+                                  threads_per_worker=threads_per_worker, backend=backend,
+                                  onnx_file=onnx_file, hf_cache_dir=hf_cache_dir)
+            self._open_cache(self.pool.dim)
+
+    def _open_cache(self, dim: int) -> None:
+        cache_dir, cache_max_entries = self._cache_args
+        if cache_dir and cache_max_entries > 0:
+            self._cache = EmbeddingCache(cache_dir, self.model_name, self.normalize, dim, cache_max_entries,
+                                         variant=self.variant)
+
+    def _load(self) -> None:
+        with self._load_lock:
+            if self._model is not None:
+                return
+            t0 = time.perf_counter()
+            model = load_model(*self._load_args)
+            if self.pool is None:
+                self._open_cache(model.get_sentence_embedding_dimension())
+            self.load_s = time.perf_counter() - t0
+            self._model = model  # last: readers check it without the lock
+
+    @property
+    def model(self) -> "SentenceTransformer":
+        if self._model is None:
+            self._load()
+        return self._model  # type: ignore[return-value]
+
+    @property
+    def cache(self) -> Optional[EmbeddingCache]:
+        if self._model is None and self.pool is None:
+            self._load()
+        return self._cache
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def warm_up(self, background: bool = False) -> None:
+        """
+        Load the model and embed one short text, so the first real query
+        pays for neither. With background=True this returns at once and a
+        first encode() waits for the load in progress.
+        """
+        if background:
+            threading.Thread(target=self.warm_up, name="embedder-warm-up", daemon=True).start()
+            return
+        self._encode_model(["warm up"])
 
     @property
     def dim(self) -> int:
+        if self.pool is not None:
+            return self.pool.dim
         return self.model.get_sentence_embedding_dimension()
 
-    def encode(self, texts: List[str]) -> List[List[float]]:
-        vecs = self.model.encode(
+    @property
+    def max_tokens(self) -> int:
+        # longest chunk (in tokens, without [CLS]/[SEP]) the model embeds untruncated
+        if self.pool is not None:
+            return self.pool.max_tokens
+        return int(self.model.max_seq_length) - self.model.tokenizer.num_special_tokens_to_add(pair=False)
+
+    def _encode_model(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
             texts,
             batch_size=self.batch_size,
-            show_progress_bar=True,
+            show_progress_bar=False,
             normalize_embeddings=self.normalize,
-        )
-        return [v.tolist() for v in vecs]
+            convert_to_numpy=True,
+        ).astype(np.float32, copy=False)
+
+    def _encode_ids(self, token_ids: Sequence[Sequence[int]]) -> np.ndarray:
+        """
+        Same as _encode_model for text the chunker already tokenized with
+        this model's tokenizer: only special tokens and padding are added.
+        """
+        if not len(token_ids):
+            return np.empty((0, self.dim), dtype=np.float32)
+        import torch
+
+        tok = self.model.tokenizer
+        device = self.model.device
+        pad_id = tok.pad_token_id or 0
+        limit = self.max_tokens
+        out: List[np.ndarray] = []
+        for i in range(0, len(token_ids), self.batch_size):
+            seqs = [tok.build_inputs_with_special_tokens(list(ids[:limit]))
+                    for ids in token_ids[i : i + self.batch_size]]
+            input_ids = torch.full((len(seqs), max(len(s) for s in seqs)), pad_id, dtype=torch.long)
+            attention_mask = torch.zeros_like(input_ids)
+            for row, seq in enumerate(seqs):
+                input_ids[row, : len(seq)] = torch.tensor(seq, dtype=torch.long)
+                attention_mask[row, : len(seq)] = 1
+            features = {"input_ids": input_ids.to(device), "attention_mask": attention_mask.to(device)}
+            if "token_type_ids" in tok.model_input_names:
+                features["token_type_ids"] = torch.zeros_like(features["input_ids"])
+            with torch.inference_mode():
+                emb = self.model(features)["sentence_embedding"]
+                if self.normalize:
+                    emb = torch.nn.functional.normalize(emb, p=2, dim=1)
+            out.append(emb.float().cpu().numpy())
+        return np.concatenate(out).astype(np.float32, copy=False)
+
+    def _encode_uncached(self, texts: List[str], token_ids: Optional[Sequence[Sequence[int]]]) -> np.ndarray:
+        if token_ids is not None:
+            return self._encode_ids(token_ids)
+        return self._encode_model(texts)
+
+    def encode(self, texts: List[str], token_ids: Optional[Sequence[Sequence[int]]] = None) -> np.ndarray:
+        """
+        Returns a (len(texts), dim) float32 matrix. token_ids, when given,
+        are the texts' tokens (no special tokens) and are embedded directly;
+        the texts are then only used as cache keys.
+        """
+        return self.encode_many([(texts, token_ids)])[0]
+
+    def encode_many(self, batches: List[Batch]) -> List[np.ndarray]:
+        """
+        encode() for several batches at once. Cache misses from all of them
+        are re-batched by batch_size and, with a worker pool, embedded in
+        parallel. Results come back in input order.
+        """
+        out: List[np.ndarray] = []
+        miss_texts: List[str] = []
+        miss_ids: List[Optional[Sequence[int]]] = []
+        miss_at: List[Tuple[int, int]] = []   # (batch, row) of each miss
+        miss_keys: List[str] = []
+        for b, (texts, token_ids) in enumerate(batches):
+            cache = self.cache
+            if cache is None:
+                vecs = np.zeros((len(texts), self.dim), dtype=np.float32)
+                rows = range(len(texts))
+            else:
+                keys = [cache.key(t) for t in texts]
+                vecs, hit = cache.get_many(keys)
+                rows = np.flatnonzero(~hit)
+                METRICS.inc("rag_embed_cache_hits_total", int(hit.sum()))
+                miss_keys.extend(keys[i] for i in rows)
+            for i in rows:
+                miss_texts.append(texts[i])
+                miss_ids.append(token_ids[i] if token_ids is not None else None)
+                miss_at.append((b, int(i)))
+            out.append(vecs)
+        if not miss_texts:
+            return out
+
+        use_ids = all(ids is not None for ids in miss_ids)
+        work: List[Batch] = [
+            (miss_texts[i : i + self.batch_size], miss_ids[i : i + self.batch_size] if use_ids else None)  # type: ignore[misc]
+            for i in range(0, len(miss_texts), self.batch_size)
+        ]
+        if self.pool is not None:
+            with METRICS.timer("rag_embed_batch_seconds", backend=self.backend, mode="pool"):
+                fresh = np.concatenate(self.pool.map(work))
+        else:
+            parts = []
+            for t, ids in work:
+                with METRICS.timer("rag_embed_batch_seconds", backend=self.backend, mode="local"):
+                    parts.append(self._encode_uncached(t, ids))
+            fresh = np.concatenate(parts)
+        METRICS.inc("rag_embed_chunks_total", len(miss_texts), backend=self.backend)
+        for (b, i), vec in zip(miss_at, fresh):
+            out[b][i] = vec
+        if self.cache is not None:
+            self.cache.put_many(miss_keys, fresh)
+        return out
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.close()
+        if self._cache is not None:
+            self._cache.save()
@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# (texts, token_ids or None) - one embedding batch
+Batch = Tuple[List[str], Optional[Sequence[Sequence[int]]]]
+
+_worker_embedder: Any = None
+
+
+def _init_worker(model_name: str, batch_size: int, normalize: bool, backend: str, onnx_file: str,
+                 hf_cache_dir: Optional[str], threads: int) -> None:
+    # before torch / onnxruntime load: their OpenMP pools read it at start
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    import torch
+
+    from rag_pipeline.embedding.embedder import Embedder
+
+    global _worker_embedder
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # already set in this process
+    _worker_embedder = Embedder(model_name, batch_size, normalize, backend=backend,
+                                onnx_file=onnx_file, hf_cache_dir=hf_cache_dir, threads=threads)
+    _worker_embedder.warm_up()
+
+
+def _ready() -> Tuple[int, int]:
+    return _worker_embedder.dim, _worker_embedder.max_tokens
+
+
+def _encode(texts: List[str], token_ids: Optional[Sequence[Sequence[int]]]) -> np.ndarray:
+    return _worker_embedder.encode(texts, token_ids)
+
+
+class EmbedPool:
+    """
+    Worker processes that each hold their own copy of the model, pinned to
+    threads_per_worker torch (or ONNX Runtime intra-op) threads. map()
+    spreads batches over them and returns the vectors in input order. Any
+    failure shuts the whole pool down before it is re-raised; a broken pool
+    is not reused.
+    """
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int,
+        normalize: bool,
+        *,
+        workers: int,
+        threads_per_worker: int = 0,
+        backend: str = "torch",
+        onnx_file: str = "",
+        hf_cache_dir: Optional[str] = None,
+    ) -> None:
+        self.workers = max(1, workers)
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // self.workers)
+        self.batches = 0
+        # spawn: the parent has torch loaded, forking it is not safe
+        self._pool: Optional[ProcessPoolExecutor] = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, batch_size, normalize, backend, onnx_file, hf_cache_dir,
+                      self.threads_per_worker),
+        )
+        # start every worker and load its model now: a model that cannot be
+        # loaded fails here, not halfway through a run. The workers' answer
+        # stands in for the model in the parent (dim, max_tokens).
+        try:
+            ready = [self._pool.submit(_ready) for _ in range(self.workers)]
+            self.dim, self.max_tokens = [f.result() for f in ready][0]
+        except BaseException:
+            self.close()
+            raise
+
+    def map(self, batches: List[Batch]) -> List[np.ndarray]:
+        if self._pool is None:
+            raise RuntimeError("embedding pool is closed")
+        futures: List[Future] = [self._pool.submit(_encode, texts, ids) for texts, ids in batches]
+        try:
+            out = [f.result() for f in futures]
+        except BaseException:
+            for f in futures:
+                f.cancel()
+            self.close()
+            raise
+        self.batches += len(batches)
+        return out
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "threads_per_worker": self.threads_per_worker,
+            "batches": self.batches,
+        }
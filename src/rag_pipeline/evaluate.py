@@ -0,0 +1,287 @@
+"""
+Retrieval evaluation + latency benchmark.
+
+Reads EVAL_DIR/queries.jsonl ({"qid", "query"}) and EVAL_DIR/labels.jsonl
+({"qid", "doc_id"}, one line per relevant doc), then:
+  - quality: doc-level recall@k and MRR (chunk hits are collapsed to docs)
+  - latency: per-stage encode/search percentiles and QPS at each
+    concurrency level in EVAL_CONCURRENCY
+  - the same again in hybrid mode (BM25 + dense, RRF) when ingest has
+    built a sparse index, with dense/sparse/fetch/fuse stage timings
+and writes RUNS_DIR/eval_<run_id>.json next to the ingest manifests.
+"""
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from rag_pipeline.embedding.embedder import Embedder
+from rag_pipeline.backends import SearchClient, describe, make_search_client
+from rag_pipeline.logging_setup import log, setup_logging
+from rag_pipeline.manifest import utc_now_iso, write_json
+from rag_pipeline.profiling import RunProfiler, profile_run
+from rag_pipeline.retrieval.cache import latest_corpus_version
+from rag_pipeline.retrieval.hybrid import HybridSearcher, open_hybrid
+from rag_pipeline.retrieval.search import HIT_FIELDS, corpus_filter
+from rag_pipeline.settings import InfraSettings, load_pipeline_config
+from rag_pipeline.stats import LatencyWindow
+from rag_pipeline.versioning import config_fingerprint
+
+
+def _read_jsonl(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_eval_set(eval_dir: str) -> Tuple[List[Tuple[str, str]], Dict[str, Set[str]]]:
+    queries = [(str(r["qid"]), str(r["query"])) for r in _read_jsonl(os.path.join(eval_dir, "queries.jsonl"))]
+    labels: Dict[str, Set[str]] = defaultdict(set)
+    for r in _read_jsonl(os.path.join(eval_dir, "labels.jsonl")):
+        ids = r.get("doc_ids") or [r["doc_id"]]
+        labels[str(r["qid"])].update(str(d) for d in ids)
+    return queries, labels
+
+
+def rank_docs(hits: List[Dict[str, Any]]) -> List[str]:
+    """
+    Chunk hits -> doc_ids in first-seen order.
+    """
+    seen: Set[str] = set()
+    docs: List[str] = []
+    for h in hits:
+        d = (h.get("payload") or {}).get("doc_id")
+        if d and d not in seen:
+            seen.add(d)
+            docs.append(d)
+    return docs
+
+
+def quality_metrics(ranked: Dict[str, List[str]], labels: Dict[str, Set[str]], ks: List[int]) -> Dict[str, Any]:
+    judged = [qid for qid in ranked if labels.get(qid)]
+    recall = {k: 0.0 for k in ks}
+    mrr = 0.0
+    for qid in judged:
+        rel = labels[qid]
+        docs = ranked[qid]
+        for k in ks:
+            recall[k] += len(rel.intersection(docs[:k])) / len(rel)
+        for rank, d in enumerate(docs, 1):
+            if d in rel:
+                mrr += 1.0 / rank
+                break
+    n = max(1, len(judged))
+    return {
+        "queries_judged": len(judged),
+        "recall": {f"@{k}": round(recall[k] / n, 4) for k in ks},
+        "mrr": round(mrr / n, 4),
+    }
+
+
+def latency_run(
+    embedder: Embedder,
+    qdrant: SearchClient,
+    *,
+    collection: str,
+    queries: List[str],
+    limit: int,
+    filter_payload: Optional[Dict[str, Any]],
+    concurrency: int,
+    hybrid: Optional[HybridSearcher] = None,
+    corpus_ver: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    One query per request (no batching) at the given concurrency, the way
+    an interactive caller would see it. With `hybrid`, search is the fused
+    BM25 + dense path and its stage timings are reported too.
+    """
+    encode_lat = LatencyWindow(len(queries))
+    search_lat = LatencyWindow(len(queries))
+    total_lat = LatencyWindow(len(queries))
+
+    def one(q: str) -> None:
+        t0 = time.perf_counter()
+        vec = embedder.encode([q])[0]
+        t1 = time.perf_counter()
+        if hybrid is not None:
+            hybrid.search(query=q, vector=vec, limit=limit, corpus_ver=corpus_ver)
+        else:
+            qdrant.search(collection=collection, vector=vec.tolist(), limit=limit,
+                          with_payload=HIT_FIELDS, filter_payload=filter_payload)
+        t2 = time.perf_counter()
+        encode_lat.add(t1 - t0)
+        search_lat.add(t2 - t1)
+        total_lat.add(t2 - t0)
+
+    if hybrid is not None:
+        hybrid.reset_stats()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        list(pool.map(one, queries))
+    wall = time.perf_counter() - t0
+
+    stages = None
+    if hybrid is not None:
+        stages = {stage: w.summary() for stage, w in hybrid.latency.items()}
+    return {
+        "concurrency": concurrency,
+        "queries": len(queries),
+        "wall_s": round(wall, 3),
+        "qps": round(len(queries) / wall, 2) if wall > 0 else 0.0,
+        "encode": encode_lat.summary(),
+        "search": search_lat.summary(),
+        "total": total_lat.summary(),
+        "hybrid_stages": stages,
+    }
+
+
+def main() -> None:
+    infra = InfraSettings()
+    setup_logging(infra.log_level)
+    with profile_run(infra, "eval") as prof:
+        _evaluate(infra, prof)
+
+
+def _evaluate(infra: InfraSettings, prof: RunProfiler) -> None:
+    logger = logging.getLogger("rag_pipeline.evaluate")
+
+    pipe, raw_cfg = load_pipeline_config(infra.pipeline_config)
+    cfg_fp = config_fingerprint(raw_cfg)
+
+    ks = sorted({int(k) for k in os.getenv("EVAL_K", "1,5,10").split(",") if k.strip()})
+    concurrency_levels = [int(c) for c in os.getenv("EVAL_CONCURRENCY", "1,4,16").split(",") if c.strip()]
+    overfetch = int(os.getenv("EVAL_OVERFETCH", "4"))
+    corpus_ver = os.getenv("CORPUS_VERSION", "").strip() or latest_corpus_version(infra.runs_dir)
+
+    queries, labels = load_eval_set(infra.eval_dir)
+    if not queries:
+        raise SystemExit(f"No queries in {infra.eval_dir}/queries.jsonl")
+
+    run_id = "eval_" + time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    prof.set_run(run_id)
+    log(logger, "eval_start",
+        run_id=run_id,
+        queries=len(queries),
+        judged=sum(1 for qid, _ in queries if labels.get(qid)),
+        corpus_version=corpus_ver,
+        config_fingerprint=cfg_fp,
+        ks=ks,
+        concurrency=concurrency_levels,
+    )
+
+    embedder = Embedder(pipe.embed_model, pipe.embed_batch_size, pipe.embed_normalize,
+                        backend=pipe.embed_backend, onnx_file=pipe.embed_onnx_file,
+                        hf_cache_dir=infra.hf_cache_dir or None)
+    qdrant = make_search_client(infra, timeout_s=20.0, max_retries=3,
+                                max_connections=max(concurrency_levels + [1]))
+    filter_payload = corpus_filter(corpus_ver)
+    limit = max(ks) * max(1, overfetch)  # chunk hits; several chunks of one doc collapse into one rank
+    texts = [q for _, q in queries]
+
+    # quality: batched encode + batched search
+    t0 = time.perf_counter()
+    vectors = embedder.encode(texts)
+    encode_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    hits = qdrant.search_batch(collection=infra.qdrant_collection, vectors=vectors, limit=limit,
+                               with_payload=["doc_id"], filter_payload=filter_payload)
+    search_s = time.perf_counter() - t0
+    ranked = {qid: rank_docs(h) for (qid, _), h in zip(queries, hits)}
+    quality = quality_metrics(ranked, labels, ks)
+
+    # latency/throughput: one query per request at each concurrency level
+    latency = [
+        latency_run(embedder, qdrant, collection=infra.qdrant_collection, queries=texts,
+                    limit=limit, filter_payload=filter_payload, concurrency=c)
+        for c in concurrency_levels
+    ]
+
+    # hybrid: same queries through BM25 + dense fusion, if ingest built a sparse index
+    hybrid = open_hybrid(infra, qdrant, cfg_fp)
+    quality_hybrid = None
+    latency_hybrid: List[Dict[str, Any]] = []
+    if hybrid is not None:
+        hybrid_ranked = {
+            qid: rank_docs(hybrid.search(query=q, vector=vec, limit=limit, corpus_ver=corpus_ver))
+            for (qid, q), vec in zip(queries, vectors)
+        }
+        quality_hybrid = quality_metrics(hybrid_ranked, labels, ks)
+        latency_hybrid = [
+            latency_run(embedder, qdrant, collection=infra.qdrant_collection, queries=texts,
+                        limit=limit, filter_payload=filter_payload, concurrency=c,
+                        hybrid=hybrid, corpus_ver=corpus_ver)
+            for c in concurrency_levels
+        ]
+    qdrant.close()
+
+    report = {
+        "run_id": run_id,
+        "created_at_utc": utc_now_iso(),
+        "env": infra.env,
+        "collection": infra.qdrant_collection,
+        "index_backend": describe(infra),
+
+        "pipeline_version": pipe.pipeline_version,
+        "config_fingerprint": cfg_fp,
+        "corpus_version": corpus_ver,
+        "embed_model": pipe.embed_model,
+
+        "queries": len(queries),
+        "search_limit": limit,
+        "quality": quality,
+        "batched": {
+            "encode_s": round(encode_s, 3),
+            "search_s": round(search_s, 3),
+            "qps": round(len(texts) / (encode_s + search_s), 2) if encode_s + search_s > 0 else 0.0,
+        },
+        "latency": latency,
+        "quality_hybrid": quality_hybrid,
+        "latency_hybrid": latency_hybrid,
+        "hybrid": {"candidates": hybrid.candidates, "rrf_k": hybrid.rrf_k,
+                   "sparse_index": hybrid.sparse.stats()} if hybrid is not None else None,
+        "profile": prof.describe(),
+    }
+    out = os.path.join(infra.runs_dir, f"{run_id}.json")
+    write_json(out, report)
+
+    log(logger, "eval_done", run_id=run_id, report_path=out, **quality)
+    print(f"\n[eval] ✅ Done run_id={run_id}")
+    print(f"[eval] recall={quality['recall']} mrr={quality['mrr']}")
+    for r in latency:
+        print(f"[eval] c={r['concurrency']:>3} qps={r['qps']:>8} "
+              f"encode_p95={r['encode']['p95_ms']}ms search_p95={r['search']['p95_ms']}ms")
+    if quality_hybrid is not None:
+        print(f"[eval] hybrid recall={quality_hybrid['recall']} mrr={quality_hybrid['mrr']}")
+        for r in latency_hybrid:
+            st = r["hybrid_stages"]
+            print(f"[eval] hybrid c={r['concurrency']:>3} qps={r['qps']:>8} search_p95={r['search']['p95_ms']}ms "
+                  f"(dense={st['dense']['p95_ms']} sparse={st['sparse']['p95_ms']} "
+                  f"fetch={st['fetch']['p95_ms']} fuse={st['fuse']['p95_ms']}ms)")
+    print(f"[eval] report={out}")
+
+    if os.getenv("EVAL_COMPARE", "").lower() in ("1", "true", "yes"):
+        print_comparison(infra.runs_dir)
+
+
+def print_comparison(runs_dir: str) -> None:
+    """
+    One line per eval report in runs_dir, oldest first.
+    """
+    rows = []
+    for name in sorted(os.listdir(runs_dir)):
+        if not (name.startswith("eval_") and name.endswith(".json")):
+            continue
+        with open(os.path.join(runs_dir, name), "r", encoding="utf-8") as f:
+            r = json.load(f)
+        best = max(r.get("latency", []), key=lambda x: x["qps"], default={})
+        rows.append((r["run_id"], (r.get("corpus_version") or "")[:12], r["config_fingerprint"][:12],
+                     r["quality"]["recall"], r["quality"]["mrr"], best.get("qps")))
+    print("\n[eval] run_id | corpus_version | config_fp | recall | mrr | best_qps")
+    for row in rows:
+        print("[eval] " + " | ".join(str(x) for x in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from rag_pipeline.versioning import sha256_file
+
+# (size, mtime_ns, inode)
+StatKey = Tuple[int, int, int]
+
+
+def _stat_key(path: str) -> StatKey:
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+class FileHashCache:
+    """
+    Persistent path -> sha256 cache, trusted only while (size, mtime_ns, inode)
+    are unchanged. Lets discovery skip re-reading bytes of unchanged PDFs.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._entries: Dict[str, List] = {}
+        self.hits = 0
+        self.misses = 0
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self._entries = {}
+
+    def get(self, path: str, key: StatKey) -> Optional[str]:
+        e = self._entries.get(os.path.abspath(path))
+        if e is not None and tuple(e[:3]) == key:
+            return e[3]
+        return None
+
+    def put(self, path: str, key: StatKey, digest: str) -> None:
+        self._entries[os.path.abspath(path)] = [*key, digest]
+
+    def save(self, keep: Optional[List[str]] = None) -> None:
+        """
+        keep: if given, drop entries for paths not in it (deleted/renamed files).
+        """
+        if keep is not None:
+            wanted = {os.path.abspath(p) for p in keep}
+            self._entries = {p: e for p, e in self._entries.items() if p in wanted}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"  # workers may share the cache
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+
+def hash_files(paths: List[str], cache: FileHashCache, workers: int) -> List[str]:
+    """
+    sha256 of every path, in input order. Cache hits are free; misses are
+    hashed on a thread pool (hashlib releases the GIL on large updates).
+    """
+    digests: List[Optional[str]] = [None] * len(paths)
+    todo: List[Tuple[int, StatKey]] = []
+    for i, p in enumerate(paths):
+        key = _stat_key(p)
+        d = cache.get(p, key)
+        if d is None:
+            todo.append((i, key))
+        else:
+            digests[i] = d
+    cache.hits += len(paths) - len(todo)
+    cache.misses += len(todo)
+
+    if todo:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            results = pool.map(lambda t: sha256_file(paths[t[0]]), todo)
+            for (i, key), d in zip(todo, results):
+                digests[i] = d
+                cache.put(paths[i], key, d)
+
+    return [d for d in digests if d is not None]
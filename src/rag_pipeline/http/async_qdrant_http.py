@@ -0,0 +1,379 @@
+"""
+asyncio counterpart of QdrantHttp for the retrieval service, with the same
+search / search_batch / scroll / retrieve methods (awaited).
+
+  - pooled connections, HTTP/2 (many requests multiplexed on a few
+    connections) when the h2 package is installed and the server
+    negotiates it - httpx does that over TLS only, plain http:// URLs stay
+    on HTTP/1.1 keep-alive. The pool is split into shards of
+    shard_connections and each request goes to the shard with the fewest
+    in flight: httpcore's async pool scans all its connections for every
+    queued request, which at 16+ connections costs more CPU than the
+    request itself.
+  - retries only what a retry can fix (see qdrant_http.retryable), with
+    jittered exponential backoff that sleeps without blocking the loop
+  - a circuit breaker: after breaker_failures requests in a row fail,
+    calls fail fast with CircuitOpenError for breaker_reset_s, then a
+    single probe decides whether to close it again
+  - hedged reads (hedge=True): a request that has not answered after the
+    route's recent p95 gets a duplicate, and the first answer wins. At
+    most hedge_max_ratio of requests are hedged, so a slow server does
+    not also get twice the load. The loser is left to finish unread:
+    cancelling an in-flight httpx request can leak its pool slot.
+"""
+import asyncio
+import importlib.util
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+import httpx
+
+from rag_pipeline.http.qdrant_http import backoff_s, retryable
+from rag_pipeline.logging_setup import log
+from rag_pipeline.metrics import METRICS, route
+from rag_pipeline.stats import percentile
+
+logger = logging.getLogger("rag_pipeline.http.async_qdrant_http")
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failures` consecutive failed requests; open ->
+    half_open once reset_s has passed, where one trial request is let
+    through: success closes the circuit, failure opens it again.
+
+    Used from a single event loop, so no locking.
+    """
+    def __init__(self, failures: int, reset_s: float) -> None:
+        self.failures = max(1, failures)
+        self.reset_s = reset_s
+        self.state = "closed"
+        self.opened = 0
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.reset_s:
+                return False
+            self.state = "half_open"
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def success(self) -> None:
+        self.state = "closed"
+        self._consecutive = 0
+        self._probing = False
+
+    def failure(self) -> None:
+        self._consecutive += 1
+        self._probing = False
+        if self.state == "half_open" or (self.state == "closed" and self._consecutive >= self.failures):
+            self.state = "open"
+            self.opened += 1
+            self._opened_at = time.monotonic()
+
+    def abandon(self) -> None:
+        # the request ended without a verdict; if it was the probe, let the next one try
+        self._probing = False
+
+
+class RouteLatency:
+    """
+    Recent successful attempt latencies per route, and the p95 hedging
+    waits for (recomputed every `every` samples).
+    """
+    def __init__(self, window: int = 512, min_samples: int = 20, every: int = 16) -> None:
+        self.window = window
+        self.min_samples = min_samples
+        self.every = every
+        self._samples: Dict[str, Deque[float]] = {}
+        self._added: Dict[str, int] = {}
+        self._p95: Dict[str, float] = {}
+
+    def add(self, key: str, seconds: float) -> None:
+        samples = self._samples.setdefault(key, deque(maxlen=self.window))
+        samples.append(seconds)
+        n = self._added[key] = self._added.get(key, 0) + 1
+        if len(samples) >= self.min_samples and n % self.every == 0:
+            self._p95[key] = percentile(samples, 95)
+
+    def p95(self, key: str) -> Optional[float]:
+        return self._p95.get(key)
+
+
+class AsyncQdrantHttp:
+    """
+    with_payload is True/False or a list of payload keys to return.
+    Failures raise RuntimeError (CircuitOpenError while the circuit is open).
+    """
+    def __init__(
+        self,
+        base_url: str,
+        timeout_s: float = 20.0,
+        max_retries: int = 3,
+        max_connections: int = 64,
+        max_keepalive: Optional[int] = None,
+        keepalive_expiry_s: float = 30.0,
+        shard_connections: int = 1,
+        http2: bool = True,
+        backoff_base_s: float = 0.05,
+        backoff_cap_s: float = 1.0,
+        breaker_failures: int = 5,
+        breaker_reset_s: float = 10.0,
+        hedge: bool = False,
+        hedge_min_delay_s: float = 0.005,
+        hedge_max_ratio: float = 0.1,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max(1, max_retries)
+        self.backoff_base_s = backoff_base_s
+        self.backoff_cap_s = backoff_cap_s
+        if http2 and importlib.util.find_spec("h2") is None:
+            log(logger, "http2_unavailable", reason="h2 package not installed; using HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        max_keepalive = max_connections if max_keepalive is None else max_keepalive
+        shards = max(1, math.ceil(max_connections / max(1, shard_connections)))
+        self._clients = [
+            httpx.AsyncClient(
+                timeout=httpx.Timeout(timeout_s, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=math.ceil(max_connections / shards),
+                    max_keepalive_connections=math.ceil(max_keepalive / shards),
+                    keepalive_expiry=keepalive_expiry_s,
+                ),
+                http2=http2,
+            )
+            for _ in range(shards)
+        ]
+        self._in_flight = [0] * shards
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset_s)
+        self.hedge = hedge
+        self.hedge_min_delay_s = hedge_min_delay_s
+        self.hedge_max_ratio = hedge_max_ratio
+        self.latency = RouteLatency()
+        self._stragglers: Set["asyncio.Future[Dict[str, Any]]"] = set()
+
+        self.requests = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.rejected = 0
+
+    async def aclose(self) -> None:
+        for task in self._stragglers:
+            task.cancel()
+        await asyncio.gather(*self._stragglers, return_exceptions=True)
+        for client in self._clients:
+            await client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http2": self.http2,
+            "pool_shards": len(self._clients),
+            "requests": self.requests,
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.opened,
+            "circuit_rejected": self.rejected,
+            "hedge": self.hedge,
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+        }
+
+    async def _request(self, method: str, path: str, json_body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        labels = {"client": "async", "route": route(path)}
+        if not self.breaker.allow():
+            self.rejected += 1
+            METRICS.inc("rag_qdrant_circuit_rejected_total", **labels)
+            raise CircuitOpenError(f"Qdrant circuit open, failing fast: {method} {labels['route']}")
+        self.requests += 1
+
+        attempt = 1
+        try:
+            for attempt in range(1, self.max_retries + 1):
+                try:
+                    data = await self._hedged(method, path, json_body, labels)
+                    break
+                except httpx.HTTPError as e:
+                    if attempt == self.max_retries or not retryable(e):
+                        raise
+                    METRICS.inc("rag_qdrant_retries_total", **labels)
+                    await asyncio.sleep(backoff_s(attempt, self.backoff_base_s, self.backoff_cap_s))
+        except httpx.HTTPError as e:
+            METRICS.inc("rag_qdrant_errors_total", **labels)
+            # only failures a healthy server would not produce count against it
+            if retryable(e):
+                opened = self.breaker.opened
+                self.breaker.failure()
+                if self.breaker.opened > opened:
+                    METRICS.inc("rag_qdrant_circuit_open_total", client="async")
+                    log(logger, "qdrant_circuit_open", route=labels["route"], reset_s=self.breaker.reset_s)
+            else:
+                self.breaker.success()
+            raise RuntimeError(f"Qdrant HTTP request failed after {attempt} attempt(s): {e}") from e
+        except BaseException:
+            # cancelled, or a bad response body: says nothing about the server's health
+            self.breaker.abandon()
+            raise
+        self.breaker.success()
+        return data
+
+    async def _attempt(self, method: str, path: str, json_body: Optional[Dict[str, Any]],
+                       labels: Dict[str, str]) -> Dict[str, Any]:
+        # least busy shard: a hedge lands away from the connection that is stuck
+        shard = min(range(len(self._clients)), key=self._in_flight.__getitem__)
+        self._in_flight[shard] += 1
+        t0 = time.perf_counter()
+        try:
+            r = await self._clients[shard].request(method, f"{self.base_url}{path}", json=json_body)
+        finally:
+            self._in_flight[shard] -= 1
+        elapsed = time.perf_counter() - t0
+        METRICS.observe("rag_qdrant_request_seconds", elapsed, **labels)
+        r.raise_for_status()
+        self.latency.add(labels["route"], elapsed)
+        return r.json()
+
+    def _hedge_delay(self, key: str) -> Optional[float]:
+        if not self.hedge or self.hedges_fired >= self.hedge_max_ratio * self.requests:
+            return None
+        p95 = self.latency.p95(key)
+        return None if p95 is None else max(self.hedge_min_delay_s, p95)
+
+    async def _hedged(self, method: str, path: str, json_body: Optional[Dict[str, Any]],
+                      labels: Dict[str, str]) -> Dict[str, Any]:
+        delay = self._hedge_delay(labels["route"])
+        if delay is None:
+            return await self._attempt(method, path, json_body, labels)
+
+        first = asyncio.ensure_future(self._attempt(method, path, json_body, labels))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done or self._hedge_delay(labels["route"]) is None:
+            return await first
+
+        self.hedges_fired += 1
+        METRICS.inc("rag_qdrant_hedges_total", outcome="fired", **labels)
+        second = asyncio.ensure_future(self._attempt(method, path, json_body, labels))
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedges_won += 1
+                            METRICS.inc("rag_qdrant_hedges_total", outcome="won", **labels)
+                        return task.result()
+                    error = task.exception()
+            assert error is not None
+            raise error
+        finally:
+            for task in pending:
+                self._stragglers.add(task)
+                task.add_done_callback(self._straggler_done)
+
+    def _straggler_done(self, task: "asyncio.Future[Dict[str, Any]]") -> None:
+        self._stragglers.discard(task)
+        if not task.cancelled():
+            task.exception()   # retrieved: a losing hedge's error is not worth a warning
+
+    async def search(
+        self,
+        *,
+        collection: str,
+        vector: List[float],
+        limit: int,
+        with_payload: Union[bool, List[str]] = True,
+        filter_payload: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        body: Dict[str, Any] = {
+            "vector": vector,
+            "limit": limit,
+            "with_payload": with_payload,
+        }
+        if filter_payload:
+            body["filter"] = filter_payload
+
+        data = await self._request("POST", f"/collections/{collection}/points/search", json_body=body)
+        return data.get("result", [])
+
+    async def search_batch(
+        self,
+        *,
+        collection: str,
+        vectors: Sequence[Sequence[float]],
+        limit: int,
+        with_payload: Union[bool, List[str]] = True,
+        filter_payload: Optional[Dict[str, Any]] = None,
+        chunk_size: int = 64,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Chunks go out concurrently; results come back in input order.
+        """
+        bodies = []
+        for i in range(0, len(vectors), chunk_size):
+            searches = []
+            for vec in vectors[i : i + chunk_size]:
+                s: Dict[str, Any] = {
+                    "vector": vec.tolist() if hasattr(vec, "tolist") else list(vec),
+                    "limit": limit,
+                    "with_payload": with_payload,
+                }
+                if filter_payload:
+                    s["filter"] = filter_payload
+                searches.append(s)
+            bodies.append({"searches": searches})
+
+        path = f"/collections/{collection}/points/search/batch"
+        pages = await asyncio.gather(*(self._request("POST", path, json_body=b) for b in bodies))
+        return [hits for data in pages for hits in (data.get("result", []) or [])]
+
+    async def scroll(
+        self,
+        *,
+        collection: str,
+        limit: int = 128,
+        offset: Optional[Dict[str, Any]] = None,
+        filter_payload: Optional[Dict[str, Any]] = None,
+        with_payload: Union[bool, List[str]] = True,
+        with_vectors: bool = False,
+    ) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        body: Dict[str, Any] = {
+            "limit": limit,
+            "with_payload": with_payload,
+            "with_vectors": with_vectors,
+        }
+        if offset is not None:
+            body["offset"] = offset
+        if filter_payload:
+            body["filter"] = filter_payload
+
+        data = await self._request("POST", f"/collections/{collection}/points/scroll", json_body=body)
+        result = data.get("result", {}) or {}
+        return result.get("points", []) or [], result.get("next_page_offset")
+
+    async def retrieve(
+        self,
+        *,
+        collection: str,
+        ids: Sequence[str],
+        with_payload: Union[bool, List[str]] = True,
+    ) -> List[Dict[str, Any]]:
+        if not ids:
+            return []
+        body: Dict[str, Any] = {"ids": list(ids), "with_payload": with_payload, "with_vector": False}
+        data = await self._request("POST", f"/collections/{collection}/points", json_body=body)
+        return data.get("result", []) or []
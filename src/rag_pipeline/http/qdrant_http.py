@@ -1,42 +1,80 @@
 import random
 import time
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import httpx
 
+from rag_pipeline.metrics import METRICS, route
+
+# statuses a retry can fix; any other 4xx (bad filter, missing collection)
+# fails the same way every time
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+def retryable(e: Exception) -> bool:
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code in RETRY_STATUSES
+    return isinstance(e, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError))
+
+
+def backoff_s(attempt: int, base_s: float, cap_s: float) -> float:
+    """
+    Exponential backoff with equal jitter: half the step fixed, half random,
+    so clients that failed together don't retry together.
+    """
+    step = min(cap_s, base_s * 2.0 ** (attempt - 1))
+    return step / 2 + random.uniform(0, step / 2)
+
 
 class QdrantHttp:
     """
     Robust HTTP client for Qdrant operations we need for tools/eval:
-      - search
+      - search / search_batch
       - scroll
+      - retrieve
+
+    with_payload is True/False or a list of payload keys to return.
     """
-    def __init__(self, base_url: str, timeout_s: float = 20.0, max_retries: int = 3) -> None:
+    def __init__(
+        self,
+        base_url: str,
+        timeout_s: float = 20.0,
+        max_retries: int = 3,
+        max_connections: int = 10,
+    ) -> None:
         self.base_url = base_url.rstrip("/")
         self.timeout = httpx.Timeout(timeout_s, connect=5.0)
         self.max_retries = max_retries
-        self._client = httpx.Client(timeout=self.timeout)
+        # httpx.Client is thread-safe; one pooled client can serve many worker threads
+        self._client = httpx.Client(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
 
     def close(self) -> None:
         self._client.close()
 
     def _request(self, method: str, path: str, json_body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         url = f"{self.base_url}{path}"
+        labels = {"client": "http", "route": route(path)}
         last_exc: Optional[Exception] = None
 
+        attempt = 1
         for attempt in range(1, self.max_retries + 1):
             try:
-                r = self._client.request(method, url, json=json_body)
+                with METRICS.timer("rag_qdrant_request_seconds", **labels):
+                    r = self._client.request(method, url, json=json_body)
                 r.raise_for_status()
                 return r.json()
-            except (httpx.TimeoutException, httpx.NetworkError, httpx.HTTPStatusError) as e:
+            except httpx.HTTPError as e:
                 last_exc = e
-                if attempt == self.max_retries:
+                if attempt == self.max_retries or not retryable(e):
                     break
-                backoff = min(2.0 ** (attempt - 1), 8.0) + random.random() * 0.25
-                time.sleep(backoff)
+                METRICS.inc("rag_qdrant_retries_total", **labels)
+                time.sleep(backoff_s(attempt, 1.0, 8.0))
 
-        raise RuntimeError(f"Qdrant HTTP request failed after {self.max_retries} retries: {last_exc}")
+        METRICS.inc("rag_qdrant_errors_total", **labels)
+        raise RuntimeError(f"Qdrant HTTP request failed after {attempt} attempt(s): {last_exc}")
 
     def search(
         self,
@@ -44,7 +82,7 @@ class QdrantHttp:
         collection: str,
         vector: List[float],
         limit: int,
-        with_payload: bool = True,
+        with_payload: Union[bool, List[str]] = True,
         filter_payload: Optional[Dict[str, Any]] = None,
     ) -> List[Dict[str, Any]]:
         body: Dict[str, Any] = {
@@ -58,6 +96,38 @@ class QdrantHttp:
         data = self._request("POST", f"/collections/{collection}/points/search", json_body=body)
         return data.get("result", [])
 
+    def search_batch(
+        self,
+        *,
+        collection: str,
+        vectors: Sequence[Sequence[float]],
+        limit: int,
+        with_payload: Union[bool, List[str]] = True,
+        filter_payload: Optional[Dict[str, Any]] = None,
+        chunk_size: int = 64,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        One /points/search/batch request per chunk_size queries instead of one
+        request per query. Results come back in input order.
+        """
+        results: List[List[Dict[str, Any]]] = []
+        for i in range(0, len(vectors), chunk_size):
+            searches = []
+            for vec in vectors[i : i + chunk_size]:
+                s: Dict[str, Any] = {
+                    "vector": vec.tolist() if hasattr(vec, "tolist") else list(vec),
+                    "limit": limit,
+                    "with_payload": with_payload,
+                }
+                if filter_payload:
+                    s["filter"] = filter_payload
+                searches.append(s)
+
+            data = self._request("POST", f"/collections/{collection}/points/search/batch",
+                                 json_body={"searches": searches})
+            results.extend(data.get("result", []) or [])
+        return results
+
     def scroll(
         self,
         *,
@@ -65,7 +135,7 @@ class QdrantHttp:
         limit: int = 128,
         offset: Optional[Dict[str, Any]] = None,
         filter_payload: Optional[Dict[str, Any]] = None,
-        with_payload: bool = True,
+        with_payload: Union[bool, List[str]] = True,
         with_vectors: bool = False,
     ) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
         body: Dict[str, Any] = {
@@ -83,3 +153,19 @@ class QdrantHttp:
         points = result.get("points", []) or []
         next_offset = result.get("next_page_offset")
         return points, next_offset
+
+    def retrieve(
+        self,
+        *,
+        collection: str,
+        ids: Sequence[str],
+        with_payload: Union[bool, List[str]] = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        Points by ID; unknown IDs are simply absent from the result.
+        """
+        if not ids:
+            return []
+        body: Dict[str, Any] = {"ids": list(ids), "with_payload": with_payload, "with_vector": False}
+        data = self._request("POST", f"/collections/{collection}/points", json_body=body)
+        return data.get("result", []) or []
@@ -0,0 +1,170 @@
+"""
+Chunk text kept outside the vector index, keyed by point ID.
+
+  chunks.dat  zlib-compressed chunk texts, appended back to back
+  chunks.idx  fixed 28-byte records: point uuid (16) | offset u64 | length u32
+
+Data is written before its index records, and a reader only trusts whole
+index records, so a crash mid-write leaves unreachable bytes, not wrong
+text; the next writer trims a partial index record before appending. A
+later record for the same ID wins. Readers keep the index as a sorted
+NumPy array (binary search per lookup) and pick up appended records on
+refresh(). Texts of deleted docs stay in chunks.dat; the store is cheap
+to rebuild by re-running ingest into a fresh directory.
+"""
+import os
+import threading
+import time
+import uuid
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_REC = np.dtype([("key", "S16"), ("off", "<u8"), ("len", "<u4")])
+
+
+def _key(point_id: str) -> bytes:
+    # S16 compares bytewise, so sorted keys support np.searchsorted
+    return uuid.UUID(str(point_id)).bytes
+
+
+class ChunkStore:
+    def __init__(self, root_dir: str, level: int = 6, refresh_s: float = 2.0) -> None:
+        self.root = root_dir
+        self.level = level
+        self.refresh_s = refresh_s
+        self._lock = threading.Lock()
+
+        # sorted (keys, offsets, lengths), replaced as a whole on refresh
+        self._index: Tuple[np.ndarray, np.ndarray, np.ndarray] = (
+            np.zeros(0, dtype="S16"), np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint32))
+        self._idx_pos = 0
+        self._next_check = 0.0
+
+        self._dat_w = None
+        self._idx_w = None
+        self._dat_fd: Optional[int] = None
+
+        self.bytes_raw = 0
+        self.bytes_stored = 0
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    # ---- writing ----
+
+    def _open_writer(self) -> None:
+        if self._dat_w is None:
+            os.makedirs(self.root, exist_ok=True)
+            self._dat_w = open(self._path("chunks.dat"), "ab")
+            self._idx_w = open(self._path("chunks.idx"), "ab")
+            # a crash mid-record would shift every record appended after it
+            size = self._idx_w.tell()
+            self._idx_w.truncate(size - size % _REC.itemsize)
+
+    def put_many(self, point_ids: Sequence[str], texts: Sequence[str]) -> None:
+        with self._lock:
+            self._open_writer()
+            assert self._dat_w is not None and self._idx_w is not None
+            recs = np.zeros(len(point_ids), dtype=_REC)
+            off = self._dat_w.tell()
+            parts: List[bytes] = []
+            for i, (pid, text) in enumerate(zip(point_ids, texts)):
+                raw = text.encode("utf-8")
+                blob = zlib.compress(raw, self.level)
+                recs[i] = (_key(pid), off, len(blob))
+                off += len(blob)
+                parts.append(blob)
+                self.bytes_raw += len(raw)
+                self.bytes_stored += len(blob)
+            self._dat_w.write(b"".join(parts))
+            self._dat_w.flush()
+            self._idx_w.write(recs.tobytes())
+            self._idx_w.flush()
+
+    def flush(self) -> None:
+        """
+        fsync data then index; call before recording docs as done.
+        """
+        with self._lock:
+            for f in (self._dat_w, self._idx_w):
+                if f is not None:
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            for f in (self._dat_w, self._idx_w):
+                if f is not None:
+                    f.close()
+            self._dat_w = self._idx_w = None
+            if self._dat_fd is not None:
+                os.close(self._dat_fd)
+                self._dat_fd = None
+
+    # ---- reading ----
+
+    def refresh(self) -> None:
+        path = self._path("chunks.idx")
+        if not os.path.exists(path):
+            return
+        # read and advance under one lock: concurrent refreshes must not
+        # both consume the same records
+        with self._lock:
+            with open(path, "rb") as f:
+                f.seek(self._idx_pos)
+                data = f.read()
+            n = len(data) // _REC.itemsize
+            if n == 0:
+                return
+            recs = np.frombuffer(data[: n * _REC.itemsize], dtype=_REC)
+            keys0, off0, len0 = self._index
+            keys = np.concatenate([keys0, recs["key"]])
+            off = np.concatenate([off0, recs["off"].astype(np.uint64)])
+            ln = np.concatenate([len0, recs["len"].astype(np.uint32)])
+            # stable sort, keep the last record per key
+            order = np.argsort(keys, kind="stable")
+            keys, off, ln = keys[order], off[order], ln[order]
+            last = np.ones(len(keys), dtype=bool)
+            last[:-1] = keys[1:] != keys[:-1]
+            # one assignment: readers see the old or the new arrays, never a mix
+            self._index = (keys[last], off[last], ln[last])
+            self._idx_pos += n * _REC.itemsize
+
+    def _maybe_refresh(self) -> None:
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.refresh_s
+            self.refresh()
+
+    def get_many(self, point_ids: Sequence[str]) -> Dict[str, str]:
+        """
+        {point_id: text} for the IDs present in the store.
+        """
+        self._maybe_refresh()
+        keys, off, ln = self._index
+        if not point_ids or len(keys) == 0:
+            return {}
+        if self._dat_fd is None:
+            with self._lock:
+                if self._dat_fd is None:
+                    self._dat_fd = os.open(self._path("chunks.dat"), os.O_RDONLY)
+        q = np.array([_key(pid) for pid in point_ids], dtype="S16")
+        pos = np.searchsorted(keys, q)
+        out: Dict[str, str] = {}
+        for pid, p, qk in zip(point_ids, pos, q):
+            if p < len(keys) and keys[p] == qk:
+                blob = os.pread(self._dat_fd, int(ln[p]), int(off[p]))
+                out[pid] = zlib.decompress(blob).decode("utf-8")
+        return out
+
+    def stats(self) -> Dict[str, int]:
+        dat, idx = self._path("chunks.dat"), self._path("chunks.idx")
+        return {
+            "records": os.path.getsize(idx) // _REC.itemsize if os.path.exists(idx) else 0,
+            "data_bytes": os.path.getsize(dat) if os.path.exists(dat) else 0,
+            "written_raw_bytes": self.bytes_raw,
+            "written_stored_bytes": self.bytes_stored,
+        }
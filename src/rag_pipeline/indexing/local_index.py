@@ -0,0 +1,524 @@
+"""
+In-process vector index with the same surface as QdrantIndex (write side)
+and QdrantHttp (search / search_batch / scroll), for tests, CI and
+single-box deployments without a Qdrant server.
+
+Layout under <root>/<collection>/:
+  meta.json      {"dim": ...}
+  vectors.f32    memory-mapped float32 matrix, one L2-normalized row per point
+  payloads.jsonl full payloads, read on demand by (offset, length)
+  rows.jsonl     ordered log of point rows and filter ops; replayed on open
+
+Rows are append-only: re-upserting an id tombstones its old row. Payload
+keys in INDEXED_KEYS are kept as int-coded NumPy columns so filters on
+them are vectorized; filters on other keys fall back to reading payloads.
+Single writer; readers in other processes pick up new rows via refresh().
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from rag_pipeline.indexing.qdrant_index import PointBatch, UpsertTicket, docs_filter, make_points
+from rag_pipeline.settings import IndexConfig
+
+INDEXED_KEYS = ("doc_id", "corpus_version", "config_fingerprint")
+
+_BLOCK_ROWS = 262144
+
+
+def _grow(arr: np.ndarray, n: int, fill: Any = 0) -> np.ndarray:
+    if n <= len(arr):
+        return arr
+    out = np.full(max(n, len(arr) * 2, 1024), fill, dtype=arr.dtype)
+    out[: len(arr)] = arr
+    return out
+
+
+class _Column:
+    """
+    Int-coded payload column; -1 means the key is absent.
+    """
+    def __init__(self) -> None:
+        self.codes = np.full(0, -1, dtype=np.int32)
+        self.lookup: Dict[Any, int] = {}
+        self.values: List[Any] = []
+
+    def code(self, value: Any) -> int:
+        c = self.lookup.get(value)
+        if c is None:
+            c = len(self.values)
+            self.lookup[value] = c
+            self.values.append(value)
+        return c
+
+    def set(self, row: int, value: Any) -> None:
+        self.codes = _grow(self.codes, row + 1, -1)
+        self.codes[row] = -1 if value is None else self.code(value)
+
+    def get(self, row: int) -> Any:
+        c = int(self.codes[row]) if row < len(self.codes) else -1
+        return None if c < 0 else self.values[c]
+
+
+class LocalIndex:
+    def __init__(self, root_dir: str, collection: str, refresh_s: float = 1.0) -> None:
+        self.dir = os.path.join(root_dir, collection)
+        self.collection = collection
+        self.refresh_s = refresh_s
+        self.wait = True
+
+        self._lock = threading.RLock()
+        self.dim = 0
+        self.count = 0                      # rows used (alive or not)
+        self._vecs: Optional[np.memmap] = None
+        self._capacity = 0
+
+        self._ids: List[str] = []
+        self._row_of: Dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._off = np.zeros(0, dtype=np.int64)
+        self._len = np.zeros(0, dtype=np.int32)
+        self._cols: Dict[str, _Column] = {k: _Column() for k in INDEXED_KEYS}
+        self._overlay: Dict[int, Dict[str, Any]] = {}  # set_payload on non-indexed keys
+
+        self._rows_pos = 0
+        self._next_refresh = 0.0
+        self._rows_f = None
+        self._payload_f = None
+        self._payload_rfd: Optional[int] = None
+
+        self.batches_sent = 0
+        self.retries = 0
+
+        if os.path.exists(self._path("meta.json")):
+            with open(self._path("meta.json"), "r", encoding="utf-8") as f:
+                self.dim = int(json.load(f)["dim"])
+            self._replay()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    # ---- storage ----
+
+    def _map_vectors(self, rows: int, writable: bool) -> None:
+        path = self._path("vectors.f32")
+        if writable:
+            with open(path, "ab") as f:
+                if f.tell() < rows * 4 * self.dim:
+                    f.truncate(rows * 4 * self.dim)
+        rows = min(rows, os.path.getsize(path) // (4 * self.dim)) if os.path.exists(path) else 0
+        if rows == 0:
+            self._vecs, self._capacity = None, 0
+            return
+        self._vecs = np.memmap(path, dtype=np.float32, mode="r+" if writable else "r", shape=(rows, self.dim))
+        self._capacity = rows
+
+    def _open_payload_reader(self) -> Optional[int]:
+        if self._payload_rfd is None:
+            with self._lock:
+                if self._payload_rfd is None and os.path.exists(self._path("payloads.jsonl")):
+                    self._payload_rfd = os.open(self._path("payloads.jsonl"), os.O_RDONLY)
+        return self._payload_rfd
+
+    def _replay(self) -> None:
+        """
+        Apply rows.jsonl records written since the last replay.
+        Only complete lines are consumed; a torn tail is picked up next time.
+        A line that doesn't parse (a crashed writer's torn tail with later
+        records appended to it) is skipped.
+        """
+        path = self._path("rows.jsonl")
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            f.seek(self._rows_pos)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            self._apply(rec)
+        self._rows_pos += end
+        if self._vecs is None or self._capacity < self.count:
+            self._map_vectors(self.count, writable=self._rows_f is not None)
+
+    def _apply(self, rec: Dict[str, Any]) -> None:
+        op = rec.get("op")
+        if op == "put":
+            row = int(rec["row"])
+            pid = rec["id"]
+            old = self._row_of.get(pid)
+            if old is not None:
+                self._alive[old] = False
+            self._row_of[pid] = row
+            while len(self._ids) <= row:
+                self._ids.append("")
+            self._ids[row] = pid
+            self._alive = _grow(self._alive, row + 1, False)
+            self._off = _grow(self._off, row + 1)
+            self._len = _grow(self._len, row + 1)
+            self._alive[row] = True
+            self._off[row] = rec["off"]
+            self._len[row] = rec["len"]
+            for k in INDEXED_KEYS:
+                self._cols[k].set(row, rec.get(k))
+            self.count = max(self.count, row + 1)
+        elif op == "del":
+            mask = self._filter_mask(rec["filter"]) if "filter" in rec else self._ids_mask(rec["ids"])
+            for row in np.flatnonzero(mask):
+                self._alive[row] = False
+                self._row_of.pop(self._ids[row], None)
+        elif op == "set":
+            rows = np.flatnonzero(self._filter_mask(rec.get("filter")))
+            for k, v in (rec.get("payload") or {}).items():
+                if k in self._cols:
+                    col = self._cols[k]
+                    col.codes[rows] = col.code(v)
+                else:
+                    for row in rows:
+                        self._overlay.setdefault(int(row), {})[k] = v
+
+    def _log(self, rec: Dict[str, Any]) -> None:
+        assert self._rows_f is not None
+        line = (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8")
+        self._rows_f.write(line)
+        self._rows_f.flush()
+        self._rows_pos += len(line)
+        self._apply(rec)
+
+    def refresh(self) -> None:
+        with self._lock:
+            if self.dim == 0 and os.path.exists(self._path("meta.json")):
+                with open(self._path("meta.json"), "r", encoding="utf-8") as f:
+                    self.dim = int(json.load(f)["dim"])
+            if self.dim:
+                self._replay()
+
+    def _maybe_refresh(self) -> None:
+        # readers only; the writer applies its own records as it logs them
+        if self._rows_f is not None:
+            return
+        now = time.monotonic()
+        if now >= self._next_refresh:
+            self._next_refresh = now + self.refresh_s
+            self.refresh()
+
+    # ---- QdrantIndex-compatible write side ----
+
+    def ensure_collection(self, dim: int, cfg: Optional[IndexConfig] = None) -> Dict[str, Any]:
+        """
+        Exact search over a flat matrix: HNSW, quantization and on-disk
+        settings don't apply, and INDEXED_KEYS are always indexed.
+        """
+        with self._lock:
+            os.makedirs(self.dir, exist_ok=True)
+            created = self.dim == 0
+            if created:
+                self.dim = dim
+                with open(self._path("meta.json"), "w", encoding="utf-8") as f:
+                    json.dump({"dim": dim, "distance": "Cosine"}, f)
+            elif self.dim != dim:
+                raise ValueError(f"collection {self.collection} has dim={self.dim}, got {dim}")
+            if self._rows_f is None:
+                self._rows_f = open(self._path("rows.jsonl"), "ab")
+                self._payload_f = open(self._path("payloads.jsonl"), "ab")
+                self._replay()
+                # drop a crashed writer's torn tail so the next record starts on its own line
+                self._rows_f.truncate(self._rows_pos)
+                self._map_vectors(max(self.count, 1), writable=True)
+        return {"created": created, "drift": [], "drift_applied": False, "payload_indexes_created": [],
+                "indexed_keys": list(INDEXED_KEYS)}
+
+    def _append(self, batch: PointBatch) -> None:
+        with self._lock:
+            assert self._payload_f is not None, "ensure_collection() first"
+            n = len(batch)
+            start = self.count
+            if start + n > self._capacity:
+                self._map_vectors(max(start + n, self._capacity * 2, 4096), writable=True)
+            assert self._vecs is not None
+            vecs = np.asarray(batch.vectors, dtype=np.float32)
+            norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+            self._vecs[start : start + n] = vecs / np.maximum(norms, 1e-12)
+
+            for i, (pid, payload) in enumerate(zip(batch.ids, batch.payloads)):
+                data = (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+                off = self._payload_f.tell()
+                self._payload_f.write(data)
+                rec = {"op": "put", "row": start + i, "id": pid, "off": off, "len": len(data)}
+                for k in INDEXED_KEYS:
+                    if k in payload:
+                        rec[k] = payload[k]
+                self._log(rec)
+            self._payload_f.flush()
+            self.batches_sent += 1
+
+    def upsert_batched(self, points: PointBatch, batch_size: int) -> None:
+        for i in range(0, len(points), batch_size):
+            self._append(points.slice(i, i + batch_size))
+
+    def submit(self, points: PointBatch, batch_size: int) -> UpsertTicket:
+        # writes are local and synchronous; the ticket is already settled
+        fut: Future = Future()
+        try:
+            self.upsert_batched(points, batch_size)
+            fut.set_result(None)
+        except Exception as e:
+            fut.set_exception(e)
+        return UpsertTicket([fut])
+
+    def barrier(self) -> None:
+        with self._lock:
+            if self._vecs is not None and self._rows_f is not None:
+                self._vecs.flush()
+            for f in (self._payload_f, self._rows_f):
+                if f is not None:
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def close(self) -> None:
+        with self._lock:
+            self.barrier()
+            for f in (self._payload_f, self._rows_f):
+                if f is not None:
+                    f.close()
+            self._payload_f = self._rows_f = None
+            if self._payload_rfd is not None:
+                os.close(self._payload_rfd)
+                self._payload_rfd = None
+            self._vecs = None
+
+    def delete_docs(self, doc_ids: List[str], config_fingerprint: str, batch_size: int = 256) -> None:
+        with self._lock:
+            for i in range(0, len(doc_ids), batch_size):
+                self._log({"op": "del", "filter": docs_filter(doc_ids[i : i + batch_size], config_fingerprint)})
+
+    def set_corpus_version(
+        self, doc_ids: List[str], config_fingerprint: str, corpus_ver: str, batch_size: int = 256
+    ) -> None:
+        with self._lock:
+            for i in range(0, len(doc_ids), batch_size):
+                self._log({
+                    "op": "set",
+                    "filter": docs_filter(doc_ids[i : i + batch_size], config_fingerprint),
+                    "payload": {"corpus_version": corpus_ver},
+                })
+
+    def make_points(self, **kwargs: Any) -> PointBatch:
+        return make_points(**kwargs)
+
+    # ---- filtering ----
+
+    def _ids_mask(self, ids: Sequence[Any]) -> np.ndarray:
+        mask = np.zeros(self.count, dtype=bool)
+        for pid in ids:
+            row = self._row_of.get(str(pid))
+            if row is not None:
+                mask[row] = True
+        return mask
+
+    def _cond_mask(self, cond: Dict[str, Any]) -> np.ndarray:
+        n = self.count
+        key = cond.get("key", "")
+        match = cond.get("match") or {}
+        if "has_id" in cond:
+            return self._ids_mask(cond["has_id"])
+        if key in self._cols:
+            col = self._cols[key]
+            codes = col.codes[:n] if len(col.codes) >= n else _grow(col.codes, n, -1)[:n]
+            if "value" in match:
+                c = col.lookup.get(match["value"])
+                return codes == c if c is not None else np.zeros(n, dtype=bool)
+            if "any" in match:
+                cs = [col.lookup[v] for v in match["any"] if v in col.lookup]
+                return np.isin(codes, cs)
+            return np.zeros(n, dtype=bool)
+        # slow path: key not indexed, read payloads
+        values = [self._payload(r).get(key) if self._alive[r] else None for r in range(n)]
+        if "value" in match:
+            return np.fromiter((v == match["value"] for v in values), dtype=bool, count=n)
+        if "any" in match:
+            wanted = set(match["any"])
+            return np.fromiter((v in wanted for v in values), dtype=bool, count=n)
+        return np.zeros(n, dtype=bool)
+
+    def _filter_mask(self, flt: Optional[Dict[str, Any]]) -> np.ndarray:
+        n = self.count
+        mask = self._alive[:n].copy() if len(self._alive) >= n else np.zeros(n, dtype=bool)
+        if not flt:
+            return mask
+        for c in flt.get("must") or []:
+            mask &= self._cond_mask(c)
+        should = flt.get("should") or []
+        if should:
+            any_mask = np.zeros(n, dtype=bool)
+            for c in should:
+                any_mask |= self._cond_mask(c)
+            mask &= any_mask
+        for c in flt.get("must_not") or []:
+            mask &= ~self._cond_mask(c)
+        return mask
+
+    # ---- payloads ----
+
+    def _payload(self, row: int) -> Dict[str, Any]:
+        fd = self._open_payload_reader()
+        if fd is None:
+            return {}
+        payload = json.loads(os.pread(fd, int(self._len[row]), int(self._off[row])))
+        for k in INDEXED_KEYS:
+            if k in payload or self._cols[k].get(row) is not None:
+                payload[k] = self._cols[k].get(row)
+        payload.update(self._overlay.get(row, {}))
+        return payload
+
+    def _point(self, row: int, with_payload: Any) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"id": self._ids[row], "version": 0}
+        if with_payload is True:
+            out["payload"] = self._payload(row)
+        elif isinstance(with_payload, (list, dict)) and with_payload:
+            fields = with_payload.get("include", []) if isinstance(with_payload, dict) else with_payload
+            p = self._payload(row)
+            out["payload"] = {k: p[k] for k in fields if k in p}
+        return out
+
+    # ---- QdrantHttp-compatible read side ----
+
+    def _check_collection(self, collection: str) -> None:
+        if collection != self.collection:
+            raise ValueError(f"LocalIndex serves collection {self.collection!r}, not {collection!r}")
+
+    @staticmethod
+    def _topk(
+        vecs: Optional[np.ndarray], queries: np.ndarray, limit: int, mask: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Blockwise exact cosine top-k of a (m, dim) query matrix over the rows
+        of vecs selected by mask. Returns (rows, scores), each (m, <=limit),
+        best first; -inf marks padding.
+        """
+        m = len(queries)
+        best_rows = np.zeros((m, 0), dtype=np.int64)
+        best_scores = np.zeros((m, 0), dtype=np.float32)
+        if vecs is None or limit <= 0:
+            return best_rows, best_scores
+
+        n = len(mask)
+        for start in range(0, n, _BLOCK_ROWS):
+            stop = min(n, start + _BLOCK_ROWS)
+            blk_mask = mask[start:stop]
+            if not blk_mask.any():
+                continue
+            sel = np.flatnonzero(blk_mask)
+            if len(sel) < (stop - start) // 2:
+                # selective filter: gather and score only the matching rows
+                scores = queries @ vecs[start + sel].T
+                rows = np.broadcast_to(start + sel, scores.shape)
+            else:
+                scores = queries @ vecs[start:stop].T
+                scores[:, ~blk_mask] = -np.inf
+                rows = np.broadcast_to(np.arange(start, stop), scores.shape)
+
+            all_scores = np.concatenate([best_scores, scores], axis=1)
+            all_rows = np.concatenate([best_rows, rows], axis=1)
+            k = min(limit, all_scores.shape[1])
+            part = np.argpartition(-all_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(all_scores, part, axis=1)
+            best_rows = np.take_along_axis(all_rows, part, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def search_batch(
+        self,
+        *,
+        collection: str,
+        vectors: Sequence[Sequence[float]],
+        limit: int,
+        with_payload: Any = True,
+        filter_payload: Optional[Dict[str, Any]] = None,
+        chunk_size: int = 256,
+    ) -> List[List[Dict[str, Any]]]:
+        self._check_collection(collection)
+        self._maybe_refresh()
+        q = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        if len(q) == 0:
+            return []
+        q = q / np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+
+        # snapshot under the lock; rows below count are immutable, so the
+        # matmuls (which release the GIL) can run concurrently across threads
+        with self._lock:
+            mask = self._filter_mask(filter_payload)
+            vecs = self._vecs
+
+        results: List[List[Dict[str, Any]]] = []
+        for i in range(0, len(q), chunk_size):
+            rows, scores = self._topk(vecs, q[i : i + chunk_size], limit, mask)
+            for r_row, s_row in zip(rows, scores):
+                hits = []
+                for row, score in zip(r_row, s_row):
+                    if not np.isfinite(score):
+                        break
+                    hit = self._point(int(row), with_payload)
+                    hit["score"] = float(score)
+                    hits.append(hit)
+                results.append(hits)
+        return results
+
+    def search(
+        self,
+        *,
+        collection: str,
+        vector: Sequence[float],
+        limit: int,
+        with_payload: Any = True,
+        filter_payload: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        return self.search_batch(collection=collection, vectors=[vector], limit=limit,
+                                 with_payload=with_payload, filter_payload=filter_payload)[0]
+
+    def retrieve(self, *, collection: str, ids: Sequence[str], with_payload: Any = True) -> List[Dict[str, Any]]:
+        self._check_collection(collection)
+        self._maybe_refresh()
+        with self._lock:
+            rows = [self._row_of.get(str(pid)) for pid in ids]
+        return [self._point(row, with_payload) for row in rows if row is not None]
+
+    def scroll(
+        self,
+        *,
+        collection: str,
+        limit: int = 128,
+        offset: Optional[Any] = None,
+        filter_payload: Optional[Dict[str, Any]] = None,
+        with_payload: Any = True,
+        with_vectors: bool = False,
+    ) -> Tuple[List[Dict[str, Any]], Optional[Any]]:
+        """
+        Pages in row order; offsets are opaque row numbers.
+        """
+        self._check_collection(collection)
+        self._maybe_refresh()
+        with self._lock:
+            mask = self._filter_mask(filter_payload)
+            start = int(offset or 0)
+            rows = np.flatnonzero(mask[start:]) + start
+            page = rows[:limit]
+            points = []
+            for row in page:
+                p = self._point(int(row), with_payload)
+                if with_vectors and self._vecs is not None:
+                    p["vector"] = self._vecs[int(row)].tolist()
+                points.append(p)
+            next_offset = int(rows[limit]) if len(rows) > limit else None
+            return points, next_offset
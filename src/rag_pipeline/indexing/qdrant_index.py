@@ -1,54 +1,410 @@
+import io
+import json
+import logging
+import threading
+import time
 import uuid
-from typing import Any, Dict, List
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
 
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, PointStruct, VectorParams
+import httpx
+import numpy as np
+
+from rag_pipeline.http.qdrant_http import backoff_s, retryable
+from rag_pipeline.logging_setup import log
+from rag_pipeline.metrics import METRICS, route
+from rag_pipeline.settings import IndexConfig
+
+logger = logging.getLogger("rag_pipeline.indexing")
+
+POINT_NS = uuid.UUID("12345678-1234-5678-1234-567812345678")
+
+
+def point_id(doc_id: str, chunk_index: int) -> str:
+    return str(uuid.uuid5(POINT_NS, f"{doc_id}:{chunk_index}"))
+
+
+@dataclass
+class PointBatch:
+    """
+    Column-oriented points: one contiguous float32 matrix instead of a
+    list of per-point vectors.
+    """
+    ids: List[str]
+    vectors: np.ndarray            # (n, dim) float32, C-contiguous
+    payloads: List[Dict[str, Any]]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def slice(self, start: int, stop: int) -> "PointBatch":
+        # ndarray slicing is a view, no copy
+        return PointBatch(self.ids[start:stop], self.vectors[start:stop], self.payloads[start:stop])
+
+
+def make_points(
+    *,
+    doc_id: str,
+    file_name: str,
+    chunks: List[str],
+    vectors: np.ndarray,
+    payload_meta: Dict[str, Any],
+) -> PointBatch:
+    """
+    Deterministic point IDs: uuid5(doc_id:chunk_index).
+    Eval is doc-level, but stable point IDs still matter for idempotency.
+
+    Payloads carry only what filters and hit display need; chunk text goes
+    to the ChunkStore under the same point IDs.
+    """
+    ids: List[str] = []
+    payloads: List[Dict[str, Any]] = []
+    for idx in range(len(chunks)):
+        ids.append(point_id(doc_id, idx))
+        payloads.append({
+            "doc_id": doc_id,
+            "file_name": file_name,
+            "chunk_index": idx,
+            **payload_meta,
+        })
+    vecs = np.ascontiguousarray(vectors[: len(chunks)], dtype=np.float32)
+    return PointBatch(ids=ids, vectors=vecs, payloads=payloads)
+
+
+def docs_filter(doc_ids: List[str], config_fingerprint: str) -> Dict[str, Any]:
+    """
+    Points of the given docs written under one config fingerprint.
+    """
+    return {
+        "must": [
+            {"key": "doc_id", "match": {"any": doc_ids}},
+            {"key": "config_fingerprint", "match": {"value": config_fingerprint}},
+        ]
+    }
+
+
+def batch_body(batch: PointBatch) -> bytes:
+    """
+    Serialize a PointBatch straight into Qdrant's batch upsert JSON.
+    Vectors are formatted by numpy one row at a time, so no list of boxed
+    floats is ever built for the whole batch. %.9g round-trips float32.
+    """
+    rows = io.BytesIO()
+    np.savetxt(rows, batch.vectors, fmt="%.9g", delimiter=",", newline="],[")
+    buf = io.BytesIO()
+    buf.write(b'{"batch":{"ids":')
+    buf.write(json.dumps(batch.ids).encode("utf-8"))
+    buf.write(b',"vectors":[[')
+    buf.write(rows.getbuffer()[:-2])  # drop the trailing ",["
+    buf.write(b'],"payloads":')
+    buf.write(json.dumps(batch.payloads, ensure_ascii=False).encode("utf-8"))
+    buf.write(b"}}")
+    return buf.getvalue()
+
+
+def collection_body(dim: int, cfg: IndexConfig) -> Dict[str, Any]:
+    body: Dict[str, Any] = {
+        "vectors": {"size": dim, "distance": "Cosine", "on_disk": cfg.vectors_on_disk},
+        "hnsw_config": {"m": cfg.hnsw_m, "ef_construct": cfg.hnsw_ef_construct, "on_disk": cfg.hnsw_on_disk},
+    }
+    if cfg.quantization == "int8":
+        body["quantization_config"] = {
+            "scalar": {"type": "int8", "quantile": 0.99, "always_ram": cfg.quantization_always_ram}
+        }
+    return body
+
+
+def config_drift(dim: int, cfg: IndexConfig, info: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Differences between the wanted settings and GET /collections/{c}'s result,
+    as [{"setting", "want", "have"}].
+    """
+    conf = info.get("config") or {}
+    vectors = (conf.get("params") or {}).get("vectors") or {}
+    hnsw = conf.get("hnsw_config") or {}
+    scalar = (conf.get("quantization_config") or {}).get("scalar")
+
+    have = {
+        "vectors.size": vectors.get("size"),
+        "vectors.distance": vectors.get("distance"),
+        "vectors.on_disk": bool(vectors.get("on_disk", False)),
+        "hnsw.m": hnsw.get("m"),
+        "hnsw.ef_construct": hnsw.get("ef_construct"),
+        "hnsw.on_disk": bool(hnsw.get("on_disk", False)),
+        "quantization": "int8" if scalar and scalar.get("type") == "int8" else "none",
+    }
+    want = {
+        "vectors.size": dim,
+        "vectors.distance": "Cosine",
+        "vectors.on_disk": cfg.vectors_on_disk,
+        "hnsw.m": cfg.hnsw_m,
+        "hnsw.ef_construct": cfg.hnsw_ef_construct,
+        "hnsw.on_disk": cfg.hnsw_on_disk,
+        "quantization": cfg.quantization,
+    }
+    if scalar and cfg.quantization == "int8":
+        have["quantization.always_ram"] = bool(scalar.get("always_ram", False))
+        want["quantization.always_ram"] = cfg.quantization_always_ram
+    return [{"setting": k, "want": want[k], "have": have[k]} for k in want if want[k] != have[k]]
+
+
+class UpsertTicket:
+    """
+    Handle for the batches of one submit() call.
+    """
+    def __init__(self, futures: List[Future]) -> None:
+        self.futures = futures
+
+    def done(self) -> bool:
+        return all(f.done() for f in self.futures)
+
+    def result(self) -> None:
+        # re-raises the first batch failure
+        for f in self.futures:
+            f.result()
 
 
 class QdrantIndex:
-    def __init__(self, qdrant_url: str, collection: str) -> None:
-        self.client = QdrantClient(url=qdrant_url)
+    """
+    Write side of the pipeline, over Qdrant's REST API.
+
+    max_in_flight > 0 enables submit(): batches go out on a thread pool with
+    at most max_in_flight outstanding, so upserts overlap with embedding.
+    With wait=False Qdrant acks once the batch is in its WAL; barrier() then
+    blocks until everything sent before it has been applied. That fence
+    relies on one shard applying its updates in order, so it is only used
+    on a single-shard, unreplicated collection; ensure_collection() turns
+    wait on for any other layout.
+    """
+    def __init__(
+        self,
+        qdrant_url: str,
+        collection: str,
+        max_in_flight: int = 0,
+        wait: bool = True,
+        max_retries: int = 3,
+        timeout_s: float = 60.0,
+    ) -> None:
+        self.base_url = qdrant_url.rstrip("/")
         self.collection = collection
+        self.wait = wait
+        self.max_retries = max(1, max_retries)
+        self._client = httpx.Client(
+            timeout=httpx.Timeout(timeout_s, connect=5.0),
+            limits=httpx.Limits(max_connections=max(4, max_in_flight + 2)),
+        )
+
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[threading.BoundedSemaphore] = None
+        if max_in_flight > 0:
+            self._pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="upsert")
+            self._slots = threading.BoundedSemaphore(max_in_flight)
+
+        self._stats_lock = threading.Lock()
+        self.batches_sent = 0
+        self.retries = 0
+        self._single_shard: Optional[bool] = None   # layout checked by ensure_collection / barrier
+
+    def _send(
+        self,
+        method: str,
+        path: str,
+        *,
+        json_body: Optional[Dict[str, Any]] = None,
+        content: Optional[bytes] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[Dict[str, Any], int]:
+        """
+        Returns (response json, retries used).
+        """
+        url = f"{self.base_url}{path}"
+        headers = {"Content-Type": "application/json"} if content is not None else None
+        labels = {"client": "index", "route": route(path)}
+        attempt = 1
+        while True:
+            try:
+                with METRICS.timer("rag_qdrant_request_seconds", **labels):
+                    r = self._client.request(method, url, json=json_body, content=content, params=params,
+                                             headers=headers)
+                r.raise_for_status()
+                return r.json(), attempt - 1
+            except Exception as e:
+                if attempt >= self.max_retries or not retryable(e):
+                    METRICS.inc("rag_qdrant_errors_total", **labels)
+                    raise
+                METRICS.inc("rag_qdrant_retries_total", **labels)
+                time.sleep(backoff_s(attempt, 1.0, 8.0))
+                attempt += 1
 
-    def ensure_collection(self, dim: int) -> None:
-        existing = {c.name for c in self.client.get_collections().collections}
+    def ensure_collection(self, dim: int, cfg: Optional[IndexConfig] = None) -> Dict[str, Any]:
+        """
+        Create the collection with the index settings, or check an existing
+        one for drift (see IndexConfig.on_drift), then create any missing
+        keyword payload indexes. Returns a report for the run manifest.
+        """
+        cfg = cfg or IndexConfig()
+        path = f"/collections/{self.collection}"
+        report: Dict[str, Any] = {"created": False, "drift": [], "drift_applied": False, "payload_indexes_created": []}
+
+        data, _ = self._send("GET", "/collections")
+        existing = {c["name"] for c in (data.get("result") or {}).get("collections", [])}
         if self.collection not in existing:
-            self.client.create_collection(
-                collection_name=self.collection,
-                vectors_config=VectorParams(size=dim, distance=Distance.COSINE),
+            report["created"] = self._create_collection(path, collection_body(dim, cfg))
+        # read back even when just created: the server picks the shard layout
+        info = self._send("GET", path)[0].get("result") or {}
+        report["layout"] = self._check_layout(info)
+        if not report["created"]:
+            drift = config_drift(dim, cfg, info)
+            report["drift"] = drift
+            if drift:
+                log(logger, "index_config_drift", collection=self.collection, on_drift=cfg.on_drift, drift=drift)
+                if any(d["setting"] in ("vectors.size", "vectors.distance") for d in drift):
+                    raise RuntimeError(f"collection {self.collection} has incompatible vectors: {drift}")
+                if cfg.on_drift == "fail":
+                    raise RuntimeError(f"collection {self.collection} config drift: {drift}")
+                if cfg.on_drift == "update":
+                    body = collection_body(dim, cfg)
+                    patch: Dict[str, Any] = {
+                        "vectors": {"": {"on_disk": cfg.vectors_on_disk}},
+                        "hnsw_config": body["hnsw_config"],
+                        "quantization_config": body.get("quantization_config", "Disabled"),
+                    }
+                    self._send("PATCH", path, json_body=patch)
+                    report["drift_applied"] = True
+
+        have_indexes = set((info.get("payload_schema") or {}).keys())
+        for field in cfg.payload_indexes:
+            if field not in have_indexes:
+                self._send("PUT", f"{path}/index", json_body={"field_name": field, "field_schema": "keyword"},
+                           params={"wait": "true"})
+                report["payload_indexes_created"].append(field)
+        return report
+
+    def _check_layout(self, info: Dict[str, Any]) -> Dict[str, int]:
+        params = (info.get("config") or {}).get("params") or {}
+        layout = {"shard_number": int(params.get("shard_number") or 1),
+                  "replication_factor": int(params.get("replication_factor") or 1)}
+        self._single_shard = layout["shard_number"] == 1 and layout["replication_factor"] == 1
+        if not self._single_shard and not self.wait:
+            log(logger, "upsert_wait_forced", collection=self.collection, **layout)
+            self.wait = True
+        return layout
+
+    def _create_collection(self, path: str, body: Dict[str, Any]) -> bool:
+        # several ingest workers starting on a fresh collection all try to
+        # create it; the ones that lose check the winner's for drift instead
+        try:
+            self._send("PUT", path, json_body=body)
+            return True
+        except httpx.HTTPStatusError as e:
+            code = e.response.status_code
+            if code == 409 or (code == 400 and "already exists" in e.response.text):
+                log(logger, "collection_exists", collection=self.collection)
+                return False
+            raise
+
+    def _upsert_batch(self, batch: PointBatch, wait: bool) -> None:
+        t0 = time.time()
+        body = batch_body(batch)
+        try:
+            _, retries = self._send(
+                "PUT",
+                f"/collections/{self.collection}/points",
+                content=body,
+                params={"wait": "true" if wait else "false"},
             )
+        except Exception as e:
+            log(logger, "upsert_batch_failed",
+                points=len(batch), latency_s=round(time.time() - t0, 3), error=str(e))
+            raise
+
+        with self._stats_lock:
+            self.batches_sent += 1
+            self.retries += retries
+        METRICS.observe("rag_upsert_batch_seconds", time.time() - t0)
+        METRICS.inc("rag_upsert_points_total", len(batch))
+        METRICS.inc("rag_upsert_bytes_total", len(body))
+        log(logger, "upsert_batch",
+            points=len(batch), wait=wait, retries=retries, latency_s=round(time.time() - t0, 3))
 
-    def upsert_batched(self, points: List[PointStruct], batch_size: int) -> None:
+    def upsert_batched(self, points: PointBatch, batch_size: int) -> None:
         for i in range(0, len(points), batch_size):
-            batch = points[i : i + batch_size]
-            self.client.upsert(collection_name=self.collection, points=batch)
+            self._upsert_batch(points.slice(i, i + batch_size), wait=True)
 
-    def make_points(
-        self,
-        *,
-        doc_id: str,
-        file_name: str,
-        source_path: str,
-        chunks: List[str],
-        vectors: List[List[float]],
-        payload_meta: Dict[str, Any],
-    ) -> List[PointStruct]:
-        """
-        Deterministic point IDs: uuid5(doc_id:chunk_index).
-        Eval is doc-level, but stable point IDs still matter for idempotency.
-        """
-        ns = uuid.UUID("12345678-1234-5678-1234-567812345678")
-
-        points: List[PointStruct] = []
-        for idx, (chunk, vec) in enumerate(zip(chunks, vectors)):
-            pid = str(uuid.uuid5(ns, f"{doc_id}:{idx}"))
-            payload = {
-                "doc_id": doc_id,
-                "file_name": file_name,
-                "source_path": source_path,
-                "chunk_index": idx,
-                "text": chunk,
-                **payload_meta,
-            }
-            points.append(PointStruct(id=pid, vector=vec, payload=payload))
-        return points
+    def submit(self, points: PointBatch, batch_size: int) -> UpsertTicket:
+        """
+        Queue points for upsert and return without waiting for Qdrant.
+        Blocks only while max_in_flight batches are already outstanding.
+        Falls back to a synchronous upsert when no pool is configured.
+        """
+        if self._pool is None or self._slots is None:
+            fut: Future = Future()
+            try:
+                self.upsert_batched(points, batch_size)
+                fut.set_result(None)
+            except Exception as e:
+                fut.set_exception(e)
+            return UpsertTicket([fut])
+
+        futures: List[Future] = []
+        for i in range(0, len(points), batch_size):
+            self._slots.acquire()
+            futures.append(self._pool.submit(self._send_slot, points.slice(i, i + batch_size)))
+        return UpsertTicket(futures)
+
+    def _send_slot(self, batch: PointBatch) -> None:
+        try:
+            self._upsert_batch(batch, wait=self.wait)
+        finally:
+            assert self._slots is not None
+            self._slots.release()
+
+    def barrier(self) -> None:
+        """
+        Returns once every update sent before it has been applied. A shard
+        applies its updates in order, so on a single-shard collection an
+        empty delete with wait=true works as a fence.
+        """
+        if self.wait:
+            return
+        if self._single_shard is None:
+            self._check_layout(self._send("GET", f"/collections/{self.collection}")[0].get("result") or {})
+            if self.wait:
+                raise RuntimeError(f"collection {self.collection} is sharded or replicated: upserts sent with "
+                                   "wait=false cannot be fenced; call ensure_collection() before submitting")
+        self._send("POST", f"/collections/{self.collection}/points/delete",
+                   json_body={"points": []}, params={"wait": "true"})
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        self._client.close()
+
+    def delete_docs(self, doc_ids: List[str], config_fingerprint: str, batch_size: int = 256) -> None:
+        """
+        Delete every point of the given docs written under this config fingerprint.
+        """
+        for i in range(0, len(doc_ids), batch_size):
+            self._send("POST", f"/collections/{self.collection}/points/delete",
+                       json_body={"filter": docs_filter(doc_ids[i : i + batch_size], config_fingerprint)},
+                       params={"wait": "true"})
+
+    def set_corpus_version(
+        self, doc_ids: List[str], config_fingerprint: str, corpus_ver: str, batch_size: int = 256
+    ) -> None:
+        """
+        Re-tag points of docs carried over from a previous run so that
+        corpus_version filters keep seeing the whole corpus.
+        """
+        for i in range(0, len(doc_ids), batch_size):
+            self._send("POST", f"/collections/{self.collection}/points/payload",
+                       json_body={
+                           "payload": {"corpus_version": corpus_ver},
+                           "filter": docs_filter(doc_ids[i : i + batch_size], config_fingerprint),
+                       },
+                       params={"wait": "true"})
+
+    def make_points(self, **kwargs: Any) -> PointBatch:
+        return make_points(**kwargs)
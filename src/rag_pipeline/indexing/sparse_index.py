@@ -0,0 +1,429 @@
+"""
+Persisted BM25 inverted index over the same chunks (and point IDs) that go
+into the vector index.
+
+Write side is append-only: each flush() writes an immutable segment
+directory, then swaps sparse.json (segment list + tombstones) atomically.
+Segments merge in tiers of MERGE_FACTOR, so a long ingest doesn't leave
+thousands of small segments behind. Segment arrays are .npy files opened
+with mmap_mode="r": opening an index costs a manifest read, not a rebuild.
+
+Per segment:
+  terms.npy    sorted unique terms
+  offsets.npy  int64, postings of terms[i] are [offsets[i], offsets[i+1])
+  rows.npy     int32 row per posting (sorted within a term)
+  tf.npy       uint16 term frequency per posting
+  doclen.npy   int32 tokens per row
+  ids.npy      point ID per row (uuid5 from qdrant_index.point_id)
+  row_doc.npy  int32 index into docs.npy per row
+  docs.npy     doc_ids in this segment
+
+Deletes are tombstones {doc_id: seq}: rows of that doc in segments with
+seq <= the tombstone are dead. Re-adding a doc tombstones its older copies,
+so replaying a batch after a crash doesn't double-count it. Collection
+stats (N, avgdl, df) include dead rows until their segment is merged away,
+as in Lucene.
+
+Segments merged away are listed under "retired" in sparse.json and only
+deleted GC_GRACE_S later, at a flush: a reader in another process may
+still be opening them from the sparse.json it read before the swap.
+"""
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Sequence, Set, Tuple
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+MAX_TERM_CHARS = 32
+MERGE_FACTOR = 8
+GC_GRACE_S = 60.0
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have if in into is it its of on or "
+    "that the their then there these they this to was were which will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        t for t in TOKEN_RE.findall(text.lower())
+        if 1 < len(t) <= MAX_TERM_CHARS and t not in STOPWORDS
+    ]
+
+
+def _postings(post_terms: np.ndarray, post_rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (terms, offsets, order): unique sorted terms, CSR offsets into the
+    postings once sorted by (term, row), and that sort order.
+    """
+    terms, inv = np.unique(post_terms, return_inverse=True)
+    order = np.lexsort((post_rows, inv))
+    offsets = np.searchsorted(inv[order], np.arange(len(terms) + 1)).astype(np.int64)
+    return terms, offsets, order
+
+
+@dataclass
+class _Segment:
+    name: str
+    seq: int
+    level: int
+    terms: np.ndarray
+    offsets: np.ndarray
+    rows: np.ndarray
+    tf: np.ndarray
+    doclen: np.ndarray
+    ids: np.ndarray
+    row_doc: np.ndarray
+    docs: np.ndarray
+    dead: np.ndarray  # bool per row, from tombstones
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.doclen)
+
+    def lookup(self, term: str) -> Tuple[int, int]:
+        i = int(np.searchsorted(self.terms, term))
+        if i < len(self.terms) and self.terms[i] == term:
+            return int(self.offsets[i]), int(self.offsets[i + 1])
+        return 0, 0
+
+
+class SparseIndex:
+    def __init__(self, root_dir: str, k1: float = 1.2, b: float = 0.75, refresh_s: float = 5.0) -> None:
+        self.root = root_dir
+        self.k1 = k1
+        self.b = b
+        self.refresh_s = refresh_s
+        self._lock = threading.RLock()
+
+        self._meta: Dict[str, Any] = {"next_seq": 1, "segments": [], "tombstones": {}}
+        self._segments: Dict[str, _Segment] = {}
+        self._meta_mtime = 0.0
+        self._next_check = 0.0
+
+        # write buffer: rows of the next segment
+        self._buf_ids: List[str] = []
+        self._buf_docs: List[str] = []
+        self._buf_len: List[int] = []
+        self._buf_terms: List[str] = []
+        self._buf_rows: List[int] = []
+        self._buf_tf: List[int] = []
+
+        self.segments_written = 0
+        self.merges = 0
+        self.refresh(force=True)
+
+    def _meta_path(self) -> str:
+        return os.path.join(self.root, "sparse.json")
+
+    # ---- loading ----
+
+    def _load_segment(self, info: Dict[str, Any]) -> _Segment:
+        d = os.path.join(self.root, info["name"])
+
+        def load(name: str) -> np.ndarray:
+            return np.load(os.path.join(d, name + ".npy"), mmap_mode="r")
+
+        return _Segment(
+            name=info["name"], seq=int(info["seq"]), level=int(info.get("level", 0)),
+            terms=load("terms"), offsets=load("offsets"), rows=load("rows"), tf=load("tf"),
+            doclen=load("doclen"), ids=load("ids"), row_doc=load("row_doc"), docs=load("docs"),
+            dead=np.zeros(0, dtype=bool),
+        )
+
+    def _apply_tombstones(self) -> None:
+        tomb = self._meta["tombstones"]
+        for seg in self._segments.values():
+            dead_docs = np.fromiter((tomb.get(str(d), -1) >= seg.seq for d in seg.docs),
+                                    dtype=bool, count=len(seg.docs))
+            seg.dead = dead_docs[seg.row_doc] if len(seg.docs) else np.zeros(seg.n_rows, dtype=bool)
+
+    def refresh(self, force: bool = False) -> None:
+        """
+        Re-read sparse.json if another process changed it; segments already
+        mapped are reused.
+        """
+        path = self._meta_path()
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if not force and mtime == self._meta_mtime:
+            return
+        with self._lock:
+            for retry in (False, True):
+                with open(path, "r", encoding="utf-8") as f:
+                    mtime = os.fstat(f.fileno()).st_mtime_ns
+                    meta = json.load(f)
+                try:
+                    segments = {}
+                    for info in meta["segments"]:
+                        seg = self._segments.get(info["name"]) or self._load_segment(info)
+                        segments[info["name"]] = seg
+                    break
+                except FileNotFoundError:
+                    # collected after a newer sparse.json dropped it: read that one
+                    if retry:
+                        raise
+            self._meta, self._segments, self._meta_mtime = meta, segments, mtime
+            self._apply_tombstones()
+
+    def _maybe_refresh(self) -> None:
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.refresh_s
+            self.refresh()
+
+    # ---- writing ----
+
+    def _save_meta(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self._meta_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._meta_path())
+        self._meta_mtime = os.stat(self._meta_path()).st_mtime_ns
+
+    def _write_segment(
+        self,
+        level: int,
+        seq: int,
+        post_terms: np.ndarray,
+        post_rows: np.ndarray,
+        post_tf: np.ndarray,
+        doclen: np.ndarray,
+        ids: Sequence[str],
+        row_docs: Sequence[str],
+    ) -> Dict[str, Any]:
+        name = f"seg_{seq:08d}_L{level}"
+        d = os.path.join(self.root, name)
+        tmp = d + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+
+        terms, offsets, order = _postings(post_terms, post_rows)
+        docs, row_doc = np.unique(np.asarray(row_docs, dtype=str), return_inverse=True)
+        arrays = {
+            "terms": terms,
+            "offsets": offsets,
+            "rows": post_rows[order].astype(np.int32),
+            "tf": np.minimum(post_tf[order], 65535).astype(np.uint16),
+            "doclen": doclen.astype(np.int32),
+            "ids": np.asarray(ids, dtype=str),
+            "row_doc": row_doc.astype(np.int32),
+            "docs": docs,
+        }
+        for k, arr in arrays.items():
+            np.save(os.path.join(tmp, k + ".npy"), arr)
+        shutil.rmtree(d, ignore_errors=True)
+        os.replace(tmp, d)
+        return {"name": name, "seq": seq, "level": level,
+                "rows": int(len(doclen)), "total_len": int(doclen.sum())}
+
+    def add(self, doc_id: str, point_ids: Sequence[str], chunks: Sequence[str]) -> None:
+        """
+        Buffer one doc's chunks; they become searchable at the next flush().
+        """
+        for pid, text in zip(point_ids, chunks):
+            row = len(self._buf_ids)
+            counts = Counter(tokenize(text))
+            self._buf_ids.append(pid)
+            self._buf_docs.append(doc_id)
+            self._buf_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self._buf_terms.append(term)
+                self._buf_rows.append(row)
+                self._buf_tf.append(tf)
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._buf_ids:
+                return
+            seq = int(self._meta["next_seq"])
+            info = self._write_segment(
+                0, seq,
+                np.asarray(self._buf_terms, dtype=str),
+                np.asarray(self._buf_rows, dtype=np.int64),
+                np.asarray(self._buf_tf, dtype=np.int64),
+                np.asarray(self._buf_len, dtype=np.int32),
+                self._buf_ids,
+                self._buf_docs,
+            )
+            # older copies of these docs are superseded by this segment
+            for doc_id in set(self._buf_docs):
+                self._meta["tombstones"][doc_id] = seq - 1
+            self._meta["segments"].append(info)
+            self._meta["next_seq"] = seq + 1
+            self._segments[info["name"]] = self._load_segment(info)
+            self.segments_written += 1
+            for buf in (self._buf_ids, self._buf_docs, self._buf_len, self._buf_terms, self._buf_rows, self._buf_tf):
+                buf.clear()
+
+            self._merge_tiers()
+            self._apply_tombstones()
+            self._expire_retired()
+            self._save_meta()
+            self._gc()
+
+    def delete_docs(self, doc_ids: Iterable[str]) -> None:
+        with self._lock:
+            seq = int(self._meta["next_seq"]) - 1
+            for doc_id in doc_ids:
+                self._meta["tombstones"][doc_id] = seq
+            self._apply_tombstones()
+            self._save_meta()
+
+    def _merge_tiers(self) -> None:
+        while True:
+            by_level: Dict[int, List[Dict[str, Any]]] = {}
+            for info in self._meta["segments"]:
+                by_level.setdefault(int(info.get("level", 0)), []).append(info)
+            full = [lvl for lvl, infos in by_level.items() if len(infos) >= MERGE_FACTOR]
+            if not full:
+                return
+            self._merge(by_level[min(full)], min(full) + 1)
+
+    def _merge(self, infos: List[Dict[str, Any]], level: int) -> None:
+        self._apply_tombstones()
+        segs = [self._segments[i["name"]] for i in infos]
+        terms_parts, rows_parts, tf_parts = [], [], []
+        ids: List[str] = []
+        docs: List[str] = []
+        lens: List[np.ndarray] = []
+        base = 0
+        for seg in segs:
+            live = ~seg.dead
+            new_row = np.full(seg.n_rows, -1, dtype=np.int64)
+            new_row[live] = base + np.arange(int(live.sum()))
+            term_of = np.repeat(np.arange(len(seg.terms)), np.diff(seg.offsets))
+            keep = live[seg.rows]
+            terms_parts.append(np.asarray(seg.terms)[term_of[keep]])
+            rows_parts.append(new_row[np.asarray(seg.rows)[keep]])
+            tf_parts.append(np.asarray(seg.tf)[keep].astype(np.int64))
+            ids.extend(str(x) for x in np.asarray(seg.ids)[live])
+            docs.extend(str(x) for x in np.asarray(seg.docs)[np.asarray(seg.row_doc)[live]])
+            lens.append(np.asarray(seg.doclen)[live])
+            base += int(live.sum())
+
+        seq = max(s.seq for s in segs)
+        info = self._write_segment(
+            level, seq,
+            np.concatenate(terms_parts) if terms_parts else np.zeros(0, dtype=str),
+            np.concatenate(rows_parts) if rows_parts else np.zeros(0, dtype=np.int64),
+            np.concatenate(tf_parts) if tf_parts else np.zeros(0, dtype=np.int64),
+            np.concatenate(lens) if lens else np.zeros(0, dtype=np.int32),
+            ids, docs,
+        )
+        merged = {i["name"] for i in infos}
+        pos = min(k for k, i in enumerate(self._meta["segments"]) if i["name"] in merged)
+        rest = [i for i in self._meta["segments"] if i["name"] not in merged]
+        rest.insert(pos, info)
+        self._meta["segments"] = rest
+        retired = self._meta.setdefault("retired", {})
+        for name in merged:
+            self._segments.pop(name, None)
+            retired[name] = time.time()
+        self._segments[info["name"]] = self._load_segment(info)
+        self.merges += 1
+
+        # tombstones older than every remaining segment can't match anything
+        min_seq = min(int(i["seq"]) for i in rest)
+        self._meta["tombstones"] = {d: s for d, s in self._meta["tombstones"].items() if s >= min_seq}
+
+    def _expire_retired(self) -> None:
+        now = time.time()
+        retired = self._meta.get("retired", {})
+        self._meta["retired"] = {n: t for n, t in retired.items() if now - t < GC_GRACE_S}
+
+    def _gc(self) -> None:
+        keep = {i["name"] for i in self._meta["segments"]} | set(self._meta.get("retired", {}))
+        for name in os.listdir(self.root):
+            if name.startswith("seg_") and name not in keep:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    def close(self) -> None:
+        self.flush()
+
+    # ---- reading ----
+
+    def live_docs(self) -> Set[str]:
+        with self._lock:
+            out: Set[str] = set()
+            for seg in self._segments.values():
+                if seg.n_rows:
+                    alive = np.unique(np.asarray(seg.row_doc)[~seg.dead])
+                    out.update(str(d) for d in np.asarray(seg.docs)[alive])
+            return out
+
+    def search(self, query: str, limit: int) -> List[Tuple[str, float]]:
+        """
+        BM25 top-`limit` as (point_id, score), best first.
+        """
+        self._maybe_refresh()
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            segs = list(self._segments.values())
+            n_total = sum(int(i["rows"]) for i in self._meta["segments"])
+            len_total = sum(int(i["total_len"]) for i in self._meta["segments"])
+        if not terms or n_total == 0 or limit <= 0:
+            return []
+        avgdl = len_total / n_total
+
+        spans = [[seg.lookup(t) for t in terms] for seg in segs]
+        df = [sum(sp[j][1] - sp[j][0] for sp in spans) for j in range(len(terms))]
+        idf = [math.log(1.0 + (n_total - d + 0.5) / (d + 0.5)) for d in df]
+
+        best_ids: List[np.ndarray] = []
+        best_scores: List[np.ndarray] = []
+        for seg, sp in zip(segs, spans):
+            rows_parts, score_parts = [], []
+            for j, (lo, hi) in enumerate(sp):
+                if hi <= lo:
+                    continue
+                rows = np.asarray(seg.rows[lo:hi])
+                tf = np.asarray(seg.tf[lo:hi], dtype=np.float32)
+                dl = np.asarray(seg.doclen)[rows].astype(np.float32)
+                norm = self.k1 * (1.0 - self.b + self.b * dl / avgdl)
+                rows_parts.append(rows)
+                score_parts.append(idf[j] * tf * (self.k1 + 1.0) / (tf + norm))
+            if not rows_parts:
+                continue
+            rows = np.concatenate(rows_parts)
+            uniq, inv = np.unique(rows, return_inverse=True)
+            scores = np.bincount(inv, weights=np.concatenate(score_parts)).astype(np.float32)
+            alive = ~seg.dead[uniq]
+            uniq, scores = uniq[alive], scores[alive]
+            if len(uniq) > limit:
+                top = np.argpartition(-scores, limit - 1)[:limit]
+                uniq, scores = uniq[top], scores[top]
+            best_ids.append(np.asarray(seg.ids)[uniq])
+            best_scores.append(scores)
+
+        if not best_ids:
+            return []
+        ids = np.concatenate(best_ids)
+        scores = np.concatenate(best_scores)
+        order = np.argsort(-scores, kind="stable")[:limit]
+        return [(str(ids[i]), float(scores[i])) for i in order]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            segs = self._meta["segments"]
+            return {
+                "segments": len(segs),
+                "rows": sum(int(i["rows"]) for i in segs),
+                "dead_rows": int(sum(int(s.dead.sum()) for s in self._segments.values())),
+                "tombstones": len(self._meta["tombstones"]),
+                "segments_written": self.segments_written,
+                "merges": self.merges,
+            }
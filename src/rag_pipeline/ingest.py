@@ -1,46 +1,234 @@
 import glob
+import json
 import logging
 import os
+import shutil
 import time
-from typing import Any, Dict, List, Tuple
+from collections import deque
+from dataclasses import asdict
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
 
+import numpy as np
+
+from rag_pipeline.catalog import catalog_path, write_catalog
+from rag_pipeline.hash_cache import FileHashCache, hash_files
+from rag_pipeline.ingest_state import DocDiff, DocStateStore
+from rag_pipeline.leases import LeaseStore, default_worker_id
 from rag_pipeline.logging_setup import setup_logging, log
-from rag_pipeline.manifest import utc_now_iso, write_run_manifest
+from rag_pipeline.manifest import merge_worker_manifests, utc_now_iso, write_json, write_run_manifest
+from rag_pipeline.metrics import METRICS
+from rag_pipeline.profiling import RunProfiler, profile_run
 from rag_pipeline.settings import InfraSettings, load_pipeline_config
-from rag_pipeline.versioning import sha256_file, stable_doc_id, config_fingerprint, corpus_version
+from rag_pipeline.versioning import sha256_bytes, stable_doc_id, config_fingerprint, corpus_version
 
-from rag_pipeline.loaders.pdf_loader import read_pdf_text_best_effort
-from rag_pipeline.chunking.chunker import chunk_text
+from rag_pipeline.staging import ExtractedDoc, iter_extracted
+from rag_pipeline.loaders.pdf_loader import PageStats
+from rag_pipeline.chunking.chunker import ChunkingSpec
+from rag_pipeline.embedding.batcher import StreamingBatcher
 from rag_pipeline.embedding.embedder import Embedder
-from rag_pipeline.indexing.qdrant_index import QdrantIndex
-
-
-def _cache_path(ingested_dir: str, corpus_ver: str) -> str:
-    os.makedirs(ingested_dir, exist_ok=True)
-    return os.path.join(ingested_dir, f"ingested_{corpus_ver}.txt")
-
-
-def _load_cache(path: str) -> set[str]:
-    if not os.path.exists(path):
-        return set()
-    with open(path, "r", encoding="utf-8") as f:
-        return {line.strip() for line in f if line.strip()}
+from rag_pipeline.backends import (
+    IndexWriter, chunk_shard_path, chunk_store_path, describe, make_index, make_search_client, sparse_index_path,
+)
+from rag_pipeline.indexing.chunk_store import ChunkStore
+from rag_pipeline.indexing.qdrant_index import UpsertTicket, point_id
+from rag_pipeline.indexing.sparse_index import SparseIndex
+
+
+_SKIP_EVENTS = {
+    "unreadable_or_no_text": "skip_unreadable",
+    "zero_chunks": "skip_zero_chunks",
+}
+
+
+def _publish(
+    infra: InfraSettings,
+    index: IndexWriter,
+    state: DocStateStore,
+    diff: DocDiff,
+    cfg_fp: str,
+    corpus_ver: str,
+    logger: logging.Logger,
+) -> str:
+    """
+    Last step of a run: retag carried-over docs, compact the state store
+    and rewrite the catalog. Returns the catalog path.
+    """
+    # Carry unchanged docs over to the new corpus_version instead of re-embedding them.
+    retag = [d for _, d in diff.unchanged if state.docs[d].get("corpus_version") != corpus_ver]
+    if retag:
+        index.set_corpus_version(retag, cfg_fp, corpus_ver)
+        for doc_id in retag:
+            state.docs[doc_id]["corpus_version"] = corpus_ver
+        log(logger, "docs_retagged", count=len(retag), corpus_version=corpus_ver)
+    state.compact()
+
+    out = catalog_path(infra.ingested_dir, infra.qdrant_collection)
+    write_catalog(out, collection=infra.qdrant_collection, config_fingerprint=cfg_fp,
+                  corpus_version=corpus_ver, docs=state.docs)
+    return out
+
+
+def _backfill_sparse(
+    infra: InfraSettings,
+    sparse: SparseIndex,
+    chunk_store: ChunkStore,
+    state: DocStateStore,
+    doc_ids: List[str],
+) -> Dict[str, int]:
+    """
+    BM25 entries for already indexed docs, from the chunk store or, for
+    points written before it existed, their payload text. Docs with text
+    in neither are left out until they are re-ingested.
+    """
+    client = None
+    added = missing = 0
+    for doc_id in doc_ids:
+        pids = [point_id(doc_id, j) for j in range(int(state.docs[doc_id].get("chunks", 0)))]
+        texts = chunk_store.get_many(pids)
+        need = [pid for pid in pids if pid not in texts]
+        if need:
+            if client is None:
+                client = make_search_client(infra, timeout_s=60.0, max_retries=3)
+            for i in range(0, len(need), 256):
+                for p in client.retrieve(collection=infra.qdrant_collection, ids=need[i : i + 256],
+                                         with_payload=["text"]):
+                    text = (p.get("payload") or {}).get("text")
+                    if isinstance(text, str):
+                        texts[str(p["id"])] = text
+        if not pids or len(texts) < len(pids):
+            missing += 1
+            continue
+        sparse.add(doc_id, pids, [texts[pid] for pid in pids])
+        added += 1
+    sparse.flush()
+    if client is not None:
+        client.close()
+    return {"backfilled_docs": added, "backfill_missing_text": missing}
+
+
+def _finalize_run(
+    infra: InfraSettings,
+    leases: LeaseStore,
+    run_id: str,
+    worker_id: str,
+    index: IndexWriter,
+    state: DocStateStore,
+    diff: DocDiff,
+    removed: List[str],
+    cfg_fp: str,
+    corpus_ver: str,
+    logger: logging.Logger,
+) -> str:
+    """
+    Distributed ingest, run once by the last worker: apply every worker's
+    results to the single-writer stores (chunk store, BM25 index, state
+    store, catalog), then merge the worker manifests. Safe to re-run if the
+    finalizer dies halfway.
+    """
+    t0 = time.time()
+    chunk_store = ChunkStore(chunk_store_path(infra))
+    sparse = SparseIndex(sparse_index_path(infra, cfg_fp)) if infra.sparse_index else None
+
+    if removed:
+        index.delete_docs(removed, cfg_fp)
+        if sparse is not None:
+            sparse.delete_docs(removed)
+        for doc_id in removed:
+            state.delete(doc_id)
+        log(logger, "docs_removed", count=len(removed))
+
+    have = sparse.live_docs() if sparse is not None else set()
+    shards: Dict[str, ChunkStore] = {}
+    done = leases.results(run_id, "done")
+    merged: List[Tuple[str, Dict[str, Any]]] = []
+    missing_text: List[Dict[str, Any]] = []
+    for i, (doc_id, worker, rec) in enumerate(done, 1):
+        if worker not in shards:
+            shards[worker] = ChunkStore(chunk_shard_path(infra, run_id, worker))
+        pids = [point_id(doc_id, j) for j in range(int(rec["chunks"]))]
+        texts = shards[worker].get_many(pids)
+        if len(texts) < len(pids):
+            # shard lost or incomplete: leave the doc unrecorded so the next run redoes it
+            missing_text.append({"doc_id": doc_id, "worker": worker, "chunks": len(pids),
+                                 "missing": len(pids) - len(texts)})
+            log(logger, "finalize_text_missing", run_id=run_id, **missing_text[-1])
+        else:
+            chunks = [texts[pid] for pid in pids]
+            chunk_store.put_many(pids, chunks)
+            if sparse is not None and doc_id not in have:
+                sparse.add(doc_id, pids, chunks)
+            merged.append((doc_id, rec))
+        if len(merged) >= infra.state_checkpoint_docs or i == len(done):
+            # texts durable before the docs are recorded, as in checkpoint()
+            chunk_store.flush()
+            if sparse is not None:
+                sparse.flush()
+            for d, r in merged:
+                state.put(d, **r)
+            merged.clear()
+    for shard in shards.values():
+        shard.close()
+    chunk_store.close()
+    if sparse is not None:
+        sparse.close()
+
+    catalog_out = _publish(infra, index, state, diff, cfg_fp, corpus_ver, logger)
+
+    worker_manifests = []
+    for path in leases.manifests(run_id):
+        with open(path, "r", encoding="utf-8") as f:
+            worker_manifests.append(json.load(f))
+    failed = leases.results(run_id, "failed")
+    manifest = {
+        "run_id": run_id,
+        "created_at_utc": utc_now_iso(),
+        "env": infra.env,
+        "ingest_mode": "distributed",
+        "finalized_by": worker_id,
+        "finalize_seconds": round(time.time() - t0, 2),
 
+        "index_backend": describe(infra),
+        "collection": infra.qdrant_collection,
+        "config_fingerprint": cfg_fp,
+        "corpus_version": corpus_ver,
 
-def _append_cache(path: str, doc_id: str) -> None:
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(doc_id + "\n")
+        "docs_merged": len(done) - len(missing_text),
+        "docs_failed": len(failed),
+        "docs_missing_text": missing_text[:200],
+        "docs_removed": len(removed),
+        **merge_worker_manifests(worker_manifests),
+        "lease_failures": [{"doc_id": d, "worker": w, **r} for d, w, r in failed][:200],
+        "worker_manifests": leases.manifests(run_id),
+        "chunk_store": chunk_store.stats(),
+        "sparse_index": sparse.stats() if sparse is not None else None,
+        "state_path": state.path,
+        "catalog_path": catalog_out,
+    }
+    out = write_run_manifest(infra.runs_dir, run_id, manifest)
+    leases.finished(run_id)
+    shutil.rmtree(os.path.join(chunk_store_path(infra), "shards", run_id), ignore_errors=True)
+    log(logger, "run_finalized", run_id=run_id, worker_id=worker_id, docs_merged=len(done) - len(missing_text),
+        docs_missing_text=len(missing_text),
+        docs_failed=len(failed), manifest_path=out)
+    return out
 
 
 def main() -> None:
     infra = InfraSettings()
     setup_logging(infra.log_level)
+    with profile_run(infra, "ingest") as prof:
+        _ingest(infra, prof)
+
+
+def _ingest(infra: InfraSettings, prof: RunProfiler) -> None:
     logger = logging.getLogger("rag_pipeline.ingest")
 
     pipe, raw_cfg = load_pipeline_config(infra.pipeline_config)
     cfg_fp = config_fingerprint(raw_cfg)
 
-    pdfs = sorted(glob.glob(os.path.join(infra.pdf_dir, "*.pdf")))
+    t_disc0 = time.time()
+    all_pdfs = sorted(glob.glob(os.path.join(infra.pdf_dir, "*.pdf")))
+    pdfs = all_pdfs
     if pipe.only_match:
         pdfs = [p for p in pdfs if pipe.only_match.lower() in os.path.basename(p).lower()]
     if pipe.max_files > 0:
@@ -49,117 +237,308 @@ def main() -> None:
         raise SystemExit(f"No PDFs found after filtering in {infra.pdf_dir}")
 
     # Compute doc_ids up front -> stable corpus_version
-    docs: List[Tuple[str, str]] = []
-    for p in pdfs:
-        file_hash = sha256_file(p)
-        docs.append((p, stable_doc_id(file_hash)))
+    hash_cache = FileHashCache(os.path.join(infra.ingested_dir, "file_hashes.json"))
+    file_hashes = hash_files(pdfs, hash_cache, infra.hash_workers)
+    hash_cache.save(keep=all_pdfs)
+    docs: List[Tuple[str, str]] = [(p, stable_doc_id(h)) for p, h in zip(pdfs, file_hashes)]
+    discovery_s = round(time.time() - t_disc0, 3)
 
     corpus_ver = corpus_version((d for _, d in docs), cfg_fp)
-    cache_path = _cache_path(infra.ingested_dir, corpus_ver)
-    ingested = _load_cache(cache_path)
-
-    run_id = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    state = DocStateStore(infra.ingested_dir, cfg_fp)
+    diff = state.diff(docs)
+
+    # With a file filter active the current set is partial, so absent docs are not "removed".
+    filtered = bool(pipe.only_match) or pipe.max_files > 0
+    removed = [] if filtered else diff.removed
+
+    # Same content under two paths is processed once.
+    todo: List[Tuple[str, str]] = []
+    queued: set[str] = set()
+    for path, doc_id in diff.added:
+        if doc_id in queued:
+            log(logger, "skip_cached", file=os.path.basename(path), doc_id=doc_id)
+            continue
+        queued.add(doc_id)
+        todo.append((path, doc_id))
+
+    distributed = infra.ingest_mode == "distributed"
+    worker_id = infra.worker_id or default_worker_id()
+    leases: Optional[LeaseStore] = None
+    if distributed:
+        if infra.index_backend == "local":
+            raise SystemExit("INGEST_MODE=distributed needs an index all workers share (INDEX_BACKEND=qdrant)")
+        # workers started on the same corpus and state derive the same run;
+        # once it is finalized the same work set starts the next generation
+        leases = LeaseStore(infra.lease_db, infra.lease_s, infra.lease_max_attempts)
+        if infra.run_id:
+            run_id = infra.run_id
+            if (leases.run_meta(run_id) or {}).get("finalized_at"):
+                raise SystemExit(f"RUN_ID={run_id} is already finalized; pick a new RUN_ID")
+        else:
+            run_id = leases.open_run("dist-" + sha256_bytes(
+                "\n".join([cfg_fp] + sorted(queued) + removed).encode("utf-8"))[:16])
+    else:
+        run_id = infra.run_id or time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    prof.set_run(run_id, worker_id if distributed else "")
     started = time.time()
 
     log(logger, "stage3_start",
         env=infra.env,
         run_id=run_id,
+        ingest_mode=infra.ingest_mode,
+        worker_id=worker_id if distributed else None,
         pdf_dir=infra.pdf_dir,
         pdf_count=len(docs),
-        qdrant_url=infra.qdrant_url,
+        discovery_s=discovery_s,
+        files_hashed=hash_cache.misses,
+        hash_cache_hits=hash_cache.hits,
+        extract_workers=infra.extract_workers,
+        embed_workers=infra.embed_workers,
+        upsert_in_flight=infra.upsert_in_flight,
+        upsert_wait=infra.upsert_wait,
+        index=describe(infra),
         collection=infra.qdrant_collection,
         pipeline_version=pipe.pipeline_version,
+        embed_backend=pipe.embed_backend,
         config_fingerprint=cfg_fp,
         corpus_version=corpus_ver,
-        cache_path=cache_path,
-        already_ingested=len(ingested),
+        state_path=state.path,
+        docs_added=len(diff.added),
+        docs_unchanged=len(diff.unchanged),
+        docs_removed=len(removed),
+        prune_skipped_filtered=filtered and bool(diff.removed),
     )
 
-    embedder = Embedder(pipe.embed_model, pipe.embed_batch_size, pipe.embed_normalize)
-    index = QdrantIndex(infra.qdrant_url, infra.qdrant_collection)
-    index.ensure_collection(embedder.dim)
+    embedder = Embedder(
+        pipe.embed_model,
+        pipe.embed_batch_size,
+        pipe.embed_normalize,
+        cache_dir=infra.embed_cache_dir,
+        cache_max_entries=infra.embed_cache_max_entries,
+        backend=pipe.embed_backend,
+        onnx_file=pipe.embed_onnx_file,
+        hf_cache_dir=infra.hf_cache_dir or None,
+        workers=infra.embed_workers,
+        threads_per_worker=infra.embed_threads_per_worker,
+    )
+    index = make_index(infra, max_in_flight=infra.upsert_in_flight, wait=infra.upsert_wait)
+    index_report = index.ensure_collection(embedder.dim, pipe.index)
+    # distributed: text goes to this worker's shard, the BM25 index is built at finalize
+    chunk_store = ChunkStore(chunk_shard_path(infra, run_id, worker_id) if distributed else chunk_store_path(infra))
+    sparse = SparseIndex(sparse_index_path(infra, cfg_fp)) if infra.sparse_index and not distributed else None
+
+    if removed and not distributed:
+        index.delete_docs(removed, cfg_fp)
+        if sparse is not None:
+            sparse.delete_docs(removed)
+        for doc_id in removed:
+            state.delete(doc_id)
+        log(logger, "docs_removed", count=len(removed))
 
     docs_indexed = 0
     docs_skipped = 0
+    docs_partial = 0
     vectors_upserted = 0
     failures: List[Dict[str, Any]] = []
 
+    # Filter keys only; the version fields are in the run manifest.
     payload_meta = {
         "corpus_version": corpus_ver,
-        "pipeline_version": pipe.pipeline_version,
         "config_fingerprint": cfg_fp,
-        "cleaner_version": pipe.cleaner_version,
-        "chunker_version": pipe.chunker_version,
     }
 
-    for path, doc_id in docs:
-        file_name = os.path.basename(path)
-
-        if doc_id in ingested:
-            log(logger, "skip_cached", file=file_name, doc_id=doc_id)
-            continue
-
-        t0 = time.time()
-        text = read_pdf_text_best_effort(path)
-        if not text:
-            docs_skipped += 1
-            failures.append({"file": file_name, "doc_id": doc_id, "reason": "unreadable_or_no_text"})
-            log(logger, "skip_unreadable", file=file_name, doc_id=doc_id)
-            continue
-
-        chunks = chunk_text(text, pipe.chunk_chars, pipe.chunk_overlap, pipe.max_chunks_per_doc)
-        if not chunks:
-            docs_skipped += 1
-            failures.append({"file": file_name, "doc_id": doc_id, "reason": "zero_chunks"})
-            log(logger, "skip_zero_chunks", file=file_name, doc_id=doc_id)
-            continue
-
-        t_embed0 = time.time()
-        vectors = embedder.encode(chunks)
-        embed_s = time.time() - t_embed0
-
-        points = index.make_points(
-            doc_id=doc_id,
-            file_name=file_name,
-            source_path=path,
-            chunks=chunks,
-            vectors=vectors,
-            payload_meta=payload_meta,
-        )
-
-        try:
-            t_up0 = time.time()
-            index.upsert_batched(points, pipe.upsert_batch_size)
-            upsert_s = time.time() - t_up0
-        except Exception as e:
-            docs_skipped += 1
-            failures.append({"file": file_name, "doc_id": doc_id, "reason": f"upsert_failed: {e}"})
-            log(logger, "upsert_failed", file=file_name, doc_id=doc_id, error=str(e))
-            continue
-
-        _append_cache(cache_path, doc_id)
-        ingested.add(doc_id)
+    # Unchanged docs from before the sparse index existed get their BM25
+    # entries from the text already stored; nothing is re-extracted or re-embedded.
+    sparse_backfill: Dict[str, int] = {}
+    if sparse is not None:
+        have = sparse.live_docs()
+        backfill = [d for _, d in diff.unchanged if d not in have and d not in queued]
+        if backfill:
+            sparse_backfill = _backfill_sparse(infra, sparse, chunk_store, state, backfill)
+            log(logger, "sparse_backfill", docs=len(backfill), **sparse_backfill)
+
+    chunking = ChunkingSpec(
+        version=pipe.chunker_version,
+        chunk_chars=pipe.chunk_chars,
+        overlap=pipe.chunk_overlap,
+        max_chunks=pipe.max_chunks_per_doc,
+        tokenizer=pipe.embed_model,
+        max_tokens=min(pipe.chunk_max_tokens or embedder.max_tokens, embedder.max_tokens),
+        overlap_tokens=pipe.chunk_overlap_tokens,
+        hf_cache_dir=infra.hf_cache_dir,
+    )
+    # distributed: docs are claimed from the shared run as the extractor pulls
+    source: Iterable[Tuple[str, str]] = todo
+    heartbeat = None
+    if leases is not None:
+        seeded = leases.seed(run_id, todo, {"config_fingerprint": cfg_fp, "corpus_version": corpus_ver})
+        leases.register_worker(run_id, worker_id)
+        heartbeat = leases.start_heartbeat(run_id, worker_id)
+        source = leases.iter_claims(run_id, worker_id, infra.lease_batch)
+        log(logger, "lease_run_joined", run_id=run_id, worker_id=worker_id, lease_db=infra.lease_db,
+            seeded=seeded, **leases.counts(run_id))
+
+    extracted = iter_extracted(
+        source,
+        spec=chunking,
+        workers=infra.extract_workers,
+        queue_size=infra.extract_queue_size,
+        page_timeout_s=infra.page_timeout_s,
+        max_page_chars=infra.max_page_chars,
+    )
 
-        docs_indexed += 1
-        vectors_upserted += len(points)
+    # keep every embedding worker fed: at least two batches each per window
+    batcher: StreamingBatcher[ExtractedDoc] = StreamingBatcher(
+        embedder, pipe.embed_batch_size, max(infra.embed_window_batches, 2 * infra.embed_workers)
+    )
 
-        log(logger, "doc_indexed",
-            file=file_name,
-            doc_id=doc_id,
-            chunks=len(chunks),
-            vectors=len(points),
-            embed_s=round(embed_s, 3),
-            upsert_s=round(upsert_s, 3),
-            total_s=round(time.time() - t0, 3),
-        )
+    pages = PageStats()
+
+    def embedded() -> Iterator[Tuple[ExtractedDoc, Optional[np.ndarray]]]:
+        # skipped docs come through with vectors=None
+        for doc in extracted:
+            pages.add(doc.file_name, doc.load)
+            for p in doc.load.pages:
+                if p.skipped is not None and p.skipped != "empty":
+                    log(logger, "page_skipped", file=doc.file_name, doc_id=doc.doc_id,
+                        page=p.page, reason=p.skipped, seconds=round(p.seconds, 3))
+            if doc.reason:
+                yield doc, None
+                continue
+            yield from batcher.add(doc, doc.chunks, doc.token_ids)
+        yield from batcher.flush()
+
+    # Submitted docs, in order: (doc, ticket, n_points, submitted_at)
+    pending: Deque[Tuple[ExtractedDoc, UpsertTicket, int, float]] = deque()
+    # Docs whose batches were all acked but not yet behind a barrier
+    acked: List[Tuple[ExtractedDoc, int, float]] = []
+
+    def settle(block: bool) -> None:
+        nonlocal docs_skipped
+        while pending and (block or pending[0][1].done()):
+            doc, ticket, n_points, submitted_at = pending.popleft()
+            try:
+                ticket.result()
+            except Exception as e:
+                docs_skipped += 1
+                failures.append({"file": doc.file_name, "doc_id": doc.doc_id, "reason": f"upsert_failed: {e}"})
+                log(logger, "upsert_failed", file=doc.file_name, doc_id=doc.doc_id, error=str(e))
+                if leases is not None:
+                    leases.fail(run_id, worker_id, doc.doc_id, f"upsert_failed: {e}")
+                continue
+            acked.append((doc, n_points, time.time() - submitted_at))
+
+    def checkpoint() -> None:
+        # only record docs in the state store once Qdrant has applied them
+        nonlocal docs_indexed, docs_partial, vectors_upserted
+        if not acked:
+            return
+        index.barrier()
+        chunk_store.flush()
+        if embedder.cache is not None:
+            embedder.cache.save()
+        if sparse is not None:
+            for doc, n_points, _ in acked:
+                sparse.add(doc.doc_id, [point_id(doc.doc_id, i) for i in range(n_points)], doc.chunks[:n_points])
+            sparse.flush()
+        done: List[Tuple[str, Dict[str, Any]]] = []
+        for doc, n_points, upsert_s in acked:
+            rec = dict(file_name=doc.file_name,
+                       source_path=doc.path,
+                       chunks=n_points,
+                       corpus_version=corpus_ver,
+                       ingested_at_utc=utc_now_iso())
+            capped = doc.load.capped
+            if capped:
+                # searchable and recorded now; the state store's diff retries it next run
+                log(logger, "doc_partial", file=doc.file_name, doc_id=doc.doc_id, **capped)
+                rec["partial"] = capped
+                docs_partial += 1
+            if leases is None:
+                state.put(doc.doc_id, **rec)
+            else:
+                done.append((doc.doc_id, rec))  # the finalizer writes the state store
+            docs_indexed += 1
+            vectors_upserted += n_points
+
+            log(logger, "doc_indexed",
+                file=doc.file_name,
+                doc_id=doc.doc_id,
+                chunks=len(doc.chunks),
+                vectors=n_points,
+                extract_s=round(doc.extract_s, 3),
+                pages_s=round(sum(p.seconds for p in doc.load.pages), 3),
+                pages=len(doc.load.pages),
+                pages_total=doc.load.pages_total,
+                pages_skipped=len(doc.load.pages) - doc.load.pages_used,
+                slowest_page_s=round(max((p.seconds for p in doc.load.pages), default=0.0), 3),
+                upsert_s=round(upsert_s, 3),
+            )
+        if leases is not None:
+            leases.complete(run_id, worker_id, done)
+        acked.clear()
+        if infra.metrics_textfile:
+            METRICS.write_textfile(infra.metrics_textfile)
+
+    # the embedding cache is saved at every checkpoint and on the way out,
+    # so a failed run keeps the vectors it already paid for
+    try:
+        for doc, vectors in embedded():
+            prof.doc_done()
+            if vectors is None:
+                docs_skipped += 1
+                failures.append({"file": doc.file_name, "doc_id": doc.doc_id, "reason": doc.reason})
+                event = _SKIP_EVENTS.get(doc.reason or "", "extract_failed")
+                log(logger, event, file=doc.file_name, doc_id=doc.doc_id, reason=doc.reason, load_error=doc.load.error)
+                if leases is not None:
+                    leases.fail(run_id, worker_id, doc.doc_id, doc.reason or "extract_failed")
+                continue
+            doc.token_ids = None  # embedded; no need to hold them until the checkpoint
+
+            points = index.make_points(
+                doc_id=doc.doc_id,
+                file_name=doc.file_name,
+                chunks=doc.chunks,
+                vectors=vectors,
+                payload_meta=payload_meta,
+            )
+            chunk_store.put_many(points.ids, doc.chunks[: len(points)])
+            pending.append((doc, index.submit(points, pipe.upsert_batch_size), len(points), time.time()))
+
+            settle(block=False)
+            if len(acked) >= infra.state_checkpoint_docs:
+                checkpoint()
+
+        settle(block=True)
+        checkpoint()
+    finally:
+        embedder.close()
+    if heartbeat is not None:
+        heartbeat.set()
+    chunk_store.close()
+    sparse_stats = None
+    if sparse is not None:
+        sparse.close()
+        sparse_stats = {**sparse.stats(), **sparse_backfill}
+
+    pool_stats = embedder.pool.stats() if embedder.pool is not None else None
+    embed_stats = {**batcher.stats(), "pool": pool_stats}
+    cache_stats = embedder.cache.stats() if embedder.cache is not None else None
+    log(logger, "embed_stats", **embed_stats, cache=cache_stats)
+
+    catalog_out = None if distributed else _publish(infra, index, state, diff, cfg_fp, corpus_ver, logger)
 
     elapsed = round(time.time() - started, 2)
     manifest = {
         "run_id": run_id,
         "created_at_utc": utc_now_iso(),
+        "started_at": started,
         "env": infra.env,
+        "ingest_mode": infra.ingest_mode,
+        "worker_id": worker_id,
 
         "qdrant_url": infra.qdrant_url,
+        "index_backend": describe(infra),
         "collection": infra.qdrant_collection,
 
         "pipeline_version": pipe.pipeline_version,
@@ -168,17 +547,53 @@ def main() -> None:
 
         "pdf_dir": infra.pdf_dir,
         "pdf_count": len(docs),
+        "discovery_seconds": discovery_s,
 
+        "docs_added": len(diff.added),
+        "docs_unchanged": len(diff.unchanged),
+        "docs_removed": len(removed),
         "docs_indexed": docs_indexed,
         "docs_skipped": docs_skipped,
+        "docs_partial": docs_partial,
         "vectors_upserted": vectors_upserted,
         "elapsed_seconds": elapsed,
-
-        "cache_path": cache_path,
+        "chunking": asdict(chunking),
+        "pages": pages.summary(),
+        "embedding": {**embed_stats, "backend": pipe.embed_backend, "onnx_file": pipe.embed_onnx_file or None},
+        "embedding_cache": cache_stats,
+        "upsert": {
+            "in_flight": infra.upsert_in_flight,
+            "wait": infra.upsert_wait,
+            "batches": index.batches_sent,
+            "retries": index.retries,
+        },
+        "index_config": {"settings": asdict(pipe.index), **index_report},
+        "sparse_index": sparse_stats,
+        "chunk_store": chunk_store.stats(),
+        "metrics": METRICS.summary(),
+        "profile": prof.describe(),
+
+        "state_path": state.path,
+        "catalog_path": catalog_out,
         "failures": failures[:200],
     }
 
-    out = write_run_manifest(infra.runs_dir, run_id, manifest)
+    if leases is not None:
+        out = os.path.join(infra.runs_dir, run_id, f"worker_{worker_id}.json")
+        write_json(out, manifest)
+        leases.set_manifest(run_id, worker_id, out)
+        log(logger, "worker_done", run_id=run_id, worker_id=worker_id, docs_indexed=docs_indexed,
+            elapsed_s=elapsed, manifest_path=out)
+        if leases.try_finalize(run_id, worker_id):
+            out = _finalize_run(infra, leases, run_id, worker_id, index, state, diff, removed,
+                                cfg_fp, corpus_ver, logger)
+        else:
+            log(logger, "finalize_deferred", run_id=run_id, worker_id=worker_id, **leases.counts(run_id))
+    else:
+        out = write_run_manifest(infra.runs_dir, run_id, manifest)
+    index.close()
+    if infra.metrics_textfile:
+        METRICS.write_textfile(infra.metrics_textfile)
 
     log(logger, "stage3_done",
         run_id=run_id,
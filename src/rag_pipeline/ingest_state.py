@@ -0,0 +1,83 @@
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Tuple
+
+
+@dataclass(frozen=True)
+class DocDiff:
+    added: List[Tuple[str, str]]      # (path, doc_id) to process
+    unchanged: List[Tuple[str, str]]  # (path, doc_id) already indexed under this config
+    removed: List[str]                # doc_ids indexed before but no longer in the file set
+
+
+class DocStateStore:
+    """
+    Persistent per-document ingest state for one config fingerprint.
+
+    Append-only JSONL log (put/del records), replayed on open and compacted
+    on close. A doc is recorded only after its points are upserted, so the
+    store doubles as the resume cache. Docs recorded as "partial" (cut
+    short by page caps) are searchable and listed, but diff() queues them
+    again so a later run can index them in full.
+    """
+    def __init__(self, state_dir: str, cfg_fp: str) -> None:
+        os.makedirs(state_dir, exist_ok=True)
+        self.cfg_fp = cfg_fp
+        self.path = os.path.join(state_dir, f"doc_state_{cfg_fp}.jsonl")
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    # torn last line from a crashed run
+                    continue
+                if rec.get("op") == "put":
+                    self.docs[rec["doc_id"]] = rec["doc"]
+                elif rec.get("op") == "del":
+                    self.docs.pop(rec["doc_id"], None)
+
+    def _append(self, rec: Dict[str, Any]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.docs
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def put(self, doc_id: str, **doc: Any) -> None:
+        self.docs[doc_id] = doc
+        self._append({"op": "put", "doc_id": doc_id, "doc": doc})
+
+    def delete(self, doc_id: str) -> None:
+        if self.docs.pop(doc_id, None) is not None:
+            self._append({"op": "del", "doc_id": doc_id})
+
+    def diff(self, docs: Iterable[Tuple[str, str]]) -> DocDiff:
+        added: List[Tuple[str, str]] = []
+        unchanged: List[Tuple[str, str]] = []
+        current: set[str] = set()
+        for path, doc_id in docs:
+            current.add(doc_id)
+            done = doc_id in self.docs and not self.docs[doc_id].get("partial")
+            (unchanged if done else added).append((path, doc_id))
+        removed = sorted(d for d in self.docs if d not in current)
+        return DocDiff(added=added, unchanged=unchanged, removed=removed)
+
+    def compact(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for doc_id, doc in self.docs.items():
+                f.write(json.dumps({"op": "put", "doc_id": doc_id, "doc": doc}, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
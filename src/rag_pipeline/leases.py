@@ -0,0 +1,277 @@
+"""
+Work claiming for distributed ingest (INGEST_MODE=distributed).
+
+One SQLite database shared by every worker of a run. The first worker to
+start seeds the run's documents; each worker then claims a few at a time
+under a lease it keeps renewing while it holds them. A worker that dies
+stops renewing, its leases expire and the remaining workers pick the
+documents up. A doc whose lease expired max_attempts times (one that keeps
+killing workers) is failed instead of handed out again.
+
+Completion records the doc's state entry and which worker's chunk shard
+holds its text; the last worker to finish applies them (finalize). SQLite
+on a shared volume is a stand-in for local and small-cluster use; the
+interface is what a networked store would implement.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    meta TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    finalizer TEXT,
+    finalize_until REAL,
+    finalized_at REAL
+);
+CREATE TABLE IF NOT EXISTS work (
+    run_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    doc_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    state TEXT NOT NULL,           -- pending | leased | done | failed
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    PRIMARY KEY (run_id, doc_id)
+);
+CREATE INDEX IF NOT EXISTS work_claim ON work (run_id, state, seq);
+CREATE TABLE IF NOT EXISTS workers (
+    run_id TEXT NOT NULL,
+    worker_id TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    heartbeat REAL NOT NULL,
+    manifest_path TEXT,
+    PRIMARY KEY (run_id, worker_id)
+);
+"""
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaseStore:
+    def __init__(self, path: str, lease_s: float = 120.0, max_attempts: int = 3) -> None:
+        self.path = path
+        self.lease_s = lease_s
+        self.max_attempts = max(1, max_attempts)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # a connection per call: used from the ingest thread, the extract
+        # feeder thread and the heartbeat thread. Closing without COMMIT
+        # rolls an open transaction back.
+        db = sqlite3.connect(self.path, timeout=60.0, isolation_level=None)
+        try:
+            db.execute("PRAGMA busy_timeout = 60000")
+            db.execute("PRAGMA journal_mode = WAL")
+            yield db
+        finally:
+            db.close()
+
+    # ---- run setup ----
+
+    def seed(self, run_id: str, items: Sequence[Tuple[str, str]], meta: Dict[str, Any]) -> int:
+        """
+        Register the run and its (path, doc_id) items; later workers of the
+        same run add nothing. Returns how many items were inserted.
+        """
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("INSERT OR IGNORE INTO runs (run_id, meta, created_at) VALUES (?, ?, ?)",
+                       (run_id, json.dumps(meta), now))
+            (n0,) = db.execute("SELECT COUNT(*) FROM work WHERE run_id = ?", (run_id,)).fetchone()
+            db.executemany(
+                "INSERT OR IGNORE INTO work (run_id, seq, doc_id, path, state) VALUES (?, ?, ?, ?, 'pending')",
+                [(run_id, i, doc_id, path) for i, (path, doc_id) in enumerate(items)],
+            )
+            (n1,) = db.execute("SELECT COUNT(*) FROM work WHERE run_id = ?", (run_id,)).fetchone()
+            db.execute("COMMIT")
+        return n1 - n0
+
+    def open_run(self, base: str) -> str:
+        """
+        The first generation base-1, base-2, ... not yet finalized. Re-running
+        a finished work set (docs that failed, a doc removed and re-added)
+        starts a new run instead of joining the finished one.
+        """
+        gen = 1
+        with self._connect() as db:
+            while db.execute("SELECT 1 FROM runs WHERE run_id = ? AND finalized_at IS NOT NULL",
+                             (f"{base}-{gen}",)).fetchone():
+                gen += 1
+        return f"{base}-{gen}"
+
+    def register_worker(self, run_id: str, worker_id: str) -> None:
+        now = time.time()
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO workers (run_id, worker_id, started_at, heartbeat) VALUES (?, ?, ?, ?)",
+                       (run_id, worker_id, now, now))
+
+    def run_meta(self, run_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as db:
+            row = db.execute("SELECT meta, finalized_at FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        return {**json.loads(row[0]), "finalized_at": row[1]}
+
+    # ---- claiming ----
+
+    def claim(self, run_id: str, worker_id: str, n: int) -> List[Tuple[str, str]]:
+        """
+        Lease up to n pending (or expired) items, in seed order.
+        """
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            # expired leases that already used up their attempts fail for good
+            db.execute(
+                "UPDATE work SET state = 'failed', result = ? "
+                "WHERE run_id = ? AND state = 'leased' AND lease_until < ? AND attempts >= ?",
+                (json.dumps({"reason": "lease_expired_max_attempts"}), run_id, now, self.max_attempts),
+            )
+            rows = db.execute(
+                "SELECT doc_id, path FROM work WHERE run_id = ? AND "
+                "(state = 'pending' OR (state = 'leased' AND lease_until < ?)) ORDER BY seq LIMIT ?",
+                (run_id, now, n),
+            ).fetchall()
+            db.executemany(
+                "UPDATE work SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 "
+                "WHERE run_id = ? AND doc_id = ?",
+                [(worker_id, now + self.lease_s, run_id, doc_id) for doc_id, _ in rows],
+            )
+            db.execute("COMMIT")
+        return [(path, doc_id) for doc_id, path in rows]
+
+    def iter_claims(self, run_id: str, worker_id: str, batch: int) -> Iterator[Tuple[str, str]]:
+        """
+        Claim lazily as the consumer pulls, so a fast worker takes more.
+        """
+        while True:
+            items = self.claim(run_id, worker_id, batch)
+            if not items:
+                return
+            yield from items
+
+    def renew(self, run_id: str, worker_id: str) -> int:
+        now = time.time()
+        with self._connect() as db:
+            db.execute("UPDATE workers SET heartbeat = ? WHERE run_id = ? AND worker_id = ?",
+                       (now, run_id, worker_id))
+            cur = db.execute(
+                "UPDATE work SET lease_until = ? WHERE run_id = ? AND worker = ? AND state = 'leased'",
+                (now + self.lease_s, run_id, worker_id),
+            )
+            return cur.rowcount
+
+    def start_heartbeat(self, run_id: str, worker_id: str) -> threading.Event:
+        """
+        Renew this worker's leases every lease_s / 3 until the returned event is set.
+        """
+        stop = threading.Event()
+
+        def beat() -> None:
+            while not stop.wait(self.lease_s / 3):
+                try:
+                    self.renew(run_id, worker_id)
+                except sqlite3.Error:
+                    continue  # busy database: retry on the next beat
+
+        threading.Thread(target=beat, name="lease-heartbeat", daemon=True).start()
+        return stop
+
+    # ---- results ----
+
+    def complete(self, run_id: str, worker_id: str, results: Sequence[Tuple[str, Dict[str, Any]]]) -> None:
+        """
+        Mark docs done with their state record. A doc another worker already
+        finished (its lease had expired and both ran it) keeps the first result;
+        the writes are idempotent, only the text shard differs.
+        """
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.executemany(
+                "UPDATE work SET state = 'done', worker = ?, lease_until = NULL, result = ? "
+                "WHERE run_id = ? AND doc_id = ? AND state != 'done'",
+                [(worker_id, json.dumps(rec), run_id, doc_id) for doc_id, rec in results],
+            )
+            db.execute("COMMIT")
+
+    def fail(self, run_id: str, worker_id: str, doc_id: str, reason: str) -> None:
+        with self._connect() as db:
+            db.execute(
+                "UPDATE work SET state = 'failed', worker = ?, lease_until = NULL, result = ? "
+                "WHERE run_id = ? AND doc_id = ? AND state != 'done'",
+                (worker_id, json.dumps({"reason": reason}), run_id, doc_id),
+            )
+
+    def counts(self, run_id: str) -> Dict[str, int]:
+        with self._connect() as db:
+            rows = db.execute("SELECT state, COUNT(*) FROM work WHERE run_id = ? GROUP BY state",
+                              (run_id,)).fetchall()
+        return {state: n for state, n in rows}
+
+    def results(self, run_id: str, state: str = "done") -> List[Tuple[str, str, Dict[str, Any]]]:
+        """
+        (doc_id, worker, result) for items in `state`, in seed order.
+        """
+        with self._connect() as db:
+            rows = db.execute("SELECT doc_id, worker, result FROM work WHERE run_id = ? AND state = ? ORDER BY seq",
+                              (run_id, state)).fetchall()
+        return [(doc_id, worker, json.loads(res or "{}")) for doc_id, worker, res in rows]
+
+    # ---- finalize ----
+
+    def set_manifest(self, run_id: str, worker_id: str, path: str) -> None:
+        with self._connect() as db:
+            db.execute("UPDATE workers SET manifest_path = ? WHERE run_id = ? AND worker_id = ?",
+                       (path, run_id, worker_id))
+
+    def manifests(self, run_id: str) -> List[str]:
+        with self._connect() as db:
+            rows = db.execute("SELECT manifest_path FROM workers WHERE run_id = ? AND manifest_path IS NOT NULL "
+                              "ORDER BY started_at", (run_id,)).fetchall()
+        return [p for (p,) in rows]
+
+    def try_finalize(self, run_id: str, worker_id: str, hold_s: float = 600.0) -> bool:
+        """
+        True for exactly one worker once no item is pending or leased and
+        every live worker has written its manifest; that worker must call
+        finished() when done. A finalizer that dies is replaced after hold_s
+        by whichever worker runs next.
+        """
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            (open_items,) = db.execute(
+                "SELECT COUNT(*) FROM work WHERE run_id = ? AND state IN ('pending', 'leased')", (run_id,)
+            ).fetchone()
+            # a worker that stopped heartbeating without a manifest is dead
+            (writing,) = db.execute(
+                "SELECT COUNT(*) FROM workers WHERE run_id = ? AND worker_id != ? AND manifest_path IS NULL "
+                "AND heartbeat >= ?", (run_id, worker_id, now - self.lease_s)
+            ).fetchone()
+            cur = db.execute(
+                "UPDATE runs SET finalizer = ?, finalize_until = ? WHERE run_id = ? AND finalized_at IS NULL "
+                "AND (finalizer IS NULL OR finalize_until < ?)",
+                (worker_id, now + hold_s, run_id, now),
+            ) if open_items == 0 and writing == 0 else None
+            db.execute("COMMIT")
+        return cur is not None and cur.rowcount == 1
+
+    def finished(self, run_id: str) -> None:
+        with self._connect() as db:
+            db.execute("UPDATE runs SET finalized_at = ? WHERE run_id = ?", (time.time(), run_id))
@@ -1,7 +1,17 @@
-import re 
+import os
+import re
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
 from pypdf import PdfReader
 from pypdf.errors import DependencyError, PdfReadError
 
+from rag_pipeline.metrics import METRICS
+
 
 _ws = re.compile(r"\s+")
 
@@ -11,41 +21,179 @@ def _clean_text(t: str) -> str:
     return t
 
 
+class PageTimeout(Exception):
+    pass
+
+
+@dataclass
+class PageReport:
+    page: int
+    seconds: float
+    chars: int = 0
+    skipped: Optional[str] = None   # "empty" | "timeout" | "error: ..."; None = used
+    truncated: bool = False
+
+
+@dataclass
+class LoadReport:
+    pages_total: int = 0
+    error: Optional[str] = None     # the document itself could not be opened
+    pages: List[PageReport] = field(default_factory=list)
+
+    @property
+    def pages_used(self) -> int:
+        return sum(1 for p in self.pages if p.skipped is None)
+
+    @property
+    def stopped_early(self) -> bool:
+        return self.error is None and len(self.pages) < self.pages_total
 
-def read_pdf_text_best_effort(path: str) -> str: 
+    @property
+    def capped(self) -> Dict[str, int]:
+        """
+        Pages the per-page guards cut: {"timeout": n, "truncated": n}, only
+        the non-zero ones. Empty when the doc's text is complete.
+        """
+        counts = {"timeout": sum(1 for p in self.pages if p.skipped == "timeout"),
+                  "truncated": sum(1 for p in self.pages if p.truncated)}
+        return {k: n for k, n in counts.items() if n}
+
+
+class PageStats:
     """
-    Best effort pdf extraction:
+    Run-level roll-up of LoadReports for the manifest: page counts, skip
+    reasons and the slowest pages.
+    """
+    def __init__(self, keep_slowest: int = 10) -> None:
+        self.keep_slowest = keep_slowest
+        self.docs = 0
+        self.docs_unopenable = 0
+        self.docs_stopped_early = 0
+        self.pages_read = 0
+        self.pages_used = 0
+        self.pages_truncated = 0
+        self.seconds = 0.0
+        self.skipped: Dict[str, int] = {}
+        self._slowest: List[Tuple[float, str, int]] = []
+
+    def add(self, file_name: str, report: LoadReport) -> None:
+        self.docs += 1
+        self.docs_unopenable += report.error is not None
+        self.docs_stopped_early += report.stopped_early
+        for p in report.pages:
+            self.pages_read += 1
+            self.seconds += p.seconds
+            self.pages_truncated += p.truncated
+            if p.skipped is None:
+                self.pages_used += 1
+            else:
+                reason = p.skipped.split(":", 1)[0]
+                self.skipped[reason] = self.skipped.get(reason, 0) + 1
+            self._slowest.append((p.seconds, file_name, p.page))
+        self._slowest = sorted(self._slowest, reverse=True)[: self.keep_slowest]
 
-    - Handles encryiption attempt with empty password
-    - Skips pages that crash
-    - Returns "" for unreadable pages
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "docs": self.docs,
+            "docs_unopenable": self.docs_unopenable,
+            "docs_stopped_early": self.docs_stopped_early,
+            "pages_read": self.pages_read,
+            "pages_used": self.pages_used,
+            "pages_truncated": self.pages_truncated,
+            "pages_skipped": self.skipped,
+            "extract_seconds": round(self.seconds, 3),
+            "slowest": [{"file": f, "page": pg, "seconds": round(sec, 3)} for sec, f, pg in self._slowest],
+        }
+
+
+@contextmanager
+def _deadline(seconds: float) -> Iterator[None]:
+    """
+    Raise PageTimeout in the block after `seconds` of wall time. SIGALRM only
+    fires in the main thread, which is where extract workers run their
+    tasks; anywhere else (or on platforms without it) there is no limit.
     """
+    if seconds <= 0 or not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
 
+    def _expire(signum, frame):  # type: ignore[no-untyped-def]
+        raise PageTimeout()
+
+    prev = signal.signal(signal.SIGALRM, _expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
     try:
-        reader = PdfReader(path)
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, prev)
 
+
+def iter_pdf_pages(
+    path: str,
+    report: LoadReport,
+    *,
+    page_timeout_s: float = 0.0,
+    max_page_chars: int = 0,
+) -> Iterator[str]:
+    """
+    Yield cleaned page texts one at a time, skipping empty pages and pages
+    that fail or run past page_timeout_s. Pages longer than max_page_chars
+    (0 = no cap) are cut. Every page pulled is recorded in `report`; pages
+    after the consumer stops are never extracted.
+
+    - Handles encryption attempt with empty password
+    - A document that cannot be opened yields nothing (report.error says why)
+    """
+    try:
+        reader = PdfReader(path)
         if getattr(reader, 'is_encrypted', False):
-            try:
-                reader.decrypt("")
-            except Exception:
-                return ""
-            
-        parts = []
-        for page in reader.pages:
-            try:
-                raw = page.extract_text() or ""
-            except Exception:
-                continue
-            txt = _clean_text(raw)
-            if txt:
-                parts.append(txt)
-        
-        return '\n\n'.join(parts)
-    
-
-    except (PdfReadError, DependencyError):
-        print("PDF read error or dependency error")
-        return ""
-    except:
-        return ""
+            reader.decrypt("")
+        report.pages_total = len(reader.pages)
+    except (PdfReadError, DependencyError) as e:
+        report.error = f"{type(e).__name__}: {e}"
+        METRICS.inc("rag_pdf_docs_total", result="unopenable")
+        return
+    except Exception as e:
+        report.error = f"open_failed: {type(e).__name__}: {e}"
+        METRICS.inc("rag_pdf_docs_total", result="unopenable")
+        return
+    METRICS.inc("rag_pdf_docs_total", result="ok")
+    METRICS.inc("rag_pdf_bytes_total", os.path.getsize(path))
+
+    for i in range(report.pages_total):
+        t0 = time.perf_counter()
+        page = PageReport(page=i, seconds=0.0)
+        txt = ""
+        try:
+            with _deadline(page_timeout_s):
+                txt = _clean_text(reader.pages[i].extract_text() or "")
+        except PageTimeout:
+            page.skipped = "timeout"
+        except Exception as e:
+            page.skipped = f"error: {type(e).__name__}: {e}"
+        page.seconds = time.perf_counter() - t0
+
+        if page.skipped is None and not txt:
+            page.skipped = "empty"
+        if max_page_chars > 0 and len(txt) > max_page_chars:
+            txt = txt[:max_page_chars]
+            page.truncated = True
+        page.chars = len(txt)
+        report.pages.append(page)
+        outcome = "used" if page.skipped is None else page.skipped.split(":", 1)[0]
+        METRICS.observe("rag_extract_page_seconds", page.seconds, outcome=outcome)
+        METRICS.inc("rag_pdf_pages_total", outcome=outcome)
+        METRICS.inc("rag_pdf_chars_total", page.chars)
+
+        if page.skipped is None:
+            yield txt
 
+
+def read_pdf_text_best_effort(path: str, page_timeout_s: float = 0.0, max_page_chars: int = 0) -> str:
+    """
+    Whole-document text, pages joined by blank lines; "" if unreadable.
+    Ingest streams pages with iter_pdf_pages instead.
+    """
+    pages = iter_pdf_pages(path, LoadReport(), page_timeout_s=page_timeout_s, max_page_chars=max_page_chars)
+    return '\n\n'.join(pages)
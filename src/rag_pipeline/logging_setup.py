@@ -1,14 +1,17 @@
+import atexit
 import json
 import logging
 import os
+import queue
 import time
+from logging.handlers import QueueHandler, QueueListener
 from typing import Any, Dict, Optional
 
 
 class JsonFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord) -> str:
         payload: Dict[str, Any] = {
-            "ts": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(record.created)),
             "level": record.levelname,
             "logger": record.name,
             "msg": record.getMessage(),
@@ -18,10 +21,38 @@ class JsonFormatter(logging.Formatter):
             payload.update(extra)
         if record.exc_info:
             payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
         return json.dumps(payload, ensure_ascii=False)
 
 
+class _Enqueue(QueueHandler):
+    """
+    Hands records to the listener thread unformatted: JSON encoding and the
+    write to stderr both happen off the calling thread.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # tracebacks hold frames; render them before they go stale
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener: Optional[QueueListener] = None
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()   # drains what is queued
+        _listener = None
+
+
 def setup_logging(level: Optional[str] = None) -> None:
+    global _listener
     lvl = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
     root = logging.getLogger()
     root.setLevel(getattr(logging, lvl, logging.INFO))
@@ -29,9 +60,18 @@ def setup_logging(level: Optional[str] = None) -> None:
     handler = logging.StreamHandler()
     handler.setFormatter(JsonFormatter())
 
+    # log calls only enqueue (unbounded, never blocks); a listener thread writes
+    _stop_listener()
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _listener = QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+
     # avoid duplicate handlers in reloads/notebooks
     root.handlers.clear()
-    root.addHandler(handler)
+    root.addHandler(_Enqueue(records))
+
+
+atexit.register(_stop_listener)
 
 
 def log(logger: logging.Logger, msg: str, **fields: Any) -> None:
@@ -1,7 +1,7 @@
 import json
 import os
 from datetime import datetime, timezone
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 
 def utc_now_iso() -> str:
@@ -19,3 +19,30 @@ def write_run_manifest(runs_dir: str, run_id: str, payload: Dict[str, Any]) -> s
     out = os.path.join(runs_dir, f"{run_id}.json")
     write_json(out, payload)
     return out
+
+
+def merge_worker_manifests(manifests: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    One run manifest from the per-worker manifests of a distributed ingest:
+    counters summed, throughput over the run's wall time, per-worker rows.
+    """
+    counters = ("docs_indexed", "docs_skipped", "docs_partial", "vectors_upserted")
+    started = min(m["started_at"] for m in manifests)
+    ended = max(m["started_at"] + m["elapsed_seconds"] for m in manifests)
+    wall = max(ended - started, 1e-9)
+    chunks = sum(m["embedding"]["chunks"] for m in manifests)
+    merged: Dict[str, Any] = {k: sum(m[k] for m in manifests) for k in counters}
+    merged.update({
+        "workers": [{
+            "worker_id": m["worker_id"],
+            "docs_indexed": m["docs_indexed"],
+            "vectors_upserted": m["vectors_upserted"],
+            "elapsed_seconds": m["elapsed_seconds"],
+            "chunks_per_s": m["embedding"]["chunks_per_s"],
+        } for m in manifests],
+        "wall_seconds": round(wall, 2),
+        "docs_per_s": round(merged["docs_indexed"] / wall, 3),
+        "chunks_per_s": round(chunks / wall, 2),
+        "failures": [f for m in manifests for f in m["failures"]][:200],
+    })
+    return merged
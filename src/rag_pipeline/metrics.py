@@ -0,0 +1,213 @@
+"""
+Process-wide counters and latency histograms.
+
+Every stage records into METRICS: PDF pages, chunking, embedding batches
+and Qdrant requests. Ingest puts summary() (p50/p95/max per stage) in the
+run manifest and can write render() - Prometheus text format - to a file
+for node_exporter's textfile collector; the retrieval service serves it
+on GET /metrics.
+
+Extraction runs in spawned worker processes: their metrics travel back
+with each ExtractedDoc as a drain() snapshot and are merge()d here.
+"""
+import bisect
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Tuple
+
+from rag_pipeline.stats import percentile
+
+# seconds: a fast page is ~1ms, a stuck upsert tens of seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HELP: Dict[str, str] = {
+    "rag_pdf_docs_total": "PDFs opened, by result (ok | unopenable).",
+    "rag_pdf_bytes_total": "Bytes of PDF files opened.",
+    "rag_pdf_pages_total": "PDF pages extracted, by outcome (used | empty | timeout | error).",
+    "rag_pdf_chars_total": "Characters of page text kept.",
+    "rag_extract_page_seconds": "Text extraction time per PDF page.",
+    "rag_chunk_doc_seconds": "Chunking time per document, page extraction excluded.",
+    "rag_chunks_total": "Chunks cut, by chunker version.",
+    "rag_embed_batch_seconds": "Time per embedding call (one batch in-process, a window with a pool).",
+    "rag_embed_chunks_total": "Chunks embedded by the model (cache misses).",
+    "rag_embed_cache_hits_total": "Chunks served from the embedding cache.",
+    "rag_upsert_batch_seconds": "Qdrant upsert time per batch, retries included.",
+    "rag_upsert_points_total": "Points upserted.",
+    "rag_upsert_bytes_total": "Request bytes of upsert batches.",
+    "rag_qdrant_request_seconds": "Qdrant HTTP request time per attempt, by client and route.",
+    "rag_qdrant_retries_total": "Qdrant HTTP requests retried, by client and route.",
+    "rag_qdrant_errors_total": "Qdrant HTTP requests that failed for good, by client and route.",
+    "rag_qdrant_hedges_total": "Hedged duplicate Qdrant reads, by outcome (fired | won).",
+    "rag_qdrant_circuit_open_total": "Times the Qdrant circuit breaker opened.",
+    "rag_qdrant_circuit_rejected_total": "Qdrant requests failed fast while the circuit was open.",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+Key = Tuple[str, Labels]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def route(path: str) -> str:
+    """
+    Qdrant URL path with the collection name taken out, for a bounded label:
+    /collections/docs/points/search -> /collections/{c}/points/search
+    """
+    parts = path.split("?", 1)[0].split("/")
+    if len(parts) > 2 and parts[1] == "collections":
+        parts[2] = "{c}"
+    return "/".join(parts)
+
+
+class Histogram:
+    """
+    Bucket counts for Prometheus plus the last `window` samples for exact
+    percentiles in summaries.
+    """
+    def __init__(self, window: int = 4096) -> None:
+        self.counts: List[int] = [0] * (len(BUCKETS) + 1)   # last = +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, v)] += 1
+        self.sum += v
+        self.count += 1
+        self.max = max(self.max, v)
+        self.samples.append(v)
+
+    def merge(self, other: "Histogram") -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.sum += other.sum
+        self.count += other.count
+        self.max = max(self.max, other.max)
+        self.samples.extend(other.samples)
+
+    def summary(self) -> Dict[str, Any]:
+        data = list(self.samples)
+        return {
+            "count": self.count,
+            "sum_s": round(self.sum, 3),
+            "p50_ms": round(percentile(data, 50) * 1000, 2),
+            "p95_ms": round(percentile(data, 95) * 1000, 2),
+            "max_ms": round(self.max * 1000, 2),
+        }
+
+
+def _fmt_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[Key, float] = {}
+        self._hists: Dict[Key, Histogram] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            h = self._hists.get(key)
+            if h is None:
+                h = self._hists[key] = Histogram()
+            h.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def drain(self) -> Dict[str, Any]:
+        """
+        Take everything recorded so far (picklable) and start from zero.
+        """
+        with self._lock:
+            snap = {"counters": self._counters, "hists": self._hists}
+            self._counters, self._hists = {}, {}
+        return snap
+
+    def merge(self, snap: Dict[str, Any]) -> None:
+        with self._lock:
+            for key, v in snap["counters"].items():
+                self._counters[key] = self._counters.get(key, 0.0) + v
+            for key, h in snap["hists"].items():
+                if key in self._hists:
+                    self._hists[key].merge(h)
+                else:
+                    self._hists[key] = h
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        For the run manifest: each histogram summarized over all its label
+        sets ("stages") and per label set ("series"), plus counters.
+        """
+        with self._lock:
+            hists = {k: h for k, h in self._hists.items()}
+            counters = dict(self._counters)
+        stages: Dict[str, Histogram] = {}
+        for (name, _), h in sorted(hists.items()):
+            stages.setdefault(name, Histogram(window=1 << 16)).merge(h)
+        return {
+            "stages": {name: h.summary() for name, h in stages.items()},
+            "series": {f"{name}{_fmt_labels(labels)}": h.summary() for (name, labels), h in sorted(hists.items())},
+            "counters": {f"{name}{_fmt_labels(labels)}": round(v, 3) for (name, labels), v in sorted(counters.items())},
+        }
+
+    def render(self) -> str:
+        """
+        Prometheus text exposition format (0.0.4).
+        """
+        with self._lock:
+            counters = sorted(self._counters.items())
+            hists = sorted((k, (list(h.counts), h.sum, h.count)) for k, h in self._hists.items())
+        lines: List[str] = []
+        seen = set()
+
+        def header(name: str, kind: str) -> None:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), v in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_fmt_labels(labels)} {v:g}")
+        for (name, labels), (counts, total, count) in hists:
+            header(name, "histogram")
+            cum = 0
+            for bound, n in zip(BUCKETS + (float("inf"),), counts):
+                cum += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', le),))} {cum}")
+            lines.append(f"{name}_sum{_fmt_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str) -> None:
+        # atomic: the collector may read at any moment
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+
+METRICS = Registry()
@@ -0,0 +1,242 @@
+"""
+Opt-in profiling for ingest and the retrieval entry points.
+
+    PROFILE=cprofile   deterministic cProfile of the main thread (high overhead,
+                       for a one-off slow run)
+    PROFILE=sample     wall-clock stack sampling of every thread at
+                       PROFILE_SAMPLE_HZ; cheap enough to leave on
+    PROFILE_TRACEMALLOC_EVERY=N
+                       tracemalloc on, with a snapshot diff every N documents
+                       (ingest) and a top-allocations report at the end
+
+Reports go to runs_dir/<run_id>/ next to the run manifest:
+profile.pstats + profile_top.txt (cprofile), profile.folded +
+profile_top.txt (sample; folded stacks load in speedscope or
+flamegraph.pl), tracemalloc.txt. Extraction and embedding pool workers
+are separate processes and are not covered.
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from rag_pipeline.logging_setup import log
+from rag_pipeline.settings import InfraSettings
+
+logger = logging.getLogger("rag_pipeline.profiling")
+
+MODES = ("", "cprofile", "sample")
+
+_TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),   # the sampler's own stacks
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+)
+
+
+class StackSampler:
+    """
+    Samples every other thread's stack at a fixed interval. Counts are
+    wall-clock: a thread blocked on a queue or socket shows up where it waits.
+    """
+    def __init__(self, interval_s: float, max_depth: int = 96) -> None:
+        self.interval_s = max(0.001, interval_s)
+        self.max_depth = max_depth
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                stack: List[str] = []
+                f: Any = frame
+                while f is not None and len(stack) < self.max_depth:
+                    code = f.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    f = f.f_back
+                stack.append(names.get(tid, str(tid)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+    def top(self, n: int = 40) -> str:
+        own: Counter[str] = Counter()
+        incl: Counter[str] = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]   # drop the thread name
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for fr in set(frames):
+                incl[fr] += count
+        total = max(1, sum(self.stacks.values()))
+        out = [f"{self.samples} samples every {self.interval_s * 1000:.1f} ms, "
+               f"{total} thread-stacks (wall clock: waiting counts)", "", "self%   function"]
+        out += [f"{100 * c / total:5.1f}   {fr}" for fr, c in own.most_common(n)]
+        out += ["", "total%  function"]
+        out += [f"{100 * c / total:5.1f}   {fr}" for fr, c in incl.most_common(n)]
+        return "\n".join(out) + "\n"
+
+
+class MemoryTracker:
+    """
+    tracemalloc snapshots at document boundaries: every `every` docs the
+    top growth since the previous snapshot is kept for the report.
+    """
+    def __init__(self, every: int, frames: int = 1, top: int = 10) -> None:
+        self.every = every
+        self.top = top
+        self.docs = 0
+        self.checkpoints: List[Tuple[int, float, List[str]]] = []   # (docs, traced_mb, top diffs)
+        tracemalloc.start(max(1, frames))
+        self._last = self._snapshot()
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+
+    def doc_done(self) -> None:
+        self.docs += 1
+        if self.docs % self.every:
+            return
+        snap = self._snapshot()
+        diffs = [str(d) for d in snap.compare_to(self._last, "lineno")[: self.top]]
+        self.checkpoints.append((self.docs, tracemalloc.get_traced_memory()[0] / 1e6, diffs))
+        self._last = snap
+
+    def stop(self) -> Tuple[str, Dict[str, Any]]:
+        current, peak = tracemalloc.get_traced_memory()
+        final = self._snapshot()
+        tracemalloc.stop()
+        out = io.StringIO()
+        out.write(f"traced now {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB, {self.docs} docs\n\n")
+        out.write("top allocations (by line, live at the end)\n")
+        for stat in final.statistics("lineno")[:25]:
+            out.write(f"  {stat}\n")
+        for docs, mb, diffs in self.checkpoints:
+            out.write(f"\nafter {docs} docs: traced {mb:.1f} MB, growth since previous snapshot\n")
+            for d in diffs:
+                out.write(f"  {d}\n")
+        return out.getvalue(), {"traced_mb": round(current / 1e6, 1), "peak_mb": round(peak / 1e6, 1),
+                                "checkpoints": len(self.checkpoints)}
+
+
+class RunProfiler:
+    """
+    Call set_run() once the run id is known (reports default to
+    runs_dir/<name>_<timestamp>/) and doc_done() per document; reports are
+    written on stop().
+    """
+    def __init__(self, infra: InfraSettings, name: str) -> None:
+        if infra.profile not in MODES:
+            raise ValueError(f"PROFILE must be one of {MODES[1:]} or empty, got {infra.profile!r}")
+        self.runs_dir = infra.runs_dir
+        self.mode = infra.profile
+        self.run_id = f"{name}_" + time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+        self.out_dir = os.path.join(self.runs_dir, self.run_id)
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+        self._memory: Optional[MemoryTracker] = None
+        if self.mode == "cprofile":
+            self._cprofile = cProfile.Profile()
+        elif self.mode == "sample":
+            self._sampler = StackSampler(1.0 / max(0.1, infra.profile_sample_hz))
+        if infra.profile_tracemalloc_every > 0:
+            self._memory = MemoryTracker(infra.profile_tracemalloc_every, infra.profile_tracemalloc_frames)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.mode) or self._memory is not None
+
+    def set_run(self, run_id: str, worker_id: str = "") -> None:
+        # distributed workers share a run id, so each gets its own directory
+        self.run_id = run_id
+        self.out_dir = os.path.join(self.runs_dir, run_id)
+        if worker_id:
+            self.out_dir = os.path.join(self.out_dir, f"worker_{worker_id}")
+
+    def start(self) -> None:
+        if self._cprofile is not None:
+            self._cprofile.enable()
+        if self._sampler is not None:
+            self._sampler.start()
+
+    def doc_done(self) -> None:
+        if self._memory is not None:
+            self._memory.doc_done()
+
+    def describe(self) -> Optional[Dict[str, Any]]:
+        """
+        What the manifest records; the files appear once the run ends.
+        """
+        if not self.enabled:
+            return None
+        return {"mode": self.mode or None, "tracemalloc": self._memory is not None, "dir": self.out_dir}
+
+    def stop(self) -> Dict[str, Any]:
+        written: Dict[str, Any] = {}
+        if not self.enabled:
+            return written
+        os.makedirs(self.out_dir, exist_ok=True)
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            path = os.path.join(self.out_dir, "profile.pstats")
+            self._cprofile.dump_stats(path)
+            top = io.StringIO()
+            pstats.Stats(self._cprofile, stream=top).sort_stats("cumulative").print_stats(50)
+            written["pstats"] = path
+            written["top"] = _write(os.path.join(self.out_dir, "profile_top.txt"), top.getvalue())
+        if self._sampler is not None:
+            self._sampler.stop()
+            written["folded"] = _write(os.path.join(self.out_dir, "profile.folded"), self._sampler.folded())
+            written["top"] = _write(os.path.join(self.out_dir, "profile_top.txt"), self._sampler.top())
+        if self._memory is not None:
+            report, summary = self._memory.stop()
+            written["tracemalloc"] = _write(os.path.join(self.out_dir, "tracemalloc.txt"), report)
+            written.update(summary)
+        return written
+
+
+def _write(path: str, text: str) -> str:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
+
+
+@contextmanager
+def profile_run(infra: InfraSettings, name: str) -> Iterator[RunProfiler]:
+    """
+    Profile the block; reports are written even if it raises.
+    """
+    prof = RunProfiler(infra, name)
+    prof.start()
+    try:
+        yield prof
+    finally:
+        written = prof.stop()
+        if written:
+            log(logger, "profile_written", name=name, run_id=prof.run_id, **written)
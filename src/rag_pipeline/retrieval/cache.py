@@ -0,0 +1,177 @@
+import glob
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def latest_corpus_version(runs_dir: str) -> Optional[str]:
+    """
+    corpus_version of the newest ingest run manifest in runs_dir, if any.
+    Eval reports (eval_*.json) are skipped by name, other JSON files living
+    there by content.
+    """
+    stamped: List[Tuple[float, str]] = []
+    for p in glob.glob(os.path.join(runs_dir, "*.json")):
+        if os.path.basename(p).startswith("eval_"):
+            continue
+        try:
+            stamped.append((os.path.getmtime(p), p))
+        except OSError:
+            continue  # removed since the glob
+    for _, p in sorted(stamped, reverse=True)[:20]:
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                m = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        if isinstance(m, dict) and "docs_indexed" in m and m.get("corpus_version"):
+            return str(m["corpus_version"])
+    return None
+
+
+class QueryEmbeddingCache:
+    """
+    LRU of query text -> embedding, scoped to one (model, normalize).
+    """
+    def __init__(self, model_name: str, normalize: bool, max_entries: int) -> None:
+        self.scope = (model_name, normalize)
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vec = self._data.get(text)
+            if vec is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(text)
+            self.hits += 1
+            return vec
+
+    def put(self, text: str, vec: np.ndarray) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[text] = vec
+            self._data.move_to_end(text)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            n = len(self._data)
+            nbytes = sum(v.nbytes + sys.getsizeof(k) for k, v in self._data.items())
+        total = self.hits + self.misses
+        return {
+            "model": self.scope[0],
+            "normalize": self.scope[1],
+            "entries": n,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "approx_bytes": nbytes,
+        }
+
+
+ResultKey = Tuple[str, Optional[str], int]
+
+
+class ResultCache:
+    """
+    TTL + LRU cache of search hits keyed by (query vector hash, corpus_version
+    filter, limit). Everything is dropped once the newest run manifest in
+    runs_dir reports a different corpus_version than when entries were stored.
+    """
+    def __init__(self, runs_dir: str, max_entries: int, ttl_s: float, check_every_s: float = 5.0) -> None:
+        self.runs_dir = runs_dir
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.check_every_s = check_every_s
+        self._data: "OrderedDict[ResultKey, Tuple[float, int, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._corpus_ver = latest_corpus_version(runs_dir)
+        self._next_check = time.monotonic() + check_every_s
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(vec: np.ndarray, corpus_ver: Optional[str], limit: int) -> ResultKey:
+        digest = hashlib.sha1(np.ascontiguousarray(vec, dtype=np.float32).tobytes()).hexdigest()
+        return digest, corpus_ver, limit
+
+    def _check_corpus(self) -> None:
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_every_s
+        current = latest_corpus_version(self.runs_dir)
+        if current != self._corpus_ver:
+            with self._lock:
+                self._data.clear()
+                self._bytes = 0
+                self._corpus_ver = current
+                self.invalidations += 1
+
+    def get(self, key: ResultKey) -> Optional[List[Dict[str, Any]]]:
+        self._check_corpus()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, size, hits = entry
+            if time.monotonic() - stored_at > self.ttl_s:
+                del self._data[key]
+                self._bytes -= size
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return hits
+
+    def put(self, key: ResultKey, hits: List[Dict[str, Any]]) -> None:
+        if self.max_entries <= 0:
+            return
+        size = len(json.dumps(hits, ensure_ascii=False))
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (time.monotonic(), size, hits)
+            self._bytes += size
+            while len(self._data) > self.max_entries:
+                _, (_, sz, _) = self._data.popitem(last=False)
+                self._bytes -= sz
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        with self._lock:
+            n = len(self._data)
+        return {
+            "corpus_version": self._corpus_ver,
+            "entries": n,
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "expired": self.expired,
+            "invalidations": self.invalidations,
+            "approx_bytes": self._bytes,
+        }
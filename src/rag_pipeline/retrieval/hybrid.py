@@ -0,0 +1,135 @@
+"""
+Hybrid retrieval: dense (vector index) and sparse (BM25) candidates fused
+by reciprocal rank fusion, score(id) = sum over lists of 1 / (k + rank).
+
+RRF only looks at ranks, so cosine and BM25 scores never need to be put
+on a common scale. Sparse-only candidates have no payload yet; they are
+fetched in one retrieve() call and dropped if they are not in the
+requested corpus_version.
+"""
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from rag_pipeline.backends import SearchClient, sparse_index_path
+from rag_pipeline.indexing.sparse_index import SparseIndex
+from rag_pipeline.retrieval.search import HIT_FIELDS, corpus_filter
+from rag_pipeline.settings import InfraSettings
+from rag_pipeline.stats import LatencyWindow
+
+
+def rrf_fuse(ranked: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuse ranked ID lists (best first) into one list of (id, rrf_score), best first.
+    """
+    scores: Dict[str, float] = {}
+    for ids in ranked:
+        for rank, pid in enumerate(ids, 1):
+            scores[pid] = scores.get(pid, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda x: -x[1])
+
+
+class HybridSearcher:
+    def __init__(
+        self,
+        client: SearchClient,
+        sparse: SparseIndex,
+        *,
+        collection: str,
+        candidates: int = 50,
+        rrf_k: int = 60,
+    ) -> None:
+        self.client = client
+        self.sparse = sparse
+        self.collection = collection
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.latency = {stage: LatencyWindow() for stage in ("dense", "sparse", "fetch", "fuse")}
+
+    def search(
+        self,
+        *,
+        query: str,
+        vector: Sequence[float],
+        limit: int,
+        corpus_ver: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        n = max(limit, self.candidates)
+
+        t0 = time.perf_counter()
+        dense = self.client.search(
+            collection=self.collection,
+            vector=vector.tolist() if hasattr(vector, "tolist") else list(vector),
+            limit=n,
+            with_payload=HIT_FIELDS,
+            filter_payload=corpus_filter(corpus_ver),
+        )
+        t1 = time.perf_counter()
+        sparse = self.sparse.search(query, n)
+        t2 = time.perf_counter()
+
+        fused = rrf_fuse([[str(h["id"]) for h in dense], [pid for pid, _ in sparse]], self.rrf_k)
+        t3 = time.perf_counter()
+
+        by_id: Dict[str, Dict[str, Any]] = {str(h["id"]): h for h in dense}
+        dense_rank = {pid: r for r, pid in enumerate(by_id, 1)}
+        sparse_rank = {pid: (r, s) for r, (pid, s) in enumerate(sparse, 1)}
+
+        missing = [pid for pid, _ in fused if pid not in by_id]
+        if missing:
+            for p in self.client.retrieve(collection=self.collection, ids=missing, with_payload=HIT_FIELDS):
+                payload = p.get("payload") or {}
+                if corpus_ver and payload.get("corpus_version") != corpus_ver:
+                    continue
+                by_id[str(p["id"])] = p
+        t4 = time.perf_counter()
+
+        hits: List[Dict[str, Any]] = []
+        for pid, score in fused:
+            p = by_id.get(pid)
+            if p is None:
+                continue
+            hit = {"id": p["id"], "score": score, "payload": p.get("payload") or {}}
+            if pid in dense_rank:
+                hit["dense_rank"] = dense_rank[pid]
+                hit["dense_score"] = p.get("score")
+            if pid in sparse_rank:
+                hit["sparse_rank"], hit["sparse_score"] = sparse_rank[pid]
+            hits.append(hit)
+            if len(hits) >= limit:
+                break
+        t5 = time.perf_counter()
+
+        self.latency["dense"].add(t1 - t0)
+        self.latency["sparse"].add(t2 - t1)
+        self.latency["fetch"].add(t4 - t3)
+        self.latency["fuse"].add((t3 - t2) + (t5 - t4))
+        return hits
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "candidates": self.candidates,
+            "rrf_k": self.rrf_k,
+            **{stage: w.summary() for stage, w in self.latency.items()},
+            "sparse_index": self.sparse.stats(),
+        }
+
+
+def open_hybrid(infra: InfraSettings, client: SearchClient, config_fingerprint: str) -> Optional[HybridSearcher]:
+    """
+    HybridSearcher over the sparse index ingest built for this config, or
+    None if there isn't one yet.
+    """
+    path = sparse_index_path(infra, config_fingerprint)
+    if not os.path.exists(os.path.join(path, "sparse.json")):
+        return None
+    return HybridSearcher(
+        client,
+        SparseIndex(path),
+        collection=infra.qdrant_collection,
+        candidates=infra.hybrid_candidates,
+        rrf_k=infra.rrf_k,
+    )
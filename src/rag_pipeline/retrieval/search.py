@@ -0,0 +1,61 @@
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
+
+from rag_pipeline.backends import SearchClient
+
+if TYPE_CHECKING:
+    from rag_pipeline.embedding.embedder import Embedder
+    from rag_pipeline.indexing.chunk_store import ChunkStore
+
+# payload keys a search hit needs for display. Text normally comes from the
+# ChunkStore; "text" is only still present on points written before that.
+HIT_FIELDS = ["doc_id", "file_name", "chunk_index", "corpus_version", "text"]
+
+
+def corpus_filter(corpus_ver: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not corpus_ver:
+        return None
+    return {"must": [{"key": "corpus_version", "match": {"value": corpus_ver}}]}
+
+
+def attach_text(hits: List[Dict[str, Any]], store: Optional["ChunkStore"]) -> List[Dict[str, Any]]:
+    """
+    Fill payload["text"] from the chunk store, in place. Points written
+    before payloads were slimmed still carry their own text.
+    """
+    if store is None:
+        return hits
+    need = [str(h["id"]) for h in hits if "text" not in (h.get("payload") or {})]
+    texts = store.get_many(need)
+    for h in hits:
+        t = texts.get(str(h["id"]))
+        if t is not None:
+            h.setdefault("payload", {})["text"] = t
+    return hits
+
+
+def encode_and_search(
+    embedder: "Embedder",
+    qdrant: SearchClient,
+    *,
+    collection: str,
+    queries: List[str],
+    limit: int,
+    corpus_ver: Optional[str] = None,
+    with_payload: Union[bool, List[str]] = True,
+    chunk_size: int = 64,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Encode all queries in embedder-sized batches, then search them through
+    /points/search/batch. Hits are returned per query, in input order.
+    """
+    if not queries:
+        return []
+    vectors = embedder.encode(queries)
+    return qdrant.search_batch(
+        collection=collection,
+        vectors=vectors,
+        limit=limit,
+        with_payload=with_payload,
+        filter_payload=corpus_filter(corpus_ver),
+        chunk_size=chunk_size,
+    )
@@ -0,0 +1,393 @@
+"""
+Long-running retrieval service.
+
+    POST /search   {"query": "...", "limit": 8, "corpus_version": "..."}
+    GET  /stats    latency percentiles, batch sizes, in-flight counts
+    GET  /metrics  Prometheus text format (Qdrant request histograms, retries)
+    GET  /healthz
+
+The model is loaded once, before the port opens. Queries arriving within
+SERVE_BATCH_WAIT_MS of each other are encoded together in one batched
+call. Dense searches against Qdrant go out on the event loop through
+AsyncQdrantHttp (pooled, circuit breaker, optional hedging: QDRANT_HEDGE);
+hybrid search and the local backend run on a bounded thread pool.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from rag_pipeline.embedding.embedder import Embedder
+from rag_pipeline.indexing.chunk_store import ChunkStore
+from rag_pipeline.backends import SearchClient, chunk_store_path, make_async_search_client, make_search_client
+from rag_pipeline.logging_setup import log, setup_logging
+from rag_pipeline.metrics import METRICS
+from rag_pipeline.profiling import profile_run
+from rag_pipeline.retrieval.cache import QueryEmbeddingCache, ResultCache
+from rag_pipeline.retrieval.hybrid import HybridSearcher, open_hybrid
+from rag_pipeline.retrieval.search import HIT_FIELDS, attach_text, corpus_filter
+from rag_pipeline.settings import InfraSettings, env_field, load_pipeline_config
+from rag_pipeline.stats import LatencyWindow, percentile
+from rag_pipeline.versioning import config_fingerprint
+
+if TYPE_CHECKING:
+    from rag_pipeline.http.async_qdrant_http import AsyncQdrantHttp
+
+logger = logging.getLogger("rag_pipeline.retrieval.service")
+
+
+@dataclass(frozen=True)
+class ServiceSettings:
+    host: str = env_field("SERVE_HOST", "127.0.0.1")
+    port: int = env_field("SERVE_PORT", "8080", int)
+    max_batch: int = env_field("SERVE_MAX_BATCH", "32", int)
+    batch_wait_ms: float = env_field("SERVE_BATCH_WAIT_MS", "5", float)
+    max_concurrency: int = env_field("SERVE_MAX_CONCURRENCY", "64", int)
+    default_limit: int = env_field("SERVE_TOP_K", "8", int)
+
+
+class QueryBatcher:
+    """
+    Coalesces concurrent encode requests into one batched call.
+
+    The first query opens a window of max_wait_s; everything that arrives
+    before it closes (up to max_batch) is encoded together on a single
+    dedicated thread, so the model never runs two batches at once.
+    """
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], max_batch: int, max_wait_s: float) -> None:
+        self._encode = encode
+        self.max_batch = max(1, max_batch)
+        self.max_wait_s = max(0.0, max_wait_s)
+        self._queue: "asyncio.Queue[Tuple[str, asyncio.Future]]" = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="encode")
+        self._task: Optional[asyncio.Task] = None
+
+        self.batch_sizes: Deque[int] = deque(maxlen=2048)
+        self.batches = 0
+        self.encode_latency = LatencyWindow()
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=False)
+
+    async def encode(self, text: str) -> np.ndarray:
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, fut))
+        return await fut
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_s
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            texts = [t for t, _ in batch]
+            t0 = time.perf_counter()
+            try:
+                vecs = await loop.run_in_executor(self._executor, self._encode, texts)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.encode_latency.add(time.perf_counter() - t0)
+            self.batch_sizes.append(len(batch))
+            self.batches += 1
+            for (_, fut), vec in zip(batch, vecs):
+                if not fut.done():
+                    fut.set_result(vec)
+
+    def stats(self) -> Dict[str, Any]:
+        sizes = list(self.batch_sizes)
+        return {
+            "batches": self.batches,
+            "batch_size_p50": percentile(sizes, 50),
+            "batch_size_max": max(sizes) if sizes else 0,
+            "encode": self.encode_latency.summary(),
+        }
+
+
+class RetrievalService:
+    def __init__(
+        self,
+        infra: InfraSettings,
+        svc: ServiceSettings,
+        embedder: Embedder,
+        qdrant: SearchClient,
+        hybrid: Optional[HybridSearcher] = None,
+        chunks: Optional[ChunkStore] = None,
+        aqdrant: Optional["AsyncQdrantHttp"] = None,
+    ) -> None:
+        self.infra = infra
+        self.svc = svc
+        self.embedder = embedder
+        self.qdrant = qdrant
+        self.hybrid = hybrid
+        self.chunks = chunks
+        self.aqdrant = aqdrant
+        self.batcher = QueryBatcher(embedder.encode, svc.max_batch, svc.batch_wait_ms / 1000.0)
+        self.query_cache = QueryEmbeddingCache(embedder.model_name, embedder.normalize, infra.query_cache_size)
+        self.result_cache = ResultCache(
+            infra.runs_dir, infra.result_cache_size, infra.result_cache_ttl_s, infra.corpus_check_s
+        )
+        self._search_pool = ThreadPoolExecutor(max_workers=max(1, svc.max_concurrency), thread_name_prefix="search")
+        self._slots = asyncio.Semaphore(max(1, svc.max_concurrency))
+
+        self.total_latency = LatencyWindow()
+        self.search_latency = LatencyWindow()
+        self.in_flight = 0
+        self.errors = 0
+
+    async def search(self, query: str, limit: int, corpus_ver: Optional[str]) -> List[Dict[str, Any]]:
+        t0 = time.perf_counter()
+        async with self._slots:
+            self.in_flight += 1
+            try:
+                vec = self.query_cache.get(query)
+                if vec is None:
+                    vec = await self.batcher.encode(query)
+                    self.query_cache.put(query, vec)
+
+                rkey = ResultCache.key(vec, corpus_ver, limit)
+                cached = self.result_cache.get(rkey)
+                if cached is not None:
+                    self.total_latency.add(time.perf_counter() - t0)
+                    return cached
+
+                filter_payload = corpus_filter(corpus_ver)
+
+                t_s0 = time.perf_counter()
+                loop = asyncio.get_running_loop()
+                if self.hybrid is not None:
+                    hybrid = self.hybrid
+                    hits = await loop.run_in_executor(
+                        self._search_pool,
+                        lambda: hybrid.search(query=query, vector=vec, limit=limit, corpus_ver=corpus_ver),
+                    )
+                elif self.aqdrant is not None:
+                    hits = await self.aqdrant.search(
+                        collection=self.infra.qdrant_collection,
+                        vector=vec.tolist(),
+                        limit=limit,
+                        with_payload=HIT_FIELDS,
+                        filter_payload=filter_payload,
+                    )
+                else:
+                    hits = await loop.run_in_executor(
+                        self._search_pool,
+                        lambda: self.qdrant.search(
+                            collection=self.infra.qdrant_collection,
+                            vector=vec.tolist(),
+                            limit=limit,
+                            with_payload=HIT_FIELDS,
+                            filter_payload=filter_payload,
+                        ),
+                    )
+                hits = await loop.run_in_executor(self._search_pool, attach_text, hits, self.chunks)
+                self.search_latency.add(time.perf_counter() - t_s0)
+                self.result_cache.put(rkey, hits)
+            finally:
+                self.in_flight -= 1
+        self.total_latency.add(time.perf_counter() - t0)
+        return hits
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.total_latency.summary(),
+            "search": self.search_latency.summary(),
+            "query_batching": self.batcher.stats(),
+            "query_cache": self.query_cache.stats(),
+            "result_cache": self.result_cache.stats(),
+            "hybrid": self.hybrid.stats() if self.hybrid is not None else None,
+            "qdrant": self.aqdrant.stats() if self.aqdrant is not None else None,
+            "in_flight": self.in_flight,
+            "errors": self.errors,
+            "settings": {
+                "max_batch": self.svc.max_batch,
+                "batch_wait_ms": self.svc.batch_wait_ms,
+                "max_concurrency": self.svc.max_concurrency,
+            },
+        }
+
+    # ---- minimal HTTP/1.1 front end ----
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    break
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = line.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                try:
+                    n = int(headers.get("content-length") or 0)
+                except ValueError:
+                    n = -1
+                if n < 0:
+                    # the body's extent is unknown: answer and drop the connection
+                    await self._respond(writer, "400 Bad Request", {"error": "invalid Content-Length"}, False)
+                    break
+                body = await reader.readexactly(n) if n else b""
+
+                try:
+                    status, payload = await self._route(method, path, body)
+                except Exception as e:
+                    self.errors += 1
+                    log(logger, "request_failed", method=method, path=path, error=repr(e))
+                    status, payload = "500 Internal Server Error", {"error": "internal error"}
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: str, payload: Any, keep_alive: bool) -> None:
+        if isinstance(payload, str):
+            data, ctype = payload.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            data, ctype = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json"
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: {ctype}\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+            + data
+        )
+        await writer.drain()
+
+    def _search_args(self, body: bytes) -> Tuple[str, int, Optional[str]]:
+        """
+        (query, limit, corpus_version) from a /search body; ValueError with
+        the message for the client if it is malformed.
+        """
+        try:
+            req = json.loads(body or b"{}")
+        except ValueError:
+            raise ValueError("body is not valid JSON")
+        if not isinstance(req, dict):
+            raise ValueError("body must be a JSON object")
+        query = req.get("query")
+        if not isinstance(query, str) or not query.strip():
+            raise ValueError("'query' must be a non-empty string")
+        limit = req.get("limit")
+        if limit is None:
+            limit = self.svc.default_limit
+        elif isinstance(limit, bool) or not isinstance(limit, int) or limit < 1:
+            raise ValueError("'limit' must be a positive integer")
+        corpus_ver = req.get("corpus_version")
+        if corpus_ver is not None and not isinstance(corpus_ver, str):
+            raise ValueError("'corpus_version' must be a string")
+        return query.strip(), limit, (corpus_ver or "").strip() or None
+
+    async def _route(self, method: str, path: str, body: bytes) -> Tuple[str, Any]:
+        if method == "GET" and path == "/healthz":
+            return "200 OK", {"ok": True}
+        if method == "GET" and path == "/stats":
+            return "200 OK", self.stats()
+        if method == "GET" and path == "/metrics":
+            return "200 OK", METRICS.render()
+        if method == "POST" and path == "/search":
+            try:
+                query, limit, corpus_ver = self._search_args(body)
+            except ValueError as e:
+                return "400 Bad Request", {"error": str(e)}
+            try:
+                hits = await self.search(query, limit, corpus_ver)
+            except Exception as e:
+                self.errors += 1
+                log(logger, "search_failed", error=str(e))
+                return "502 Bad Gateway", {"error": str(e)}
+            return "200 OK", {"hits": hits}
+        return "404 Not Found", {"error": f"no route for {method} {path}"}
+
+
+async def serve(service: RetrievalService) -> None:
+    service.batcher.start()
+    server = await asyncio.start_server(service.handle, service.svc.host, service.svc.port)
+    log(logger, "service_start",
+        host=service.svc.host,
+        port=service.svc.port,
+        collection=service.infra.qdrant_collection,
+        embed_model=service.embedder.model_name,
+        retrieval_mode="hybrid" if service.hybrid is not None else "dense",
+        max_batch=service.svc.max_batch,
+        batch_wait_ms=service.svc.batch_wait_ms,
+        max_concurrency=service.svc.max_concurrency,
+    )
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.batcher.stop()
+        if service.aqdrant is not None:
+            await service.aqdrant.aclose()
+
+
+def main() -> None:
+    infra = InfraSettings()
+    svc = ServiceSettings()
+    setup_logging(infra.log_level)
+
+    pipe, raw_cfg = load_pipeline_config(infra.pipeline_config)
+    embedder = Embedder(pipe.embed_model, svc.max_batch, pipe.embed_normalize,
+                        backend=pipe.embed_backend, onnx_file=pipe.embed_onnx_file,
+                        hf_cache_dir=infra.hf_cache_dir or None)
+    # load before listening: the first request should not pay for it
+    embedder.warm_up()
+    qdrant = make_search_client(infra, timeout_s=20.0, max_retries=3, max_connections=svc.max_concurrency)
+    aqdrant = make_async_search_client(infra, timeout_s=20.0, max_retries=3, max_connections=svc.max_concurrency)
+
+    hybrid = None
+    if infra.retrieval_mode == "hybrid":
+        hybrid = open_hybrid(infra, qdrant, config_fingerprint(raw_cfg))
+        if hybrid is None:
+            log(logger, "hybrid_unavailable", reason="no sparse index for this config; serving dense only")
+
+    service = RetrievalService(infra, svc, embedder, qdrant, hybrid, ChunkStore(chunk_store_path(infra)), aqdrant)
+    # PROFILE=sample is meant for this: reports land in runs_dir/serve_<ts>/ at shutdown
+    try:
+        with profile_run(infra, "serve"):
+            asyncio.run(serve(service))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        qdrant.close()
+
+
+if __name__ == "__main__":
+    main()
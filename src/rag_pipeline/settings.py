@@ -1,27 +1,169 @@
+import importlib.util
 import os
-from dataclasses import dataclass
-from typing import Any, Dict, Tuple
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
 
-import yaml
-from dotenv import load_dotenv
+_dotenv_loaded = False
 
-load_dotenv()
+
+def getenv(name: str, default: str) -> str:
+    """
+    os.getenv with .env loaded first. Loading happens on the first call,
+    not at import, so importing the package stays cheap; settings read
+    the environment when they are constructed.
+    """
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _dotenv_loaded = True
+    return os.getenv(name, default)
+
+
+def env_field(name: str, default: str, cast: Callable[[str], Any] = str) -> Any:
+    return field(default_factory=lambda: cast(getenv(name, default)))
+
+
+def _flag(v: str) -> bool:
+    return v.lower() in ("1", "true", "yes")
+
+
+def _lower(v: str) -> str:
+    return v.strip().lower()
+
+
+def _no_trailing_slash(v: str) -> str:
+    return v.rstrip("/")
+
+
+def enforce_hf_offline(hf_cache_dir: str) -> None:
+    """
+    With a cache dir configured, models come from it only: turn the HF
+    libraries' offline switches on before they are first imported (they
+    read them at import).
+    """
+    if hf_cache_dir:
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
 
 
 @dataclass(frozen=True)
 class InfraSettings:
-    env: str = os.getenv("ENV", "dev")
-    log_level: str = os.getenv("LOG_LEVEL", "INFO")
+    env: str = env_field("ENV", "dev")
+    log_level: str = env_field("LOG_LEVEL", "INFO")
+
+    qdrant_url: str = env_field("QDRANT_URL", "http://localhost:6333", _no_trailing_slash)
+    qdrant_collection: str = env_field("QDRANT_COLLECTION", "rag_collection")
+
+    # "qdrant" (REST) or "local" (in-process index under local_index_dir)
+    index_backend: str = env_field("INDEX_BACKEND", "qdrant", _lower)
+    local_index_dir: str = env_field("LOCAL_INDEX_DIR", "data/local_index")
+
+    # chunk text lives here, keyed by point ID; payloads stay slim
+    chunk_store_dir: str = env_field("CHUNK_STORE_DIR", "data/chunk_store")
+
+    # BM25 index built alongside the vectors; RETRIEVAL_MODE=hybrid fuses it
+    # with dense hits by reciprocal rank fusion
+    sparse_index: bool = env_field("SPARSE_INDEX", "true", _flag)
+    sparse_index_dir: str = env_field("SPARSE_INDEX_DIR", "data/sparse_index")
+    retrieval_mode: str = env_field("RETRIEVAL_MODE", "dense", _lower)
+    hybrid_candidates: int = env_field("HYBRID_CANDIDATES", "50", int)
+    rrf_k: int = env_field("RRF_K", "60", int)
+
+    pdf_dir: str = env_field("PDF_DIR", "data/raw/pdfs")
+    runs_dir: str = env_field("RUNS_DIR", "data/runs")
+    ingested_dir: str = env_field("INGESTED_DIR", "data/ingested")
 
-    qdrant_url: str = os.getenv("QDRANT_URL", "http://localhost:6333").rstrip("/")
-    qdrant_collection: str = os.getenv("QDRANT_COLLECTION", "rag_collection")
+    pipeline_config: str = env_field("PIPELINE_CONFIG", "configs/pipeline.yaml")
+    # models are loaded from this HuggingFace cache only (offline); "" = hub default, may download
+    hf_cache_dir: str = env_field("HF_CACHE_DIR", "hf_cache")
+    # load the embedding model in the background at startup instead of on first query
+    warm_start: bool = env_field("WARM_START", "false", _flag)
+    eval_dir: str = env_field("EVAL_DIR", "data/eval")
 
-    pdf_dir: str = os.getenv("PDF_DIR", "data/raw/pdfs")
-    runs_dir: str = os.getenv("RUNS_DIR", "data/runs")
-    ingested_dir: str = os.getenv("INGESTED_DIR", "data/ingested")
+    # ingest parallelism (runtime only, not part of the config fingerprint)
+    hash_workers: int = env_field("HASH_WORKERS", "8", int)
+    extract_workers: int = env_field("EXTRACT_WORKERS", str(max(1, (os.cpu_count() or 2) - 1)), int)
+    extract_queue_size: int = env_field("EXTRACT_QUEUE_SIZE", "8", int)
+    embed_window_batches: int = env_field("EMBED_WINDOW_BATCHES", "8", int)
+    # embedding worker processes, each with its own model (0 = embed in-process);
+    # threads per worker 0 = cpu_count // workers
+    embed_workers: int = env_field("EMBED_WORKERS", "0", int)
+    embed_threads_per_worker: int = env_field("EMBED_THREADS_PER_WORKER", "0", int)
 
-    pipeline_config: str = os.getenv("PIPELINE_CONFIG", "configs/pipeline.yaml")
-    eval_dir: str = os.getenv("EVAL_DIR", "data/eval")
+    # per-page extraction guards: wall-clock limit and text cap (0 = none). A doc
+    # with a page cut by either is indexed but not recorded as done, so later
+    # runs retry it
+    page_timeout_s: float = env_field("PAGE_TIMEOUT_S", "0", float)
+    max_page_chars: int = env_field("MAX_PAGE_CHARS", "0", int)
+
+    # content-addressed embedding cache, 0 entries = disabled
+    embed_cache_dir: str = env_field("EMBED_CACHE_DIR", "data/embed_cache")
+    embed_cache_max_entries: int = env_field("EMBED_CACHE_MAX_ENTRIES", "2000000", int)
+
+    # concurrent upserts: batches in flight (0 = synchronous), Qdrant wait flag,
+    # and how many acked docs to collect before a barrier + state write
+    upsert_in_flight: int = env_field("UPSERT_IN_FLIGHT", "4", int)
+    upsert_wait: bool = env_field("UPSERT_WAIT", "false", _flag)
+    state_checkpoint_docs: int = env_field("STATE_CHECKPOINT_DOCS", "32", int)
+
+    # Prometheus textfile (node_exporter textfile collector), rewritten at
+    # every ingest checkpoint; "" = off. Stage summaries go in the manifest either way.
+    metrics_textfile: str = env_field("METRICS_TEXTFILE", "")
+
+    # opt-in profiling (profiling.py), reports under runs_dir/<run_id>/:
+    # PROFILE=cprofile|sample, sampler rate, tracemalloc snapshot every N docs (0 = off)
+    profile: str = env_field("PROFILE", "", _lower)
+    profile_sample_hz: float = env_field("PROFILE_SAMPLE_HZ", "50", float)
+    profile_tracemalloc_every: int = env_field("PROFILE_TRACEMALLOC_EVERY", "0", int)
+    profile_tracemalloc_frames: int = env_field("PROFILE_TRACEMALLOC_FRAMES", "1", int)
+
+    # INGEST_MODE=distributed: workers on any number of machines share one run
+    # through leases in LEASE_DB (SQLite on a shared volume). RUN_ID defaults
+    # to a hash of the work to do, so workers started on the same corpus agree;
+    # a finalized run's work set starts a new generation of it.
+    ingest_mode: str = env_field("INGEST_MODE", "single", _lower)
+    lease_db: str = env_field("LEASE_DB", "data/ingested/leases.sqlite")
+    worker_id: str = env_field("WORKER_ID", "")
+    run_id: str = env_field("RUN_ID", "")
+    lease_s: float = env_field("LEASE_S", "120", float)
+    lease_batch: int = env_field("LEASE_BATCH", "2", int)
+    lease_max_attempts: int = env_field("LEASE_MAX_ATTEMPTS", "3", int)
+
+    # async Qdrant client of the retrieval service (http/async_qdrant_http.py):
+    # HTTP/2 where negotiated, a circuit breaker, and hedged reads - a duplicate
+    # after the route's recent p95, for at most QDRANT_HEDGE_MAX_RATIO of requests
+    qdrant_http2: bool = env_field("QDRANT_HTTP2", "true", _flag)
+    qdrant_keepalive_s: float = env_field("QDRANT_KEEPALIVE_S", "30", float)
+    qdrant_breaker_failures: int = env_field("QDRANT_BREAKER_FAILURES", "5", int)
+    qdrant_breaker_reset_s: float = env_field("QDRANT_BREAKER_RESET_S", "10", float)
+    qdrant_hedge: bool = env_field("QDRANT_HEDGE", "false", _flag)
+    qdrant_hedge_min_delay_ms: float = env_field("QDRANT_HEDGE_MIN_DELAY_MS", "5", float)
+    qdrant_hedge_max_ratio: float = env_field("QDRANT_HEDGE_MAX_RATIO", "0.1", float)
+
+    # retrieval caches (0 entries = disabled)
+    query_cache_size: int = env_field("QUERY_CACHE_SIZE", "10000", int)
+    result_cache_size: int = env_field("RESULT_CACHE_SIZE", "10000", int)
+    result_cache_ttl_s: float = env_field("RESULT_CACHE_TTL_S", "300", float)
+    corpus_check_s: float = env_field("CORPUS_CHECK_S", "5", float)
+
+
+@dataclass(frozen=True)
+class IndexConfig:
+    """
+    Vector index storage/search settings (pipeline.yaml `index:`).
+    They change how vectors are stored, not what is embedded, so they are
+    left out of the config fingerprint.
+    """
+    hnsw_m: int = 16
+    hnsw_ef_construct: int = 100
+    hnsw_on_disk: bool = False
+    quantization: str = "none"          # none | int8
+    quantization_always_ram: bool = True
+    vectors_on_disk: bool = False
+    payload_indexes: Tuple[str, ...] = ("corpus_version", "doc_id", "config_fingerprint")
+    on_drift: str = "warn"              # warn | update | fail
 
 
 @dataclass(frozen=True)
@@ -31,10 +173,14 @@ class PipelineConfig:
     embed_model: str
     embed_batch_size: int
     embed_normalize: bool
+    embed_backend: str          # torch | torch_int8 | onnx
+    embed_onnx_file: str        # onnx only; "" = the repo's onnx/model.onnx
 
     chunk_chars: int
     chunk_overlap: int
     max_chunks_per_doc: int
+    chunk_max_tokens: int       # tokens_v1; 0 = the model's max sequence length
+    chunk_overlap_tokens: int
 
     max_files: int
     only_match: str
@@ -43,8 +189,33 @@ class PipelineConfig:
     cleaner_version: str
     chunker_version: str
 
+    index: IndexConfig = IndexConfig()
+
+
+def _index_config(raw: Optional[Dict[str, Any]]) -> IndexConfig:
+    raw = raw or {}
+    hnsw = raw.get("hnsw") or {}
+    d = IndexConfig()
+    cfg = IndexConfig(
+        hnsw_m=int(hnsw.get("m", d.hnsw_m)),
+        hnsw_ef_construct=int(hnsw.get("ef_construct", d.hnsw_ef_construct)),
+        hnsw_on_disk=bool(hnsw.get("on_disk", d.hnsw_on_disk)),
+        quantization=str(raw.get("quantization", d.quantization)).lower(),
+        quantization_always_ram=bool(raw.get("quantization_always_ram", d.quantization_always_ram)),
+        vectors_on_disk=bool(raw.get("vectors_on_disk", d.vectors_on_disk)),
+        payload_indexes=tuple(str(f) for f in raw.get("payload_indexes", d.payload_indexes)),
+        on_drift=str(raw.get("on_drift", d.on_drift)).lower(),
+    )
+    if cfg.quantization not in ("none", "int8"):
+        raise ValueError(f"index.quantization must be 'none' or 'int8', got {cfg.quantization!r}")
+    if cfg.on_drift not in ("warn", "update", "fail"):
+        raise ValueError(f"index.on_drift must be warn|update|fail, got {cfg.on_drift!r}")
+    return cfg
+
 
 def load_pipeline_config(path: str) -> Tuple[PipelineConfig, Dict[str, Any]]:
+    import yaml
+
     with open(path, "r", encoding="utf-8") as f:
         raw: Dict[str, Any] = yaml.safe_load(f)
 
@@ -54,10 +225,14 @@ def load_pipeline_config(path: str) -> Tuple[PipelineConfig, Dict[str, Any]]:
         embed_model=str(raw["embedding"]["model"]),
         embed_batch_size=int(raw["embedding"].get("batch_size", 32)),
         embed_normalize=bool(raw["embedding"].get("normalize", True)),
+        embed_backend=str(raw["embedding"].get("backend", "torch")).strip().lower(),
+        embed_onnx_file=str(raw["embedding"].get("onnx_file", "") or "").strip(),
 
         chunk_chars=int(raw["chunking"]["chunk_chars"]),
         chunk_overlap=int(raw["chunking"]["overlap"]),
         max_chunks_per_doc=int(raw["chunking"].get("max_chunks_per_doc", 0)),
+        chunk_max_tokens=int(raw["chunking"].get("max_tokens", 0)),
+        chunk_overlap_tokens=int(raw["chunking"].get("overlap_tokens", 32)),
 
         max_files=int(raw["ingest"].get("max_files", 0)),
         only_match=str(raw["ingest"].get("only_match", "")).strip(),
@@ -65,6 +240,18 @@ def load_pipeline_config(path: str) -> Tuple[PipelineConfig, Dict[str, Any]]:
 
         cleaner_version=str(raw.get("cleaner_version", "clean_v1")),
         chunker_version=str(raw.get("chunker_version", "chars_v1")),
+
+        index=_index_config(raw.get("index")),
     )
+    if cfg.embed_backend not in ("torch", "torch_int8", "onnx"):
+        raise ValueError(f"embedding.backend must be torch|torch_int8|onnx, got {cfg.embed_backend!r}")
+    if cfg.embed_backend == "onnx":
+        # optional dependencies, not in requirment.txt; fail here, not at the first model load
+        missing = [m for m in ("optimum", "onnxruntime") if importlib.util.find_spec(m) is None]
+        if missing:
+            raise ValueError(f"embedding.backend=onnx needs {', '.join(missing)}: "
+                             "pip install 'optimum[onnxruntime]'")
+    if cfg.chunker_version not in ("chars_v1", "tokens_v1"):
+        raise ValueError(f"chunker_version must be chars_v1 or tokens_v1, got {cfg.chunker_version!r}")
 
     return cfg, raw
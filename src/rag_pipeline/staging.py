@@ -0,0 +1,157 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from rag_pipeline.chunking.chunker import ChunkingSpec, chunk_pages
+from rag_pipeline.loaders.pdf_loader import LoadReport, iter_pdf_pages
+from rag_pipeline.metrics import METRICS
+
+
+@dataclass
+class ExtractedDoc:
+    path: str
+    doc_id: str
+    file_name: str
+    chunks: List[str] = field(default_factory=list)
+    token_ids: Optional[List[List[int]]] = None  # per chunk, tokens_v1 only
+    reason: Optional[str] = None   # set when the doc must be skipped
+    extract_s: float = 0.0
+    load: LoadReport = field(default_factory=LoadReport)
+    metrics: Optional[Dict[str, Any]] = None   # recorded in a pool worker, merged by the parent
+
+
+def extract_doc(
+    path: str,
+    doc_id: str,
+    spec: ChunkingSpec,
+    page_timeout_s: float = 0.0,
+    max_page_chars: int = 0,
+) -> ExtractedDoc:
+    """
+    CPU-bound half of ingest: PDF text extraction + chunking.
+    Runs inside pool workers, so it only touches picklable inputs/outputs.
+    Pages are chunked as they are extracted, so only about a page of text
+    is held at a time and pages past max_chunks are never read.
+    """
+    t0 = time.time()
+    doc = ExtractedDoc(path=path, doc_id=doc_id, file_name=os.path.basename(path))
+    pages = iter_pdf_pages(path, doc.load, page_timeout_s=page_timeout_s, max_page_chars=max_page_chars)
+    try:
+        doc.chunks, doc.token_ids = chunk_pages(pages, spec)
+        if not doc.load.pages_used:
+            doc.reason = "unreadable_or_no_text"
+        elif not doc.chunks:
+            doc.reason = "zero_chunks"
+    except Exception as e:
+        doc.reason = f"extract_failed: {e}"
+    finally:
+        pages.close()
+    doc.extract_s = time.time() - t0
+    return doc
+
+
+def _extract_in_worker(
+    path: str,
+    doc_id: str,
+    spec: ChunkingSpec,
+    page_timeout_s: float,
+    max_page_chars: int,
+) -> ExtractedDoc:
+    doc = extract_doc(path, doc_id, spec, page_timeout_s, max_page_chars)
+    doc.metrics = METRICS.drain()
+    return doc
+
+
+_DONE = object()
+
+
+def iter_extracted(
+    docs: Iterable[Tuple[str, str]],
+    *,
+    spec: ChunkingSpec,
+    workers: int,
+    queue_size: int,
+    page_timeout_s: float = 0.0,
+    max_page_chars: int = 0,
+) -> Iterator[ExtractedDoc]:
+    """
+    Yield extracted docs in input order.
+
+    workers <= 0 extracts inline (useful for debugging). Otherwise a feeder
+    thread keeps a process pool busy and pushes finished docs into a bounded
+    queue, so extraction runs ahead of embedding by at most queue_size docs.
+    """
+    if workers <= 0:
+        for path, doc_id in docs:
+            yield extract_doc(path, doc_id, spec, page_timeout_s, max_page_chars)
+        return
+
+    out: "queue.Queue[object]" = queue.Queue(maxsize=max(1, queue_size))
+    stop = threading.Event()
+
+    def put(item: object) -> bool:
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def feed() -> None:
+        # spawn: the parent has torch loaded, forking it is not safe
+        ctx = multiprocessing.get_context("spawn")
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+                in_flight: List[Tuple[Future, str, str]] = []
+                it = iter(docs)
+                exhausted = False
+                while not stop.is_set():
+                    # keep every worker busy plus one queued task each
+                    while not exhausted and len(in_flight) < workers * 2:
+                        nxt = next(it, None)
+                        if nxt is None:
+                            exhausted = True
+                            break
+                        path, doc_id = nxt
+                        fut = pool.submit(_extract_in_worker, path, doc_id, spec, page_timeout_s, max_page_chars)
+                        in_flight.append((fut, path, doc_id))
+                    if not in_flight:
+                        break
+                    fut, path, doc_id = in_flight.pop(0)
+                    try:
+                        doc = fut.result()
+                    except Exception as e:
+                        # worker died (e.g. OOM-killed) -> record the doc as failed and move on
+                        doc = ExtractedDoc(path=path, doc_id=doc_id, file_name=os.path.basename(path),
+                                           reason=f"extract_failed: {e}")
+                    if doc.metrics is not None:
+                        METRICS.merge(doc.metrics)
+                        doc.metrics = None
+                    if not put(doc):
+                        break
+                for fut, _, _ in in_flight:
+                    fut.cancel()
+        except BaseException as e:
+            put(e)
+        finally:
+            put(_DONE)
+
+    t = threading.Thread(target=feed, name="extract-feeder", daemon=True)
+    t.start()
+    try:
+        while True:
+            item = out.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item  # type: ignore[misc]
+    finally:
+        stop.set()
+        t.join()
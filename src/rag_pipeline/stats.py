@@ -0,0 +1,42 @@
+import math
+import threading
+from collections import deque
+from typing import Deque, Dict, Iterable, List
+
+
+def percentile(values: Iterable[float], q: float) -> float:
+    """
+    Nearest-rank percentile, q in [0, 100]. Returns 0.0 for no data.
+    """
+    data: List[float] = sorted(values)
+    if not data:
+        return 0.0
+    k = max(0, min(len(data) - 1, math.ceil(q / 100.0 * len(data)) - 1))
+    return data[k]
+
+
+class LatencyWindow:
+    """
+    Thread-safe sliding window of the last `size` latency samples (seconds).
+    """
+    def __init__(self, size: int = 2048) -> None:
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            data = list(self._samples)
+            count = self.count
+        return {
+            "count": count,
+            "p50_ms": round(percentile(data, 50) * 1000, 2),
+            "p95_ms": round(percentile(data, 95) * 1000, 2),
+            "p99_ms": round(percentile(data, 99) * 1000, 2),
+            "max_ms": round(max(data) * 1000, 2) if data else 0.0,
+        }
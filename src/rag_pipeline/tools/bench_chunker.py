@@ -0,0 +1,84 @@
+"""
+chars_v1 vs tokens_v1 chunking: embed time per document and how much of
+each chunk the model actually sees.
+
+Both modes chunk the same extracted PDF text and embed it with the cache
+off. chars_v1 chunks are tokenized by the model (and truncated at its max
+sequence length); tokens_v1 chunks are embedded from the chunker's token
+IDs. "truncated" counts word-pieces that were tokenized but cut off.
+
+    PDF_DIR=data/raw/pdfs BENCH_DOCS=20 python -m rag_pipeline.tools.bench_chunker
+"""
+import glob
+import os
+import time
+from typing import Any, Dict, List
+
+from rag_pipeline.chunking.chunker import ChunkingSpec, chunk_document, get_tokenizer
+from rag_pipeline.embedding.embedder import Embedder
+from rag_pipeline.loaders.pdf_loader import read_pdf_text_best_effort
+from rag_pipeline.settings import InfraSettings, load_pipeline_config
+
+
+def main() -> None:
+    infra = InfraSettings()
+    pipe, _ = load_pipeline_config(infra.pipeline_config)
+    n_docs = int(os.getenv("BENCH_DOCS", "20"))
+
+    paths = sorted(glob.glob(os.path.join(infra.pdf_dir, "*.pdf")))[:n_docs]
+    texts = [t for t in (read_pdf_text_best_effort(p) for p in paths) if t]
+    if not texts:
+        raise SystemExit(f"No readable PDFs in {infra.pdf_dir}")
+
+    embedder = Embedder(pipe.embed_model, pipe.embed_batch_size, pipe.embed_normalize,
+                        backend=pipe.embed_backend, onnx_file=pipe.embed_onnx_file,
+                        hf_cache_dir=infra.hf_cache_dir or None)
+    tok = get_tokenizer(pipe.embed_model, infra.hf_cache_dir)
+    max_tokens = embedder.max_tokens
+    embedder.encode(["warm up"])
+
+    specs = {
+        "chars_v1": ChunkingSpec(version="chars_v1", chunk_chars=pipe.chunk_chars, overlap=pipe.chunk_overlap),
+        "tokens_v1": ChunkingSpec(version="tokens_v1", tokenizer=pipe.embed_model,
+                                  max_tokens=min(pipe.chunk_max_tokens or max_tokens, max_tokens),
+                                  overlap_tokens=pipe.chunk_overlap_tokens, hf_cache_dir=infra.hf_cache_dir),
+    }
+
+    rows: List[Dict[str, Any]] = []
+    for name, spec in specs.items():
+        chunk_s = embed_s = 0.0
+        n_chunks = embedded = truncated = 0
+        for text in texts:
+            t0 = time.perf_counter()
+            chunks, token_ids = chunk_document(text, spec)
+            t1 = time.perf_counter()
+            embedder.encode(chunks, token_ids)
+            t2 = time.perf_counter()
+            chunk_s += t1 - t0
+            embed_s += t2 - t1
+
+            n_chunks += len(chunks)
+            lengths = ([len(ids) for ids in token_ids] if token_ids is not None else
+                       [len(ids) for ids in tok(chunks, add_special_tokens=False, verbose=False)["input_ids"]])
+            embedded += sum(min(n, max_tokens) for n in lengths)
+            truncated += sum(max(0, n - max_tokens) for n in lengths)
+
+        rows.append({
+            "mode": name,
+            "chunks_per_doc": round(n_chunks / len(texts), 1),
+            "chunk_ms_per_doc": round(chunk_s * 1000 / len(texts), 1),
+            "embed_ms_per_doc": round(embed_s * 1000 / len(texts), 1),
+            "tokens_embedded": embedded,
+            "tokens_truncated": truncated,
+        })
+    embedder.close()
+
+    print(f"[bench_chunker] docs={len(texts)} model={pipe.embed_model} max_tokens={max_tokens}")
+    print("[bench_chunker] mode | chunks/doc | chunk_ms/doc | embed_ms/doc | tokens_embedded | tokens_truncated")
+    for r in rows:
+        print(f"[bench_chunker] {r['mode']} | {r['chunks_per_doc']} | {r['chunk_ms_per_doc']} | "
+              f"{r['embed_ms_per_doc']} | {r['tokens_embedded']} | {r['tokens_truncated']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Throughput of distributed ingest (INGEST_MODE=distributed) by worker
+count, against the local Qdrant stand-in (no live Qdrant needed; the
+configured embedding model is used).
+
+Each row ingests BENCH_PDF_DIR from scratch: fresh state, chunk store and
+collection, embedding cache off, and N worker processes started together
+on one lease database. Workers run with BENCH_EXTRACT_WORKERS extraction
+processes each, so N workers use about N * (1 + BENCH_EXTRACT_WORKERS)
+cores; scaling flattens once that passes the machine's core count.
+
+  docs/s       merged manifest: docs indexed over the run's wall time,
+               first worker start to last worker done (excludes finalize)
+  speedup      docs/s over the 1-worker row
+  process_s    spawn to last exit, including model load and finalize
+
+    BENCH_PDF_DIR=data/raw/pdfs BENCH_WORKERS=1,2,4 python -m rag_pipeline.tools.bench_distributed
+"""
+import glob
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Tuple
+
+import httpx
+
+
+def _start_stub() -> Tuple[subprocess.Popen, str]:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    proc = subprocess.Popen([sys.executable, "-m", "rag_pipeline.tools.qdrant_stub"],
+                            env={**os.environ, "STUB_PORT": str(port)}, stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(200):
+        try:
+            httpx.get(f"{url}/stub/stats").raise_for_status()
+            return proc, url
+        except httpx.HTTPError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("qdrant stub did not start")
+
+
+def _run(n: int, pdf_dir: str, url: str, extract_workers: int) -> Tuple[Dict[str, Any], float]:
+    work = tempfile.mkdtemp(prefix=f"bench_distributed_{n}_")
+    try:
+        env = {
+            **os.environ,
+            "INGEST_MODE": "distributed",
+            "INDEX_BACKEND": "qdrant",
+            "QDRANT_URL": url,
+            "QDRANT_COLLECTION": f"bench_distributed_{n}",
+            "PDF_DIR": pdf_dir,
+            "INGESTED_DIR": os.path.join(work, "ingested"),
+            "RUNS_DIR": os.path.join(work, "runs"),
+            "CHUNK_STORE_DIR": os.path.join(work, "chunk_store"),
+            "SPARSE_INDEX_DIR": os.path.join(work, "sparse_index"),
+            "LEASE_DB": os.path.join(work, "leases.sqlite"),
+            "EMBED_CACHE_MAX_ENTRIES": "0",
+            "EXTRACT_WORKERS": str(extract_workers),
+            "EMBED_WORKERS": "0",
+        }
+        t0 = time.perf_counter()
+        procs = [subprocess.Popen([sys.executable, "-m", "rag_pipeline.ingest"],
+                                  env={**env, "WORKER_ID": f"w{i}"},
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                 for i in range(n)]
+        codes = [p.wait() for p in procs]
+        process_s = time.perf_counter() - t0
+        if any(codes):
+            raise RuntimeError(f"{n} workers: exit codes {codes}")
+        for path in glob.glob(os.path.join(env["RUNS_DIR"], "*.json")):
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("finalized_by"):
+                return manifest, process_s
+        raise RuntimeError(f"{n} workers: no finalized run manifest")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def main() -> None:
+    pdf_dir = os.getenv("BENCH_PDF_DIR", "data/raw/pdfs")
+    counts = [int(x) for x in os.getenv("BENCH_WORKERS", "1,2,4").split(",")]
+    extract_workers = int(os.getenv("BENCH_EXTRACT_WORKERS", "1"))
+
+    proc, url = _start_stub()
+    try:
+        print(f"[bench_distributed] pdf_dir={pdf_dir} pdfs={len(glob.glob(os.path.join(pdf_dir, '*.pdf')))} "
+              f"cpus={os.cpu_count()} extract_workers/worker={extract_workers}")
+        print("[bench_distributed] workers | docs | docs/s | speedup | efficiency | finalize_s | process_s")
+        base = None
+        for n in counts:
+            m, process_s = _run(n, pdf_dir, url, extract_workers)
+            rate = m["docs_per_s"]
+            base = base or rate
+            print(f"[bench_distributed] {n} | {m['docs_indexed']} | {rate:.2f} | {rate / base:.2f}x | "
+                  f"{rate / base / n:.0%} | {m['finalize_seconds']:.2f} | {process_s:.1f}")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Embedding backends on CPU: load time, throughput and cosine agreement with
+the torch fp32 baseline on the same chunks.
+
+Chunks come from the PDFs in PDF_DIR (chars_v1 chunking), or synthetic
+sentences when there are none. Models load offline from HF_CACHE_DIR; the
+onnx backend needs optimum/onnxruntime and an onnx/ export of the model in
+that cache (BENCH_ONNX_FILE picks a quantized one).
+
+    BENCH_BACKENDS=torch,torch_int8,onnx BENCH_CHUNKS=2000 \\
+        python -m rag_pipeline.tools.bench_embed_backends
+"""
+import glob
+import os
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+import torch
+
+from rag_pipeline.chunking.chunker import chunk_text
+from rag_pipeline.embedding.embedder import BACKENDS, Embedder
+from rag_pipeline.loaders.pdf_loader import read_pdf_text_best_effort
+from rag_pipeline.settings import InfraSettings, load_pipeline_config
+
+_WORDS = ("retrieval augmented generation embedding vector index payload chunk text "
+          "document corpus version filter search latency memory quantization").split()
+
+
+def _chunks(infra: InfraSettings, chunk_chars: int, overlap: int, n: int) -> List[str]:
+    out: List[str] = []
+    for path in sorted(glob.glob(os.path.join(infra.pdf_dir, "*.pdf"))):
+        out.extend(chunk_text(read_pdf_text_best_effort(path), chunk_chars, overlap))
+        if len(out) >= n:
+            return out[:n]
+    rng = np.random.default_rng(0)
+    while len(out) < n:
+        out.append(" ".join(rng.choice(_WORDS, chunk_chars // 8)) + ".")
+    return out
+
+
+def main() -> None:
+    infra = InfraSettings()
+    pipe, _ = load_pipeline_config(infra.pipeline_config)
+    n_chunks = int(os.getenv("BENCH_CHUNKS", "2000"))
+    backends = [b.strip() for b in os.getenv("BENCH_BACKENDS", ",".join(BACKENDS)).split(",") if b.strip()]
+    onnx_file = os.getenv("BENCH_ONNX_FILE", pipe.embed_onnx_file)
+    threads = int(os.getenv("BENCH_THREADS", "0"))
+    if threads > 0:
+        torch.set_num_threads(threads)
+
+    texts = _chunks(infra, pipe.chunk_chars, pipe.chunk_overlap, n_chunks)
+    if "torch" in backends:
+        backends = ["torch"] + [b for b in backends if b != "torch"]
+
+    baseline = None
+    rows: List[Dict[str, Any]] = []
+    for backend in backends:
+        t0 = time.perf_counter()
+        try:
+            embedder = Embedder(pipe.embed_model, pipe.embed_batch_size, True, backend=backend,
+                                onnx_file=onnx_file if backend == "onnx" else "",
+                                hf_cache_dir=infra.hf_cache_dir or None)
+        except Exception as e:
+            print(f"[bench_embed_backends] {backend}: unavailable ({type(e).__name__}: {e})")
+            continue
+        load_s = time.perf_counter() - t0
+        embedder.encode(texts[: pipe.embed_batch_size])  # warm up
+
+        t1 = time.perf_counter()
+        vecs = embedder.encode(texts)
+        encode_s = time.perf_counter() - t1
+        embedder.close()
+
+        row: Dict[str, Any] = {
+            "backend": backend if backend != "onnx" or not onnx_file else f"onnx:{onnx_file}",
+            "load_s": round(load_s, 2),
+            "chunks_per_s": round(len(texts) / encode_s, 1),
+            "cos_mean": None,
+            "cos_p1": None,
+            "cos_min": None,
+        }
+        if baseline is None and backend == "torch":
+            baseline = vecs
+        elif baseline is not None:
+            cos = np.einsum("ij,ij->i", baseline, vecs)  # both normalized
+            row.update(cos_mean=round(float(cos.mean()), 5), cos_p1=round(float(np.percentile(cos, 1)), 5),
+                       cos_min=round(float(cos.min()), 5))
+        rows.append(row)
+        print(f"[bench_embed_backends] {row}")
+
+    print(f"\n[bench_embed_backends] model={pipe.embed_model} chunks={len(texts)} "
+          f"threads={torch.get_num_threads()} (cosine vs torch fp32)")
+    print("[bench_embed_backends] backend | load_s | chunks/s | cos_mean | cos_p1 | cos_min")
+    for r in rows:
+        print(f"[bench_embed_backends] {r['backend']} | {r['load_s']} | {r['chunks_per_s']} | "
+              f"{r['cos_mean']} | {r['cos_p1']} | {r['cos_min']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Tail latency and failure handling of the Qdrant read clients against the
+local stand-in with injected faults (no live Qdrant, no model):
+
+  tail      each request is slowed by BENCH_SLOW_MS with probability
+            BENCH_SLOW_P; sync QdrantHttp on a thread pool vs
+            AsyncQdrantHttp without and with hedging
+  errors    BENCH_ERROR_P of requests answer 503; retried with backoff
+  4xx       a search on a missing collection: one request, no retries
+  breaker   every request fails; the circuit opens and later calls fail
+            fast without reaching the server
+
+Queries arrive open-loop at BENCH_RATE per second (at most
+BENCH_CONCURRENCY in flight) and latency counts from the scheduled
+arrival, so a slow answer cannot hold back the requests behind it and
+hide its own cost. The stub runs in its own process, so its threads don't
+compete with the client's event loop for the GIL. "stub_reqs" is what it
+received: hedging's extra load.
+
+    BENCH_QUERIES=2000 BENCH_RATE=200 python -m rag_pipeline.tools.bench_hedging
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import httpx
+import numpy as np
+
+from rag_pipeline.http.async_qdrant_http import AsyncQdrantHttp
+from rag_pipeline.http.qdrant_http import QdrantHttp
+from rag_pipeline.indexing.qdrant_index import PointBatch, QdrantIndex
+from rag_pipeline.stats import percentile
+
+COLLECTION = "bench_hedging"
+
+
+def _row(name: str, latencies: List[float], wall_s: float, errors: int, stub_reqs: int, extra: str = "") -> None:
+    ms = [x * 1000 for x in latencies]
+    print(f"[bench_hedging] {name:<14} p50={percentile(ms, 50):6.1f} p95={percentile(ms, 95):6.1f} "
+          f"p99={percentile(ms, 99):6.1f} max={max(ms, default=0):6.1f} ms  qps={len(ms) / wall_s:7.1f}  "
+          f"errors={errors} stub_reqs={stub_reqs} {extra}".rstrip())
+
+
+def _start_stub(latency_ms: float) -> Tuple[subprocess.Popen, str]:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = {**os.environ, "STUB_PORT": str(port), "STUB_LATENCY_S": str(latency_ms / 1000.0)}
+    proc = subprocess.Popen([sys.executable, "-m", "rag_pipeline.tools.qdrant_stub"], env=env,
+                            stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(200):
+        try:
+            httpx.get(f"{url}/stub/stats").raise_for_status()
+            return proc, url
+        except httpx.HTTPError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("qdrant stub did not start")
+
+
+def _faults(url: str, seed: int, **faults: Any) -> None:
+    # also clears the stub's request log
+    body = {"slow_p": 0.0, "slow_s": 0.0, "error_p": 0.0, "seed": seed, **faults}
+    httpx.post(f"{url}/stub/faults", json=body).raise_for_status()
+
+
+def _stub_requests(url: str) -> int:
+    return httpx.get(f"{url}/stub/stats").json()["result"]["requests"]
+
+
+def _run_sync(url: str, queries: np.ndarray, rate: float, concurrency: int,
+              faults: Dict[str, Any]) -> Tuple[List[float], float, int]:
+    client = QdrantHttp(url, max_connections=concurrency)
+
+    def one(due: float, q: np.ndarray) -> Tuple[float, bool]:
+        try:
+            client.search(collection=COLLECTION, vector=q.tolist(), limit=8, with_payload=False)
+            return time.perf_counter() - due, True
+        except RuntimeError:
+            return time.perf_counter() - due, False
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # open every connection first: steady state, not connect cost, is measured
+        _faults(url, 0)
+        list(pool.map(lambda q: client.search(collection=COLLECTION, vector=q.tolist(), limit=8, with_payload=False),
+                      queries[:concurrency]))
+        _faults(url, 1, **faults)
+        t0 = time.perf_counter()
+        futures = []
+        for i, q in enumerate(queries):
+            due = t0 + i / rate
+            time.sleep(max(0.0, due - time.perf_counter()))
+            futures.append(pool.submit(one, due, q))
+        results = [f.result() for f in futures]
+    wall = time.perf_counter() - t0
+    client.close()
+    return [t for t, ok in results if ok], wall, sum(1 for _, ok in results if not ok)
+
+
+async def _run_async(client: AsyncQdrantHttp, url: str, queries: np.ndarray, rate: float,
+                     concurrency: int, faults: Dict[str, Any]) -> Tuple[List[float], float, int]:
+    slots = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+    _faults(url, 0)
+    await asyncio.gather(*(client.search(collection=COLLECTION, vector=q.tolist(), limit=8, with_payload=False)
+                           for q in queries[:concurrency]))
+    _faults(url, 1, **faults)
+    t0 = time.perf_counter()
+
+    async def one(i: int, q: np.ndarray) -> None:
+        nonlocal errors
+        due = t0 + i / rate
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        async with slots:
+            try:
+                await client.search(collection=COLLECTION, vector=q.tolist(), limit=8, with_payload=False)
+                latencies.append(time.perf_counter() - due)
+            except RuntimeError:
+                errors += 1
+
+    await asyncio.gather(*(one(i, q) for i, q in enumerate(queries)))
+    return latencies, time.perf_counter() - t0, errors
+
+
+async def _bench_async(url: str, queries: np.ndarray, rate: float, concurrency: int, faults: Dict[str, Any],
+                       **client_kwargs: Any) -> Tuple[List[float], float, int, Dict[str, Any]]:
+    client = AsyncQdrantHttp(url, max_connections=concurrency, **client_kwargs)
+    try:
+        latencies, wall, errors = await _run_async(client, url, queries, rate, concurrency, faults)
+        return latencies, wall, errors, client.stats()
+    finally:
+        await client.aclose()
+
+
+async def _missing_collection(url: str) -> str:
+    client = AsyncQdrantHttp(url)
+    try:
+        await client.search(collection="no_such_collection", vector=[0.0], limit=1)
+        return "unexpected success"
+    except RuntimeError as e:
+        return str(e)
+    finally:
+        await client.aclose()
+
+
+async def _breaker(url: str, calls: int) -> Dict[str, Any]:
+    client = AsyncQdrantHttp(url, max_retries=2, breaker_failures=3, breaker_reset_s=60.0)
+    fast = 0
+    try:
+        for _ in range(calls):
+            t0 = time.perf_counter()
+            try:
+                await client.search(collection=COLLECTION, vector=[0.0] * 8, limit=1)
+            except RuntimeError:
+                if time.perf_counter() - t0 < 0.001:
+                    fast += 1
+        return {**client.stats(), "failed_fast_under_1ms": fast}
+    finally:
+        await client.aclose()
+
+
+def main() -> None:
+    n_points = int(os.getenv("BENCH_POINTS", "2000"))
+    n_queries = int(os.getenv("BENCH_QUERIES", "2000"))
+    dim = int(os.getenv("BENCH_DIM", "64"))
+    rate = float(os.getenv("BENCH_RATE", "200"))
+    concurrency = int(os.getenv("BENCH_CONCURRENCY", "32"))
+    latency_ms = float(os.getenv("BENCH_LATENCY_MS", "2"))
+    slow_p = float(os.getenv("BENCH_SLOW_P", "0.03"))
+    slow_ms = float(os.getenv("BENCH_SLOW_MS", "150"))
+    error_p = float(os.getenv("BENCH_ERROR_P", "0.05"))
+    hedge_ratio = float(os.getenv("BENCH_HEDGE_MAX_RATIO", "0.1"))
+
+    proc, url = _start_stub(latency_ms)
+    try:
+        rng = np.random.default_rng(0)
+
+        index = QdrantIndex(url, COLLECTION)
+        index.ensure_collection(dim)
+        index.upsert_batched(PointBatch(
+            ids=[str(i) for i in range(n_points)],
+            vectors=rng.standard_normal((n_points, dim), dtype=np.float32),
+            payloads=[{"doc_id": f"d{i % 50}"} for i in range(n_points)],
+        ), 256)
+        index.close()
+        queries = rng.standard_normal((n_queries, dim), dtype=np.float32)
+
+        print(f"[bench_hedging] queries={n_queries} rate={rate}/s concurrency={concurrency} "
+              f"stub_latency_ms={latency_ms} slow_p={slow_p} slow_ms={slow_ms}")
+        tail = {"slow_p": slow_p, "slow_s": slow_ms / 1000.0}
+
+        lat, wall, errors = _run_sync(url, queries, rate, concurrency, tail)
+        _row("sync", lat, wall, errors, _stub_requests(url))
+
+        lat, wall, errors, stats = asyncio.run(_bench_async(url, queries, rate, concurrency, tail))
+        _row("async", lat, wall, errors, _stub_requests(url))
+
+        lat, wall, errors, stats = asyncio.run(
+            _bench_async(url, queries, rate, concurrency, tail, hedge=True, hedge_max_ratio=hedge_ratio))
+        _row("async+hedge", lat, wall, errors, _stub_requests(url),
+             f"hedges fired={stats['hedges_fired']} won={stats['hedges_won']}")
+
+        print(f"\n[bench_hedging] errors: error_p={error_p} (503), max_retries=3")
+        lat, wall, errors, stats = asyncio.run(_bench_async(url, queries, rate, concurrency, {"error_p": error_p}))
+        _row("async", lat, wall, errors, _stub_requests(url))
+
+        print("\n[bench_hedging] 4xx: search on a missing collection")
+        _faults(url, 3)
+        sync_client = QdrantHttp(url)
+        try:
+            sync_client.search(collection="no_such_collection", vector=[0.0], limit=1)
+        except RuntimeError as e:
+            print(f"[bench_hedging] sync  stub_reqs={_stub_requests(url)} error={str(e).splitlines()[0]}")
+        sync_client.close()
+        _faults(url, 3)
+        message = asyncio.run(_missing_collection(url))
+        print(f"[bench_hedging] async stub_reqs={_stub_requests(url)} error={message.splitlines()[0]}")
+
+        print("\n[bench_hedging] breaker: every request fails (breaker_failures=3, max_retries=2)")
+        _faults(url, 4, error_p=1.0)
+        stats = asyncio.run(_breaker(url, 50))
+        print(f"[bench_hedging] calls=50 stub_reqs={_stub_requests(url)} circuit={stats['circuit']} "
+              f"rejected={stats['circuit_rejected']} failed_fast_under_1ms={stats['failed_fast_under_1ms']}")
+
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    main()
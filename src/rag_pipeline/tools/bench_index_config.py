@@ -0,0 +1,144 @@
+"""
+Filtered-search latency and memory footprint across index settings.
+
+One collection per profile (baseline, int8, int8 + on-disk originals,
+larger HNSW m, no payload indexes), same random vectors, searched with a
+corpus_version filter like every query in the tools does.
+
+Point it at a real Qdrant with BENCH_QDRANT_URL: HNSW and quantization are
+only modelled there. On the built-in stub only the payload-index effect is
+real (indexed filters are vectorized, unindexed ones scan payloads).
+Memory is an estimate from the settings (vectors, int8 copy, HNSW links,
+keyword indexes) plus Qdrant's own memory_resident_bytes from /metrics
+when the server exposes it.
+
+    BENCH_QDRANT_URL=http://localhost:6333 BENCH_POINTS=200000 \\
+        python -m rag_pipeline.tools.bench_index_config
+"""
+import os
+import re
+import time
+from dataclasses import replace
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from rag_pipeline.http.qdrant_http import QdrantHttp
+from rag_pipeline.indexing.qdrant_index import PointBatch, QdrantIndex
+from rag_pipeline.settings import IndexConfig
+from rag_pipeline.stats import LatencyWindow
+from rag_pipeline.tools.qdrant_stub import start_stub
+
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "baseline": {},
+    "int8": {"quantization": "int8"},
+    "int8_vec_on_disk": {"quantization": "int8", "vectors_on_disk": True},
+    "hnsw_m32": {"hnsw_m": 32, "hnsw_ef_construct": 200},
+    "no_payload_index": {"payload_indexes": ()},
+}
+
+
+def estimate_ram_bytes(n: int, dim: int, cfg: IndexConfig) -> int:
+    ram = 0 if cfg.vectors_on_disk else n * dim * 4
+    if cfg.quantization == "int8" and cfg.quantization_always_ram:
+        ram += n * dim
+    if not cfg.hnsw_on_disk:
+        ram += n * cfg.hnsw_m * 2 * 4  # level-0 links dominate
+    ram += n * 8 * len(cfg.payload_indexes)
+    return ram
+
+
+def resident_bytes(url: str) -> Optional[int]:
+    try:
+        r = httpx.get(f"{url}/metrics", timeout=5.0)
+        m = re.search(r"^memory_resident_bytes\s+(\d+)", r.text, re.M)
+        return int(m.group(1)) if m and r.status_code == 200 else None
+    except httpx.HTTPError:
+        return None
+
+
+def _wait_green(url: str, collection: str, timeout_s: float = 600.0) -> None:
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        r = httpx.get(f"{url}/collections/{collection}", timeout=10.0).json()
+        if (r.get("result") or {}).get("status") == "green":
+            return
+        time.sleep(1.0)
+
+
+def main() -> None:
+    n_points = int(os.getenv("BENCH_POINTS", "20000"))
+    n_queries = int(os.getenv("BENCH_QUERIES", "200"))
+    dim = int(os.getenv("BENCH_DIM", "384"))
+    n_versions = int(os.getenv("BENCH_VERSIONS", "4"))
+    only = [p for p in os.getenv("BENCH_PROFILES", "").split(",") if p.strip()]
+    qdrant_url = os.getenv("BENCH_QDRANT_URL", "").strip()
+    limit = 8
+
+    server = None
+    if not qdrant_url:
+        server, qdrant_url = start_stub()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n_points, dim), dtype=np.float32)
+    queries = rng.standard_normal((n_queries, dim), dtype=np.float32)
+    versions = [f"v{i % n_versions}" for i in range(n_points)]
+    flt = {"must": [{"key": "corpus_version", "match": {"value": "v0"}}]}
+    http = QdrantHttp(qdrant_url, timeout_s=120.0)
+
+    rows: List[Dict[str, Any]] = []
+    for name, overrides in PROFILES.items():
+        if only and name not in only:
+            continue
+        cfg = replace(IndexConfig(), **overrides)
+        collection = f"bench_index_{name}"
+        index = QdrantIndex(qdrant_url, collection, max_in_flight=4, wait=False)
+        index.ensure_collection(dim, cfg)
+        t0 = time.perf_counter()
+        for start in range(0, n_points, 4096):
+            stop = min(n_points, start + 4096)
+            index.submit(PointBatch(
+                ids=[f"00000000-0000-5000-8000-{i:012d}" for i in range(start, stop)],
+                vectors=vectors[start:stop],
+                payloads=[{"doc_id": f"d{i // 20}", "corpus_version": versions[i]} for i in range(start, stop)],
+            ), 256)
+        index.barrier()
+        index.close()
+        _wait_green(qdrant_url, collection)
+        build_s = time.perf_counter() - t0
+
+        lat = LatencyWindow(n_queries)
+        for q in queries:
+            t1 = time.perf_counter()
+            http.search(collection=collection, vector=q.tolist(), limit=limit,
+                        with_payload=["doc_id"], filter_payload=flt)
+            lat.add(time.perf_counter() - t1)
+        s = lat.summary()
+        row = {
+            "profile": name,
+            "build_s": round(build_s, 2),
+            "p50_ms": s["p50_ms"],
+            "p95_ms": s["p95_ms"],
+            "est_ram_mb": round(estimate_ram_bytes(n_points, dim, cfg) / 1e6, 1),
+            "server_rss_mb": None,
+        }
+        rss = resident_bytes(qdrant_url)
+        if rss is not None:
+            row["server_rss_mb"] = round(rss / 1e6, 1)
+        rows.append(row)
+        print(f"[bench_index_config] {row}")
+
+    http.close()
+    if server is not None:
+        server.shutdown()
+
+    print(f"\n[bench_index_config] points={n_points} dim={dim} filter=corpus_version (1/{n_versions} match)")
+    print("[bench_index_config] profile | build_s | p50_ms | p95_ms | est_ram_mb | server_rss_mb")
+    for r in rows:
+        print(f"[bench_index_config] {r['profile']} | {r['build_s']} | {r['p50_ms']} | {r['p95_ms']} | "
+              f"{r['est_ram_mb']} | {r['server_rss_mb']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+LocalIndex vs Qdrant over HTTP: per-query latency and batched QPS, with and
+without a corpus_version filter. Vectors are random; no model needed.
+
+The HTTP side is the in-memory stub unless BENCH_QDRANT_URL points at a
+real Qdrant. The stub scores with the same NumPy matmul, so against it the
+gap is mostly request overhead; against a real server it also includes
+HNSW vs exact search.
+
+    BENCH_POINTS=1000000 BENCH_QUERIES=256 python -m rag_pipeline.tools.bench_local_index
+"""
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from rag_pipeline.http.qdrant_http import QdrantHttp
+from rag_pipeline.indexing.local_index import LocalIndex
+from rag_pipeline.indexing.qdrant_index import PointBatch, QdrantIndex
+from rag_pipeline.stats import LatencyWindow
+from rag_pipeline.tools.qdrant_stub import start_stub
+
+
+def _points(rng: np.random.Generator, start: int, stop: int, dim: int, n_versions: int) -> PointBatch:
+    return PointBatch(
+        ids=[f"00000000-0000-5000-8000-{i:012d}" for i in range(start, stop)],
+        vectors=rng.standard_normal((stop - start, dim), dtype=np.float32),
+        payloads=[{"doc_id": f"d{i // 20}", "chunk_index": i % 20, "corpus_version": f"v{i % n_versions}"}
+                  for i in range(start, stop)],
+    )
+
+
+def _run(client: Any, collection: str, queries: np.ndarray, limit: int,
+         flt: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    lat = LatencyWindow(len(queries))
+    for q in queries:
+        t0 = time.perf_counter()
+        client.search(collection=collection, vector=q.tolist(), limit=limit, with_payload=False, filter_payload=flt)
+        lat.add(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    client.search_batch(collection=collection, vectors=queries, limit=limit, with_payload=False, filter_payload=flt)
+    batch_s = time.perf_counter() - t0
+    return {"single": lat.summary(), "batch_qps": round(len(queries) / batch_s, 1)}
+
+
+def main() -> None:
+    n_points = int(os.getenv("BENCH_POINTS", "20000"))
+    n_queries = int(os.getenv("BENCH_QUERIES", "128"))
+    dim = int(os.getenv("BENCH_DIM", "384"))
+    n_versions = int(os.getenv("BENCH_VERSIONS", "4"))
+    qdrant_url = os.getenv("BENCH_QDRANT_URL", "").strip()
+    limit = 8
+    collection = "bench_local_index"
+    step = 8192
+
+    server = None
+    if not qdrant_url:
+        server, qdrant_url = start_stub()
+
+    root = tempfile.mkdtemp(prefix="bench_local_index_")
+    local = LocalIndex(root, collection)
+    remote = QdrantIndex(qdrant_url, collection, max_in_flight=4, wait=False)
+    local.ensure_collection(dim)
+    remote.ensure_collection(dim)
+
+    rng = np.random.default_rng(0)
+    t_local = t_remote = 0.0
+    for start in range(0, n_points, step):
+        batch = _points(rng, start, min(n_points, start + step), dim, n_versions)
+        t0 = time.perf_counter()
+        local.upsert_batched(batch, 1024)
+        t_local += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        remote.submit(batch, 256)
+        t_remote += time.perf_counter() - t0
+    t0 = time.perf_counter()
+    local.barrier()
+    t_local += time.perf_counter() - t0
+    t0 = time.perf_counter()
+    remote.barrier()
+    remote.close()
+    t_remote += time.perf_counter() - t0
+    print(f"[bench_local_index] points={n_points} dim={dim} ingest local={t_local:.2f}s http={t_remote:.2f}s")
+
+    queries = rng.standard_normal((n_queries, dim), dtype=np.float32)
+    flt = {"must": [{"key": "corpus_version", "match": {"value": "v0"}}]}
+    http = QdrantHttp(qdrant_url, timeout_s=120.0)
+
+    # reader opened separately, the way the service would see an ingested index
+    reader = LocalIndex(root, collection)
+    same: List[bool] = []
+    for name, client in (("local", reader), ("http", http)):
+        for label, f in (("unfiltered", None), ("filtered", flt)):
+            r = _run(client, collection, queries, limit, f)
+            s = r["single"]
+            print(f"[bench_local_index] {name:<5} {label:<10} p50={s['p50_ms']}ms p95={s['p95_ms']}ms "
+                  f"p99={s['p99_ms']}ms batch_qps={r['batch_qps']}")
+
+    for q in queries[:16]:
+        a = reader.search(collection=collection, vector=q, limit=limit, with_payload=False)
+        b = http.search(collection=collection, vector=q.tolist(), limit=limit, with_payload=False)
+        same.append([h["id"] for h in a] == [h["id"] for h in b])
+    print(f"[bench_local_index] identical_top{limit}={sum(same)}/{len(same)}")
+
+    http.close()
+    reader.close()
+    local.close()
+    if server is not None:
+        server.shutdown()
+    shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Peak-RSS benchmark for the embedding -> upsert path.
+
+Each mode runs in a fresh subprocess on one synthetic document:
+  lists - the old path: vectors as Python lists, one dict per point,
+          json.dumps per upsert batch
+  numpy - PointBatch with a float32 matrix, serialized by batch_body()
+
+Nothing is sent over the network; request bodies are built and dropped.
+
+    BENCH_CHUNKS=5000 BENCH_DIM=384 python -m rag_pipeline.tools.bench_memory
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _run_mode(mode: str, n_chunks: int, dim: int, batch_size: int) -> None:
+    from rag_pipeline.indexing.qdrant_index import batch_body, make_points
+
+    rng = np.random.default_rng(0)
+    chunks = [f"chunk {i} " + "x" * 1000 for i in range(n_chunks)]
+    base_rss = _peak_rss_mb()
+    t0 = time.time()
+    body_bytes = 0
+
+    if mode == "lists":
+        mat = rng.standard_normal((n_chunks, dim), dtype=np.float32)
+        vectors = [v.tolist() for v in mat]
+        del mat
+        points = [
+            {"id": i, "vector": vec, "payload": {"doc_id": "d", "file_name": "f", "chunk_index": i}}
+            for i, (c, vec) in enumerate(zip(chunks, vectors))
+        ]
+        for i in range(0, len(points), batch_size):
+            body_bytes += len(json.dumps({"points": points[i : i + batch_size]}).encode("utf-8"))
+    else:
+        mat = rng.standard_normal((n_chunks, dim), dtype=np.float32)
+        batch = make_points(doc_id="d", file_name="f", chunks=chunks, vectors=mat, payload_meta={})
+        for i in range(0, len(batch), batch_size):
+            body_bytes += len(batch_body(batch.slice(i, i + batch_size)))
+
+    print(json.dumps({
+        "mode": mode,
+        "chunks": n_chunks,
+        "dim": dim,
+        "baseline_rss_mb": round(base_rss, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "seconds": round(time.time() - t0, 3),
+        "body_mb": round(body_bytes / 1e6, 2),
+    }))
+
+
+def main() -> None:
+    n_chunks = int(os.getenv("BENCH_CHUNKS", "5000"))
+    dim = int(os.getenv("BENCH_DIM", "384"))
+    batch_size = int(os.getenv("BENCH_BATCH", "64"))
+
+    if len(sys.argv) > 1:
+        _run_mode(sys.argv[1], n_chunks, dim, batch_size)
+        return
+
+    results = {}
+    for mode in ("lists", "numpy"):
+        out = subprocess.run(
+            [sys.executable, "-m", "rag_pipeline.tools.bench_memory", mode],
+            check=True, capture_output=True, text=True,
+        )
+        results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"[bench_memory] {results[mode]}")
+
+    grow = {m: r["peak_rss_mb"] - r["baseline_rss_mb"] for m, r in results.items()}
+    print(f"[bench_memory] peak RSS growth lists={grow['lists']:.1f}MB numpy={grow['numpy']:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Full vs slim point payloads: stored payload bytes and search response size.
+
+  full - the old payload: chunk text, source_path and five version fields
+         on every point, searched with with_payload=True
+  slim - make_points() payload plus a ChunkStore; searched with the
+         HIT_FIELDS projection, text attached from the store
+
+Runs against the in-memory stub unless BENCH_QDRANT_URL is set. Text is
+synthetic, about chunk_chars long.
+
+    BENCH_POINTS=20000 python -m rag_pipeline.tools.bench_payload
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import httpx
+import numpy as np
+
+from rag_pipeline.indexing.chunk_store import ChunkStore
+from rag_pipeline.indexing.qdrant_index import PointBatch, QdrantIndex, make_points
+from rag_pipeline.retrieval.search import HIT_FIELDS, attach_text
+from rag_pipeline.stats import LatencyWindow
+from rag_pipeline.tools.qdrant_stub import start_stub
+
+_WORDS = ("retrieval augmented generation embedding vector index payload chunk text "
+          "document corpus version filter search latency memory quantization").split()
+
+
+def _full_payload(p: Dict[str, Any], text: str) -> Dict[str, Any]:
+    return {
+        **p,
+        "source_path": f"data/raw/pdfs/{p['file_name']}",
+        "text": text,
+        "pipeline_version": "v0.3.0",
+        "cleaner_version": "clean_v1",
+        "chunker_version": "chars_v1",
+    }
+
+
+def _search(client: httpx.Client, url: str, body: Dict[str, Any]) -> bytes:
+    r = client.post(url, json=body)
+    r.raise_for_status()
+    return r.content
+
+
+def main() -> None:
+    n_points = int(os.getenv("BENCH_POINTS", "20000"))
+    n_queries = int(os.getenv("BENCH_QUERIES", "200"))
+    dim = int(os.getenv("BENCH_DIM", "384"))
+    chunk_chars = int(os.getenv("BENCH_CHUNK_CHARS", "1200"))
+    limit = 8
+    qdrant_url = os.getenv("BENCH_QDRANT_URL", "").strip()
+
+    server = None
+    if not qdrant_url:
+        server, qdrant_url = start_stub()
+    root = tempfile.mkdtemp(prefix="bench_payload_")
+    store = ChunkStore(root)
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n_points, dim), dtype=np.float32)
+    meta = {"corpus_version": "c" * 64, "config_fingerprint": "f" * 64}
+
+    payload_bytes = {"full": 0, "slim": 0}
+    idx = {m: QdrantIndex(qdrant_url, f"bench_payload_{m}", max_in_flight=4, wait=False) for m in payload_bytes}
+    for index in idx.values():
+        index.ensure_collection(dim)
+
+    per_doc = 50
+    for start in range(0, n_points, per_doc):
+        stop = min(n_points, start + per_doc)
+        doc_id = f"{start // per_doc:064x}"
+        texts = [" ".join(rng.choice(_WORDS, chunk_chars // 8)) for _ in range(start, stop)]
+        slim = make_points(doc_id=doc_id, file_name=f"doc_{start // per_doc}.pdf",
+                           chunks=texts, vectors=vectors[start:stop], payload_meta=meta)
+        full = PointBatch(slim.ids, slim.vectors,
+                          [_full_payload(p, t) for p, t in zip(slim.payloads, texts)])
+        store.put_many(slim.ids, texts)
+        for mode, batch in (("full", full), ("slim", slim)):
+            payload_bytes[mode] += sum(len(json.dumps(p).encode("utf-8")) for p in batch.payloads)
+            idx[mode].submit(batch, 256)
+    for index in idx.values():
+        index.barrier()
+        index.close()
+    store.close()
+    written = store.stats()
+
+    reader = ChunkStore(root)
+    queries = rng.standard_normal((n_queries, dim), dtype=np.float32)
+    results: Dict[str, Dict[str, Any]] = {}
+    with httpx.Client(timeout=60.0) as client:
+        for mode in ("full", "slim"):
+            url = f"{qdrant_url}/collections/bench_payload_{mode}/points/search"
+            lat = LatencyWindow(n_queries)
+            resp_bytes = 0
+            for q in queries:
+                body = {"vector": q.tolist(), "limit": limit,
+                        "with_payload": True if mode == "full" else HIT_FIELDS}
+                t0 = time.perf_counter()
+                raw = _search(client, url, body)
+                hits: List[Dict[str, Any]] = json.loads(raw)["result"]
+                if mode == "slim":
+                    attach_text(hits, reader)
+                lat.add(time.perf_counter() - t0)
+                resp_bytes += len(raw)
+                assert all((h.get("payload") or {}).get("text") for h in hits)
+            results[mode] = {"resp_bytes_per_query": resp_bytes // n_queries, "latency": lat.summary()}
+
+    stats = reader.stats()
+    reader.close()
+    if server is not None:
+        server.shutdown()
+    shutil.rmtree(root, ignore_errors=True)
+
+    print(f"[bench_payload] points={n_points} chunk_chars~{chunk_chars}")
+    for mode in ("full", "slim"):
+        r = results[mode]
+        print(f"[bench_payload] {mode}: payload_bytes={payload_bytes[mode] / 1e6:.1f}MB "
+              f"({payload_bytes[mode] // n_points}B/point) resp_bytes/query={r['resp_bytes_per_query']} "
+              f"p50={r['latency']['p50_ms']}ms p95={r['latency']['p95_ms']}ms")
+    print(f"[bench_payload] chunk_store on disk={stats['data_bytes'] / 1e6:.1f}MB "
+          f"(raw text {written['written_raw_bytes'] / 1e6:.1f}MB, zlib)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Per-query search vs /points/search/batch against the local Qdrant stand-in.
+
+The stub adds a fixed per-request latency (BENCH_LATENCY_MS) to model the
+network round-trip that batching saves. Vectors are random; no model needed.
+
+    BENCH_QUERIES=512 BENCH_POINTS=2000 python -m rag_pipeline.tools.bench_search_batch
+"""
+import os
+import time
+
+import numpy as np
+
+from rag_pipeline.http.qdrant_http import QdrantHttp
+from rag_pipeline.indexing.qdrant_index import PointBatch, QdrantIndex
+from rag_pipeline.tools.qdrant_stub import start_stub
+
+
+def main() -> None:
+    n_points = int(os.getenv("BENCH_POINTS", "2000"))
+    n_queries = int(os.getenv("BENCH_QUERIES", "512"))
+    dim = int(os.getenv("BENCH_DIM", "384"))
+    latency_ms = float(os.getenv("BENCH_LATENCY_MS", "2"))
+    chunk_size = int(os.getenv("BENCH_CHUNK", "64"))
+    limit = 8
+
+    server, url = start_stub(latency_s=latency_ms / 1000.0)
+    rng = np.random.default_rng(0)
+    collection = "bench_search_batch"
+
+    index = QdrantIndex(url, collection)
+    index.ensure_collection(dim)
+    points = PointBatch(
+        ids=[str(i) for i in range(n_points)],
+        vectors=rng.standard_normal((n_points, dim), dtype=np.float32),
+        payloads=[{"doc_id": f"d{i % 50}", "chunk_index": i} for i in range(n_points)],
+    )
+    index.upsert_batched(points, 256)
+    index.close()
+
+    queries = rng.standard_normal((n_queries, dim), dtype=np.float32)
+    qdrant = QdrantHttp(url)
+
+    t0 = time.perf_counter()
+    single = [qdrant.search(collection=collection, vector=q.tolist(), limit=limit, with_payload=False)
+              for q in queries]
+    single_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batched = qdrant.search_batch(collection=collection, vectors=queries, limit=limit,
+                                  with_payload=False, chunk_size=chunk_size)
+    batch_s = time.perf_counter() - t0
+
+    same = all([h["id"] for h in a] == [h["id"] for h in b] for a, b in zip(single, batched))
+    qdrant.close()
+    server.shutdown()
+
+    print(f"[bench_search_batch] points={n_points} queries={n_queries} stub_latency_ms={latency_ms}")
+    print(f"[bench_search_batch] single: {single_s:.3f}s  qps={n_queries / single_s:.1f}")
+    print(f"[bench_search_batch] batch:  {batch_s:.3f}s  qps={n_queries / batch_s:.1f}  chunk_size={chunk_size}")
+    print(f"[bench_search_batch] speedup={single_s / batch_s:.2f}x identical_results={same}")
+
+
+if __name__ == "__main__":
+    main()
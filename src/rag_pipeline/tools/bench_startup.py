@@ -0,0 +1,139 @@
+"""
+Startup cost of each entry point, every measurement in a fresh interpreter:
+
+  import       time to import the entry point module (heaviest imports
+               listed from -X importtime)
+  first query  tools.retrieve's path: settings, embedder, search client,
+               then one query after BENCH_THINK_S of "typing". Cold
+               loads the model on that query; WARM_START=1 loads it in
+               the background during the think time.
+
+The search needs the configured index (INDEX_BACKEND); if it is not
+reachable the query row reports the error and the encode time only.
+
+    BENCH_THINK_S=1 BENCH_REPEAT=3 python -m rag_pipeline.tools.bench_startup
+"""
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+ENTRY_POINTS = (
+    "rag_pipeline.tools.list_docs",
+    "rag_pipeline.tools.retrieve",
+    "rag_pipeline.retrieval.service",
+    "rag_pipeline.evaluate",
+    "rag_pipeline.ingest",
+)
+
+
+def _child_import(module: str) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    importlib.import_module(module)
+    return {"import_s": time.perf_counter() - t0,
+            "heavy_loaded": sorted(m for m in ("torch", "sentence_transformers", "transformers", "yaml", "dotenv")
+                                   if m in sys.modules)}
+
+
+def _child_query(warm: bool, think_s: float) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    from rag_pipeline.backends import make_search_client
+    from rag_pipeline.embedding.embedder import Embedder
+    from rag_pipeline.retrieval.search import HIT_FIELDS
+    from rag_pipeline.settings import InfraSettings, load_pipeline_config
+
+    infra = InfraSettings()
+    pipe, _ = load_pipeline_config(infra.pipeline_config)
+    embedder = Embedder(pipe.embed_model, 1, pipe.embed_normalize, backend=pipe.embed_backend,
+                        onnx_file=pipe.embed_onnx_file, hf_cache_dir=infra.hf_cache_dir or None)
+    client = make_search_client(infra, timeout_s=20.0, max_retries=1)
+    if warm:
+        embedder.warm_up(background=True)
+    ready_s = time.perf_counter() - t0
+
+    time.sleep(think_s)
+    t1 = time.perf_counter()
+    vec = embedder.encode(["how is the corpus version computed"])[0]
+    encode_s = time.perf_counter() - t1
+    error = None
+    try:
+        client.search(collection=infra.qdrant_collection, vector=vec.tolist(), limit=8, with_payload=HIT_FIELDS)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    query_s = time.perf_counter() - t1
+    client.close()
+    return {"ready_s": ready_s, "first_query_s": query_s, "encode_s": encode_s,
+            "model_load_s": embedder.load_s, "search_error": error}
+
+
+def _heaviest(module: str, n: int = 5) -> List[Tuple[str, float]]:
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         capture_output=True, text=True, check=True)
+    rows: List[Tuple[int, str, float]] = []   # (depth, module, cumulative s), children before parents
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cum, name = line.split("|")
+        if cum.strip().isdigit():
+            rows.append(((len(name) - len(name.lstrip())) // 2, name.strip(), int(cum) / 1e6))
+    top = next((i for i, r in enumerate(rows) if r[1] == module), None)
+    if top is None:
+        return []
+    depth = rows[top][0]
+    direct = []
+    for d, name, cum in reversed(rows[:top]):
+        if d <= depth:
+            break
+        if d == depth + 1:   # direct imports of the entry point
+            direct.append((name, cum))
+    return sorted(direct, key=lambda r: -r[1])[:n]
+
+
+def _run(args: List[str], env: Dict[str, str]) -> Tuple[Dict[str, Any], float]:
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, "-m", "rag_pipeline.tools.bench_startup", *args],
+                         capture_output=True, text=True, check=True, env=env)
+    wall = time.perf_counter() - t0
+    return json.loads(out.stdout.strip().splitlines()[-1]), wall
+
+
+def main() -> None:
+    if len(sys.argv) > 1:
+        if sys.argv[1] == "import":
+            print(json.dumps(_child_import(sys.argv[2])))
+        else:
+            print(json.dumps(_child_query(sys.argv[2] == "warm", float(sys.argv[3]))))
+        return
+
+    repeat = int(os.getenv("BENCH_REPEAT", "3"))
+    think_s = float(os.getenv("BENCH_THINK_S", "1.0"))
+    env = dict(os.environ)
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+    python_s = (time.perf_counter() - t0) / repeat
+    print(f"[bench_startup] bare interpreter: {python_s * 1000:.0f} ms")
+
+    print("[bench_startup] entry point | import_ms | process_ms | heavy modules loaded | heaviest imports")
+    for module in ENTRY_POINTS:
+        runs = [_run(["import", module], env) for _ in range(repeat)]
+        import_ms = min(r["import_s"] for r, _ in runs) * 1000
+        wall_ms = min(w for _, w in runs) * 1000
+        heavy = ", ".join(f"{m} {s * 1000:.0f}ms" for m, s in _heaviest(module))
+        print(f"[bench_startup] {module} | {import_ms:.0f} | {wall_ms:.0f} | "
+              f"{','.join(runs[0][0]['heavy_loaded']) or '-'} | {heavy}")
+
+    print(f"\n[bench_startup] first query after {think_s}s think time (tools.retrieve path)")
+    print("[bench_startup] mode | ready_ms | first_query_ms | encode_ms | model_load_ms | search")
+    for mode in ("cold", "warm"):
+        r, _ = _run(["query", mode, str(think_s)], env)
+        print(f"[bench_startup] {mode} | {r['ready_s'] * 1000:.0f} | {r['first_query_s'] * 1000:.0f} | "
+              f"{r['encode_s'] * 1000:.0f} | {r['model_load_s'] * 1000:.0f} | {r['search_error'] or 'ok'}")
+
+
+if __name__ == "__main__":
+    main()
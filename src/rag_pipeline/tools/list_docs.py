@@ -1,73 +1,71 @@
 import os
-from collections import Counter
-from typing import Dict, Optional, Set
+import time
+from typing import Any, Dict
 
 from rag_pipeline.settings import InfraSettings
-from rag_pipeline.http.qdrant_http import QdrantHttp
+from rag_pipeline.backends import describe, make_search_client
+from rag_pipeline.catalog import catalog_path, read_catalog, reconcile
+from rag_pipeline.retrieval.search import corpus_filter
 
 
 def main() -> None:
+    """
+    LIST_DOCS_MODE=catalog (default) reads the catalog ingest writes; falls
+    back to reconcile if there is none. LIST_DOCS_MODE=reconcile scrolls
+    the index in RECONCILE_PARTITIONS parallel ranges and diffs the result
+    against the catalog.
+    """
     infra = InfraSettings()
-    qdrant = QdrantHttp(infra.qdrant_url, timeout_s=20.0, max_retries=3)
 
     corpus_ver = os.getenv("CORPUS_VERSION", "").strip() or None
     max_docs = int(os.getenv("MAX_DOCS", "200"))
-    page_size = int(os.getenv("PAGE_SIZE", "128"))
+    mode = os.getenv("LIST_DOCS_MODE", "catalog").strip().lower()
+    partitions = int(os.getenv("RECONCILE_PARTITIONS", "8"))
+    page_size = int(os.getenv("PAGE_SIZE", "1024"))
 
-    filter_payload = None
-    if corpus_ver:
-        filter_payload = {"must": [{"key": "corpus_version", "match": {"value": corpus_ver}}]}
-
-    seen: Set[str] = set()
-    names: Dict[str, str] = {}
-    counts = Counter()
-
-    offset: Optional[Dict[str, object]] = None
-
-    print(f"[list_docs] collection={infra.qdrant_collection}")
+    print(f"[list_docs] index={describe(infra)} collection={infra.qdrant_collection}")
     print(f"[list_docs] corpus_filter={corpus_ver if corpus_ver else '(none)'}")
 
-    while True:
-        points, offset = qdrant.scroll(
-            collection=infra.qdrant_collection,
-            limit=page_size,
-            offset=offset,
-            filter_payload=filter_payload,
-            with_payload=True,
-            with_vectors=False,
-        )
-
-        if not points:
-            break
-
-        for p in points:
-            payload = p.get("payload") or {}
-            doc_id = payload.get("doc_id")
-            if not doc_id:
-                continue
-            counts[doc_id] += 1
-            if doc_id not in seen:
-                seen.add(doc_id)
-                fn = payload.get("file_name")
-                if fn:
-                    names[doc_id] = fn
-            if len(seen) >= max_docs:
-                break
-
-        if len(seen) >= max_docs:
-            break
-
-        if offset is None:
-            break
-
-    qdrant.close()
-
-    print(f"\n[list_docs] ✅ Found {len(seen)} unique docs (showing up to {max_docs})\n")
+    t0 = time.perf_counter()
+    path = catalog_path(infra.ingested_dir, infra.qdrant_collection)
+    catalog = read_catalog(path)
+    cat_docs: Dict[str, Dict[str, Any]] = {}
+    if catalog is not None:
+        cat_docs = {
+            d: doc for d, doc in catalog["docs"].items()
+            if not corpus_ver or doc.get("corpus_version") == corpus_ver
+        }
+
+    if mode == "catalog" and catalog is not None:
+        docs = cat_docs
+        source = f"catalog {path} (updated {catalog.get('updated_at_utc')})"
+    else:
+        qdrant = make_search_client(infra, timeout_s=60.0, max_retries=3, max_connections=max(1, partitions))
+        docs = reconcile(qdrant, infra.qdrant_collection, filter_payload=corpus_filter(corpus_ver),
+                         partitions=partitions, page_size=page_size)
+        qdrant.close()
+        source = f"index scroll, {partitions} partitions"
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+
+    print(f"\n[list_docs] ✅ Found {len(docs)} unique docs (showing up to {max_docs}) "
+          f"from {source} in {elapsed_ms:.1f}ms\n")
 
     # print sorted by chunk count desc (more informative)
-    for i, (doc_id, n_chunks) in enumerate(counts.most_common(max_docs), 1):
-        fn = names.get(doc_id, "(unknown)")
-        print(f"{i:>3}. {fn} | doc_id={doc_id[:12]}... | chunks_seen={n_chunks}")
+    ranked = sorted(docs.items(), key=lambda kv: -int(kv[1].get("chunks") or 0))[:max_docs]
+    for i, (doc_id, doc) in enumerate(ranked, 1):
+        fn = doc.get("file_name") or "(unknown)"
+        cut = f" | partial={doc['partial']}" if doc.get("partial") else ""
+        print(f"{i:>3}. {fn} | doc_id={doc_id[:12]}... | chunks={doc.get('chunks')}{cut}")
+
+    if mode == "reconcile" and catalog is not None:
+        missing = sorted(set(cat_docs) - set(docs))
+        extra = sorted(set(docs) - set(cat_docs))
+        mismatched = sorted(d for d in set(docs) & set(cat_docs) if docs[d]["chunks"] != cat_docs[d].get("chunks"))
+        print(f"\n[list_docs] reconcile vs catalog: missing_in_index={len(missing)} "
+              f"not_in_catalog={len(extra)} chunk_count_mismatch={len(mismatched)}")
+        for label, ids in (("missing_in_index", missing), ("not_in_catalog", extra), ("chunk_mismatch", mismatched)):
+            for d in ids[:20]:
+                print(f"[list_docs]   {label}: {d[:12]}...")
 
 
 if __name__ == "__main__":
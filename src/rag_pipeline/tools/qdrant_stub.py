@@ -0,0 +1,543 @@
+"""
+In-memory stand-in for the subset of the Qdrant REST API this repo uses.
+
+Meant for tests and benchmarks that must not depend on a live Qdrant:
+
+    server, url = start_stub(latency_s=0.02)
+    ...
+    server.shutdown()
+
+or standalone: STUB_PORT=6333 python -m rag_pipeline.tools.qdrant_stub
+
+Fault injection for client benchmarks: each request is independently
+slowed by slow_s with probability slow_p - a latency tail - or answered
+with error_status with probability error_p (STUB_SLOW_P, STUB_SLOW_S,
+STUB_ERROR_P, STUB_ERROR_STATUS). A stub in another process is controlled
+over HTTP, exempt from faults: POST /stub/faults {"slow_p": ..., "seed": 1}
+sets them and clears the request log, GET /stub/stats counts requests.
+
+deferred=True (STUB_DEFERRED=1) models the window between Qdrant acking a
+wait=false update and applying it: such updates are queued per collection,
+and a later wait=true update first applies the queued ones on the shards
+it touches (shard_number from the create body, points placed by ID hash).
+"""
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+
+class StubState:
+    def __init__(
+        self,
+        latency_s: float = 0.0,
+        slow_p: float = 0.0,
+        slow_s: float = 0.0,
+        error_p: float = 0.0,
+        error_status: int = 503,
+        seed: int = 0,
+        deferred: bool = False,
+    ) -> None:
+        self.latency_s = latency_s
+        self.slow_p = slow_p
+        self.slow_s = slow_s
+        self.error_p = error_p
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.deferred = deferred
+        self.lock = threading.Lock()
+        self.collections: Dict[str, Dict[str, Any]] = {}
+        self.requests: List[Tuple[str, str]] = []
+        self.op_id = 0
+
+    def fault(self) -> Tuple[float, int]:
+        """
+        (extra delay, error status or 0) drawn for one request.
+        """
+        with self.lock:
+            delay = self.slow_s if self.slow_p and self.rng.random() < self.slow_p else 0.0
+            status = self.error_status if self.error_p and self.rng.random() < self.error_p else 0
+        return delay, status
+
+    def points(self, name: str) -> Dict[Any, Dict[str, Any]]:
+        return self.collections[name]["points"]
+
+    def matrix(self, name: str) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """
+        (points, float32 vector matrix) for a collection, rebuilt only after writes.
+        """
+        col = self.collections[name]
+        if col.get("_matrix") is None:
+            pts = list(col["points"].values())
+            mat = np.asarray([p["vector"] for p in pts], dtype=np.float32).reshape(len(pts), -1)
+            norms = np.linalg.norm(mat, axis=1) if len(pts) else np.zeros(0, dtype=np.float32)
+            col["_matrix"] = (pts, mat / (norms[:, None] + 1e-12))
+        return col["_matrix"]
+
+    def columns(self, name: str) -> Dict[str, Tuple[Dict[Any, int], np.ndarray]]:
+        """
+        Payload-indexed fields as (value -> code, int code per point in
+        matrix() order), so filters on them are vectorized like Qdrant's
+        payload index. Rebuilt with the matrix.
+        """
+        col = self.collections[name]
+        if col.get("_columns") is None:
+            pts, _ = self.matrix(name)
+            cols = {}
+            for field in col["payload_schema"]:
+                lookup: Dict[Any, int] = {}
+                codes = np.fromiter(
+                    (lookup.setdefault(p["payload"].get(field), len(lookup)) for p in pts), dtype=np.int64, count=len(pts)
+                )
+                cols[field] = (lookup, codes)
+            col["_columns"] = cols
+        return col["_columns"]
+
+    def touch(self, name: str) -> None:
+        self.collections[name]["_matrix"] = None
+        self.collections[name]["_columns"] = None
+
+
+def _match_condition(payload: Dict[str, Any], cond: Dict[str, Any]) -> bool:
+    value = payload.get(cond.get("key", ""))
+    match = cond.get("match") or {}
+    if "value" in match:
+        return value == match["value"]
+    if "any" in match:
+        return value in match["any"]
+    return False
+
+
+def match_filter(payload: Dict[str, Any], flt: Optional[Dict[str, Any]]) -> bool:
+    if not flt:
+        return True
+    must = flt.get("must") or []
+    should = flt.get("should") or []
+    must_not = flt.get("must_not") or []
+    if not all(_match_condition(payload, c) for c in must):
+        return False
+    if should and not any(_match_condition(payload, c) for c in should):
+        return False
+    return not any(_match_condition(payload, c) for c in must_not)
+
+
+def _indexed_mask(cols: Dict[str, Tuple[Dict[Any, int], np.ndarray]], flt: Dict[str, Any], n: int) -> Optional[np.ndarray]:
+    """
+    Filter mask from payload-indexed columns, or None if any condition
+    touches a field without an index (the caller then scans payloads).
+    """
+    def cond_mask(c: Dict[str, Any]) -> Optional[np.ndarray]:
+        key, match = c.get("key", ""), c.get("match") or {}
+        if key not in cols:
+            return None
+        lookup, codes = cols[key]
+        if "value" in match:
+            return codes == lookup.get(match["value"], -1)
+        if "any" in match:
+            return np.isin(codes, [lookup[v] for v in match["any"] if v in lookup])
+        return None
+
+    mask = np.ones(n, dtype=bool)
+    for c in flt.get("must") or []:
+        m = cond_mask(c)
+        if m is None:
+            return None
+        mask &= m
+    should = flt.get("should") or []
+    if should:
+        any_mask = np.zeros(n, dtype=bool)
+        for c in should:
+            m = cond_mask(c)
+            if m is None:
+                return None
+            any_mask |= m
+        mask &= any_mask
+    for c in flt.get("must_not") or []:
+        m = cond_mask(c)
+        if m is None:
+            return None
+        mask &= ~m
+    return mask
+
+
+def _update_result(state: StubState, wait: bool) -> Dict[str, Any]:
+    state.op_id += 1
+    return {"operation_id": state.op_id, "status": "completed" if wait else "acknowledged"}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    state: StubState
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes; avoid Nagle + delayed-ACK stalls
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _reply(self, code: int, result: Any) -> None:
+        body = json.dumps({"result": result, "status": "ok", "time": 0.0}).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, code: int, msg: str) -> None:
+        body = json.dumps({"status": {"error": msg}, "time": 0.0}).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> Dict[str, Any]:
+        n = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(n) or b"{}") if n else {}
+
+    def _handle(self, method: str) -> None:
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        wait = (query.get("wait", ["false"])[0]).lower() == "true"
+        body = self._body() if method in ("POST", "PUT", "PATCH") else {}
+
+        st = self.state
+        if not url.path.startswith("/stub/"):
+            st.requests.append((method, url.path))
+            delay, status = st.fault()
+            if st.latency_s + delay > 0:
+                time.sleep(st.latency_s + delay)
+            if status:
+                self._error(status, "injected fault")
+                return
+
+        for pattern, handler in _ROUTES:
+            if handler[0] != method:
+                continue
+            m = re.fullmatch(pattern, url.path)
+            if m:
+                try:
+                    with st.lock:
+                        code, result = handler[1](st, body, wait, *m.groups())
+                except KeyError as e:
+                    self._error(404, f"Not found: {e}")
+                    return
+                if code >= 400:
+                    self._error(code, result)
+                    return
+                self._reply(code, result)
+                return
+        self._error(404, f"no route for {method} {url.path}")
+
+    def do_GET(self) -> None:
+        self._handle("GET")
+
+    def do_POST(self) -> None:
+        self._handle("POST")
+
+    def do_PUT(self) -> None:
+        self._handle("PUT")
+
+    def do_PATCH(self) -> None:
+        self._handle("PATCH")
+
+    def do_DELETE(self) -> None:
+        self._handle("DELETE")
+
+
+# ---- route handlers: (state, body, wait, *path_groups) -> (status, result) ----
+
+def _root(st: StubState, body: Dict[str, Any], wait: bool) -> Tuple[int, Any]:
+    return 200, {"title": "qdrant stub", "version": "1.12.0"}
+
+
+def _list_collections(st: StubState, body: Dict[str, Any], wait: bool) -> Tuple[int, Any]:
+    return 200, {"collections": [{"name": n} for n in st.collections]}
+
+
+_HNSW_DEFAULTS = {"m": 16, "ef_construct": 100, "full_scan_threshold": 10000, "on_disk": False}
+
+
+def _create_collection(st: StubState, body: Dict[str, Any], wait: bool, name: str) -> Tuple[int, Any]:
+    if name in st.collections:
+        return 409, f"Wrong input: Collection `{name}` already exists!"
+    st.collections[name] = {
+        "vectors": body.get("vectors") or {},
+        "hnsw_config": {**_HNSW_DEFAULTS, **(body.get("hnsw_config") or {})},
+        "quantization_config": body.get("quantization_config"),
+        "shard_number": int(body.get("shard_number") or 1),
+        "replication_factor": int(body.get("replication_factor") or 1),
+        "payload_schema": {},
+        "points": {},
+        "_pending": [],
+        "_matrix": None,
+        "_columns": None,
+    }
+    return 200, True
+
+
+def _update_collection(st: StubState, body: Dict[str, Any], wait: bool, name: str) -> Tuple[int, Any]:
+    col = st.collections[name]
+    if "vectors" in body:
+        col["vectors"].update(body["vectors"].get("") or {})
+    if "hnsw_config" in body:
+        col["hnsw_config"].update(body["hnsw_config"])
+    if "quantization_config" in body:
+        q = body["quantization_config"]
+        col["quantization_config"] = None if q == "Disabled" else q
+    return 200, True
+
+
+def _get_collection(st: StubState, body: Dict[str, Any], wait: bool, name: str) -> Tuple[int, Any]:
+    col = st.collections[name]
+    n = len(col["points"])
+    return 200, {
+        "status": "green",
+        "points_count": n,
+        "config": {
+            "params": {"vectors": col["vectors"], "shard_number": col["shard_number"],
+                       "replication_factor": col["replication_factor"]},
+            "hnsw_config": col["hnsw_config"],
+            "quantization_config": col["quantization_config"],
+        },
+        "payload_schema": {f: {"data_type": t, "points": n} for f, t in col["payload_schema"].items()},
+    }
+
+
+def _create_index(st: StubState, body: Dict[str, Any], wait: bool, name: str) -> Tuple[int, Any]:
+    col = st.collections[name]
+    col["payload_schema"][body["field_name"]] = body.get("field_schema", "keyword")
+    col["_columns"] = None
+    return 200, _update_result(st, wait)
+
+
+def _shards(col: Dict[str, Any], ids: Optional[List[Any]]) -> Set[int]:
+    # ids None: a filter update, which reaches every shard
+    n = col["shard_number"]
+    if ids is None:
+        return set(range(n))
+    if n == 1:
+        return {0}
+    return {zlib.crc32(str(pid).encode("utf-8")) % n for pid in ids}
+
+
+def _apply(st: StubState, name: str, wait: bool, shards: Set[int], update: Callable[[], None]) -> Tuple[int, Any]:
+    col = st.collections[name]
+    if st.deferred:
+        if not wait:
+            col["_pending"].append((shards, update))
+            return 200, _update_result(st, wait)
+        # each shard applies its queue in order before this update
+        keep = []
+        for s, queued in col["_pending"]:
+            if s & shards:
+                queued()
+            else:
+                keep.append((s, queued))
+        col["_pending"] = keep
+    update()
+    st.touch(name)
+    return 200, _update_result(st, wait)
+
+
+def _upsert(st: StubState, body: Dict[str, Any], wait: bool, name: str) -> Tuple[int, Any]:
+    pts = st.points(name)
+    if "batch" in body:
+        b = body["batch"]
+        payloads = b.get("payloads") or [{}] * len(b["ids"])
+        new = [{"id": pid, "vector": vec, "payload": payload or {}}
+               for pid, vec, payload in zip(b["ids"], b["vectors"], payloads)]
+    else:
+        new = [{"id": p["id"], "vector": p.get("vector"), "payload": p.get("payload") or {}}
+               for p in body.get("points", [])]
+
+    def update() -> None:
+        for p in new:
+            pts[p["id"]] = p
+
+    return _apply(st, name, wait, _shards(st.collections[name], [p["id"] for p in new]), update)
+
+
+def _delete_points(st: StubState, body: Dict[str, Any], wait: bool, name: str) -> Tuple[int, Any]:
+    pts = st.points(name)
+    ids = list(body["points"]) if "points" in body else None
+
+    def update() -> None:
+        if ids is not None:
+            for pid in ids:
+                pts.pop(pid, None)
+        elif "filter" in body:
+            for pid in [pid for pid, p in pts.items() if match_filter(p["payload"], body["filter"])]:
+                del pts[pid]
+
+    return _apply(st, name, wait, _shards(st.collections[name], ids), update)
+
+
+def _set_payload(st: StubState, body: Dict[str, Any], wait: bool, name: str) -> Tuple[int, Any]:
+    pts = st.points(name)
+    ids = list(body["points"]) if "points" in body else None
+
+    def update() -> None:
+        if ids is not None:
+            targets = [pts[pid] for pid in ids if pid in pts]
+        else:
+            targets = [p for p in pts.values() if match_filter(p["payload"], body.get("filter"))]
+        for p in targets:
+            p["payload"].update(body.get("payload") or {})
+
+    return _apply(st, name, wait, _shards(st.collections[name], ids), update)
+
+
+def _project(p: Dict[str, Any], with_payload: Any, with_vector: bool = False) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"id": p["id"]}
+    if with_payload is True:
+        out["payload"] = p["payload"]
+    elif isinstance(with_payload, list):
+        out["payload"] = {k: v for k, v in p["payload"].items() if k in with_payload}
+    elif isinstance(with_payload, dict) and "include" in with_payload:
+        out["payload"] = {k: v for k, v in p["payload"].items() if k in with_payload["include"]}
+    if with_vector:
+        out["vector"] = p["vector"]
+    return out
+
+
+def _retrieve(st: StubState, body: Dict[str, Any], wait: bool, name: str) -> Tuple[int, Any]:
+    pts = st.points(name)
+    return 200, [_project(pts[pid], body.get("with_payload", True), bool(body.get("with_vector")))
+                 for pid in body.get("ids", []) if pid in pts]
+
+
+def _search_one(st: StubState, name: str, req: Dict[str, Any]) -> List[Dict[str, Any]]:
+    pts, mat = st.matrix(name)
+    if not pts:
+        return []
+    q = np.asarray(req["vector"], dtype=np.float32)
+    # cosine, like a Distance.COSINE collection
+    scores = mat @ (q / (np.linalg.norm(q) or 1.0))
+    flt = req.get("filter")
+    if flt:
+        mask = _indexed_mask(st.columns(name), flt, len(pts))
+        if mask is None:
+            mask = np.fromiter((match_filter(p["payload"], flt) for p in pts), dtype=bool, count=len(pts))
+        scores = np.where(mask, scores, -np.inf)
+    limit = int(req.get("limit", 10))
+    top = [i for i in np.argsort(-scores)[:limit] if np.isfinite(scores[i])]
+    hits = []
+    for i in top:
+        hit = _project(pts[i], req.get("with_payload", False))
+        hit["score"] = float(scores[i])
+        hit["version"] = 0
+        hits.append(hit)
+    return hits
+
+
+def _search(st: StubState, body: Dict[str, Any], wait: bool, name: str) -> Tuple[int, Any]:
+    return 200, _search_one(st, name, body)
+
+
+def _search_batch(st: StubState, body: Dict[str, Any], wait: bool, name: str) -> Tuple[int, Any]:
+    return 200, [_search_one(st, name, req) for req in body.get("searches", [])]
+
+
+def _scroll(st: StubState, body: Dict[str, Any], wait: bool, name: str) -> Tuple[int, Any]:
+    pts = sorted(st.points(name).values(), key=lambda p: str(p["id"]))
+    pts = [p for p in pts if match_filter(p["payload"], body.get("filter"))]
+    offset = body.get("offset")
+    if offset is not None:
+        pts = [p for p in pts if str(p["id"]) >= str(offset)]
+    limit = int(body.get("limit", 10))
+    page = pts[:limit]
+    next_offset = pts[limit]["id"] if len(pts) > limit else None
+    return 200, {
+        "points": [_project(p, body.get("with_payload", True), bool(body.get("with_vector", body.get("with_vectors"))))
+                   for p in page],
+        "next_page_offset": next_offset,
+    }
+
+
+_FAULTS = ("slow_p", "slow_s", "error_p", "error_status")
+
+
+def _stub_faults(st: StubState, body: Dict[str, Any], wait: bool) -> Tuple[int, Any]:
+    for k in _FAULTS:
+        if k in body:
+            setattr(st, k, type(getattr(st, k))(body[k]))
+    if "seed" in body:
+        st.rng.seed(body["seed"])
+    st.requests.clear()
+    return 200, {k: getattr(st, k) for k in _FAULTS}
+
+
+def _stub_stats(st: StubState, body: Dict[str, Any], wait: bool) -> Tuple[int, Any]:
+    return 200, {"requests": len(st.requests)}
+
+
+_ROUTES = [
+    (r"/stub/faults", ("POST", _stub_faults)),
+    (r"/stub/stats", ("GET", _stub_stats)),
+    (r"/", ("GET", _root)),
+    (r"/collections", ("GET", _list_collections)),
+    (r"/collections/([^/]+)", ("PUT", _create_collection)),
+    (r"/collections/([^/]+)", ("GET", _get_collection)),
+    (r"/collections/([^/]+)", ("PATCH", _update_collection)),
+    (r"/collections/([^/]+)/index", ("PUT", _create_index)),
+    (r"/collections/([^/]+)/points", ("PUT", _upsert)),
+    (r"/collections/([^/]+)/points", ("POST", _retrieve)),
+    (r"/collections/([^/]+)/points/delete", ("POST", _delete_points)),
+    (r"/collections/([^/]+)/points/payload", ("POST", _set_payload)),
+    (r"/collections/([^/]+)/points/search", ("POST", _search)),
+    (r"/collections/([^/]+)/points/search/batch", ("POST", _search_batch)),
+    (r"/collections/([^/]+)/points/scroll", ("POST", _scroll)),
+]
+
+
+class _Server(ThreadingHTTPServer):
+    # listen backlog; the default 5 drops SYNs (1s retransmit) when a pool opens many connections at once
+    request_queue_size = 128
+    daemon_threads = True
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # a client hanging up before the reply (a cancelled hedge) is not an error
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_stub(host: str = "127.0.0.1", port: int = 0, latency_s: float = 0.0,
+               **faults: Any) -> Tuple[ThreadingHTTPServer, str]:
+    state = StubState(latency_s=latency_s, **faults)
+    handler = type("StubHandler", (_Handler,), {"state": state})
+    server = _Server((host, port), handler)
+    server.state = state  # type: ignore[attr-defined]
+    threading.Thread(target=server.serve_forever, name="qdrant-stub", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main() -> None:
+    host = os.getenv("STUB_HOST", "127.0.0.1")
+    port = int(os.getenv("STUB_PORT", "6333"))
+    latency_s = float(os.getenv("STUB_LATENCY_S", "0"))
+    faults = {
+        "slow_p": float(os.getenv("STUB_SLOW_P", "0")),
+        "slow_s": float(os.getenv("STUB_SLOW_S", "0")),
+        "error_p": float(os.getenv("STUB_ERROR_P", "0")),
+        "error_status": int(os.getenv("STUB_ERROR_STATUS", "503")),
+        "deferred": os.getenv("STUB_DEFERRED", "0") == "1",
+    }
+    server, url = start_stub(host, port, latency_s, **faults)
+    print(f"[qdrant_stub] listening on {url} latency_s={latency_s} faults={faults}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
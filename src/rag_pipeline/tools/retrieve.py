@@ -1,45 +1,73 @@
 import os
-import yaml
-from sentence_transformers import SentenceTransformer
 
-from rag_pipeline.settings import InfraSettings
-from rag_pipeline.http.qdrant_http import QdrantHttp
+from rag_pipeline.embedding.embedder import Embedder
+from rag_pipeline.settings import InfraSettings, load_pipeline_config
+from rag_pipeline.backends import chunk_store_path, describe, make_search_client
+from rag_pipeline.indexing.chunk_store import ChunkStore
+from rag_pipeline.profiling import profile_run
+from rag_pipeline.retrieval.cache import QueryEmbeddingCache, ResultCache
+from rag_pipeline.retrieval.search import HIT_FIELDS, attach_text
 
 
 def main() -> None:
     infra = InfraSettings()
+    with profile_run(infra, "retrieve") as prof:
+        _repl(infra)
+    if prof.enabled:
+        print(f"[search] profile={prof.out_dir}")
 
+
+def _repl(infra: InfraSettings) -> None:
     corpus_ver = os.getenv("CORPUS_VERSION", "").strip() or None
 
-    with open(infra.pipeline_config, "r", encoding="utf-8") as f:
-        raw = yaml.safe_load(f)
-    embed_model = raw["embedding"]["model"]
-    normalize = bool(raw["embedding"].get("normalize", True))
+    pipe, _ = load_pipeline_config(infra.pipeline_config)
+    embed_model = pipe.embed_model
+    normalize = pipe.embed_normalize
 
-    model = SentenceTransformer(embed_model)
-    qdrant = QdrantHttp(infra.qdrant_url, timeout_s=20.0, max_retries=3)
+    # same backend as ingest, or query and document vectors would not match
+    embedder = Embedder(embed_model, 1, normalize, backend=pipe.embed_backend,
+                        onnx_file=pipe.embed_onnx_file, hf_cache_dir=infra.hf_cache_dir or None)
+    if infra.warm_start:
+        embedder.warm_up(background=True)  # loads while the first query is typed
+    qdrant = make_search_client(infra, timeout_s=20.0, max_retries=3)
+    chunks = ChunkStore(chunk_store_path(infra))
+    query_cache = QueryEmbeddingCache(embed_model, normalize, infra.query_cache_size)
+    result_cache = ResultCache(infra.runs_dir, infra.result_cache_size, infra.result_cache_ttl_s, infra.corpus_check_s)
 
     filter_payload = None
     if corpus_ver:
         filter_payload = {"must": [{"key": "corpus_version", "match": {"value": corpus_ver}}]}
 
-    print(f"\n[search] Qdrant={infra.qdrant_url} collection={infra.qdrant_collection}")
-    print(f"[search] embed_model={embed_model}")
+    print(f"\n[search] index={describe(infra)} collection={infra.qdrant_collection}")
+    print(f"[search] embed_model={embed_model} backend={pipe.embed_backend}")
     print(f"[search] corpus_filter={corpus_ver if corpus_ver else '(none)'}")
 
     while True:
-        q = input("\nQuery (or 'q'): ").strip()
+        q = input("\nQuery ('stats' for cache stats, 'q' to quit): ").strip()
         if q.lower() == "q":
             break
+        if q.lower() == "stats":
+            print("query_cache:", query_cache.stats())
+            print("result_cache:", result_cache.stats())
+            continue
+
+        q_vec = query_cache.get(q)
+        if q_vec is None:
+            q_vec = embedder.encode([q])[0]
+            query_cache.put(q, q_vec)
 
-        q_vec = model.encode(q, normalize_embeddings=normalize).tolist()
-        hits = qdrant.search(
-            collection=infra.qdrant_collection,
-            vector=q_vec,
-            limit=8,
-            with_payload=True,
-            filter_payload=filter_payload,
-        )
+        rkey = ResultCache.key(q_vec, corpus_ver, 8)
+        hits = result_cache.get(rkey)
+        if hits is None:
+            hits = qdrant.search(
+                collection=infra.qdrant_collection,
+                vector=q_vec.tolist(),
+                limit=8,
+                with_payload=HIT_FIELDS,
+                filter_payload=filter_payload,
+            )
+            attach_text(hits, chunks)
+            result_cache.put(rkey, hits)
 
         print("\n--- Top hits ---")
         for i, h in enumerate(hits, 1):
@@ -52,6 +80,7 @@ def main() -> None:
             print(text[:500], "...")
 
     qdrant.close()
+    chunks.close()
 
 
 if __name__ == "__main__":
@@ -20,7 +20,27 @@ def stable_doc_id(file_hash: str) -> str:
     return file_hash
 
 
+# storage-only sections: changing them must not invalidate ingested docs
+FINGERPRINT_EXCLUDE = ("index",)
+
+
 def config_fingerprint(cfg: Dict[str, Any]) -> str:
+    cfg = {k: v for k, v in cfg.items() if k not in FINGERPRINT_EXCLUDE}
+    # embedding.backend changes the vectors, so any non-default backend is part
+    # of the fingerprint; the default (torch fp32) is dropped so configs from
+    # before backends existed keep theirs
+    emb = cfg.get("embedding")
+    if isinstance(emb, dict):
+        emb = dict(emb)
+        if str(emb.get("backend", "torch")).strip().lower() == "torch":
+            emb.pop("backend", None)
+        if not emb.get("onnx_file"):
+            emb.pop("onnx_file", None)
+        cfg["embedding"] = emb
+    # likewise the tokens_v1 sizes are only fingerprinted when that chunker is used
+    chunking = cfg.get("chunking")
+    if isinstance(chunking, dict) and cfg.get("chunker_version", "chars_v1") != "tokens_v1":
+        cfg["chunking"] = {k: v for k, v in chunking.items() if k not in ("max_tokens", "overlap_tokens")}
     blob = json.dumps(cfg, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
     return sha256_bytes(blob)
 
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the package is run from src/ (no install step)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,24 @@
+import os
+import uuid
+
+from rag_pipeline.indexing.chunk_store import ChunkStore
+
+
+def _ids(n, start=0):
+    return [str(uuid.UUID(int=i)) for i in range(start, start + n)]
+
+
+def test_writer_trims_partial_index_record(tmp_path):
+    root = str(tmp_path)
+    store = ChunkStore(root)
+    store.put_many(_ids(2), ["a", "b"])
+    store.close()
+    with open(os.path.join(root, "chunks.idx"), "ab") as f:
+        f.write(b"\x01" * 10)               # crash mid-record
+
+    store = ChunkStore(root)
+    store.put_many(_ids(2, start=2), ["c", "d"])
+    store.close()
+    assert os.path.getsize(os.path.join(root, "chunks.idx")) % 28 == 0
+    texts = ChunkStore(root).get_many(_ids(4))
+    assert [texts[i] for i in _ids(4)] == ["a", "b", "c", "d"]
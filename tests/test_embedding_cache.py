@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+import pytest
+
+from rag_pipeline.embedding.cache import EmbeddingCache
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(EmbeddingCache, "_GROW_ROWS", 2)
+
+
+def _cache(path, max_entries):
+    return EmbeddingCache(str(path), "m", True, 4, max_entries)
+
+
+def _keys(n, start=0):
+    return [EmbeddingCache.key(f"t{i}") for i in range(start, start + n)]
+
+
+def _vecs(n, start=0):
+    return np.arange(start * 4, (start + n) * 4, dtype=np.float32).reshape(n, 4)
+
+
+def test_rows_grown_after_last_save_are_reused_after_crash(tmp_path):
+    c = _cache(tmp_path, 64)
+    c.put_many(_keys(2), _vecs(2))
+    c.save()
+    c.put_many(_keys(6, 2), _vecs(6, 2))   # grows vectors.f32; never saved
+    rows = os.path.getsize(c._vec_path) // 16
+
+    c = _cache(tmp_path, 64)
+    _, hit = c.get_many(_keys(8))
+    assert hit.tolist() == [True] * 2 + [False] * 6
+    c.put_many(_keys(6, 2), _vecs(6, 2))
+    assert os.path.getsize(c._vec_path) // 16 == rows
+    out, hit = c.get_many(_keys(8))
+    assert hit.all()
+    assert np.array_equal(out, _vecs(8))
+
+
+def test_full_cache_without_index_still_caches(tmp_path):
+    c = _cache(tmp_path, 8)
+    c.put_many(_keys(7), _vecs(7))          # fills vectors.f32; crash before the first save
+    assert os.path.getsize(c._vec_path) // 16 == 8
+    assert not os.path.exists(c._idx_path)
+
+    c = _cache(tmp_path, 8)
+    c.put_many(_keys(3, 10), _vecs(3))
+    c.save()
+    out, hit = _cache(tmp_path, 8).get_many(_keys(3, 10))
+    assert hit.all()
+    assert np.array_equal(out, _vecs(3))
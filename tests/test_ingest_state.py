@@ -0,0 +1,15 @@
+from rag_pipeline.ingest_state import DocStateStore
+
+
+def test_partial_docs_are_recorded_and_queued_again(tmp_path):
+    state = DocStateStore(str(tmp_path), "fp")
+    state.put("full", chunks=3)
+    state.put("cut", chunks=1, partial={"timeout": 2})
+
+    diff = DocStateStore(str(tmp_path), "fp").diff([("a.pdf", "full"), ("b.pdf", "cut"), ("c.pdf", "new")])
+    assert diff.unchanged == [("a.pdf", "full")]
+    assert diff.added == [("b.pdf", "cut"), ("c.pdf", "new")]
+    assert diff.removed == []
+
+    state.put("cut", chunks=4)
+    assert DocStateStore(str(tmp_path), "fp").diff([("b.pdf", "cut")]).unchanged == [("b.pdf", "cut")]
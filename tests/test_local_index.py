@@ -0,0 +1,55 @@
+import json
+import os
+
+import numpy as np
+
+from rag_pipeline.indexing.local_index import LocalIndex
+from rag_pipeline.indexing.qdrant_index import PointBatch
+
+DIM = 4
+TORN = b'{"op": "put", "row": 2, "id": "00000000-0000-0000-0000-0000000'
+
+
+def _points(n: int, start: int = 0) -> PointBatch:
+    rng = np.random.default_rng(start)
+    return PointBatch(
+        ids=[f"00000000-0000-0000-0000-{i:012d}" for i in range(start, start + n)],
+        vectors=rng.standard_normal((n, DIM), dtype=np.float32),
+        payloads=[{"doc_id": f"d{i}", "text": f"t{i}"} for i in range(start, start + n)],
+    )
+
+
+def _write(root: str, points: PointBatch) -> LocalIndex:
+    index = LocalIndex(root, "c")
+    index.ensure_collection(DIM)
+    index.upsert_batched(points, 16)
+    index.close()
+    return index
+
+
+def _texts(root: str, ids) -> list:
+    index = LocalIndex(root, "c")
+    return [p["payload"]["text"] for p in index.retrieve(collection="c", ids=ids)]
+
+
+def test_writer_trims_torn_tail_before_appending(tmp_path):
+    root = str(tmp_path)
+    _write(root, _points(2))
+    with open(os.path.join(root, "c", "rows.jsonl"), "ab") as f:
+        f.write(TORN)                       # crash mid-record
+
+    _write(root, _points(2, start=2))
+    with open(os.path.join(root, "c", "rows.jsonl"), "rb") as f:
+        assert [json.loads(line)["row"] for line in f] == [0, 1, 2, 3]
+    assert _texts(root, _points(4).ids) == ["t0", "t1", "t2", "t3"]
+
+
+def test_reader_skips_corrupt_line(tmp_path):
+    root = str(tmp_path)
+    index = _write(root, _points(2))
+    with open(os.path.join(root, "c", "rows.jsonl"), "ab") as f:
+        f.write(TORN + b"\n")               # torn tail a writer appended to before it was trimmed
+    index.ensure_collection(DIM)
+    index.upsert_batched(_points(1, start=2), 16)
+    index.close()
+    assert _texts(root, _points(3).ids) == ["t0", "t1", "t2"]
@@ -0,0 +1,93 @@
+import httpx
+import numpy as np
+import pytest
+
+from rag_pipeline.indexing.qdrant_index import PointBatch, QdrantIndex
+from rag_pipeline.tools.qdrant_stub import start_stub
+
+DIM = 4
+
+
+@pytest.fixture
+def stub():
+    # deferred: wait=false upserts stay queued until a wait=true update fences them
+    server, url = start_stub(deferred=True)
+    yield server.state, url
+    server.shutdown()
+
+
+def _points(n: int, start: int = 0) -> PointBatch:
+    rng = np.random.default_rng(start)
+    return PointBatch(
+        ids=[f"00000000-0000-0000-0000-{i:012d}" for i in range(start, start + n)],
+        vectors=rng.standard_normal((n, DIM), dtype=np.float32),
+        payloads=[{"doc_id": f"d{i % 7}"} for i in range(start, start + n)],
+    )
+
+
+def _applied(state, collection: str) -> int:
+    with state.lock:
+        return len(state.collections[collection]["points"])
+
+
+def test_barrier_applies_everything_submitted_before_it(stub):
+    state, url = stub
+    index = QdrantIndex(url, "fence", max_in_flight=4, wait=False)
+    report = index.ensure_collection(DIM)
+    assert report["layout"] == {"shard_number": 1, "replication_factor": 1}
+
+    tickets = [index.submit(_points(50, start=i * 50), 16) for i in range(6)]
+    for t in tickets:
+        t.result()
+    assert _applied(state, "fence") < 300   # acked, not yet applied
+
+    index.barrier()
+    assert _applied(state, "fence") == 300
+    index.close()
+
+
+def test_sharded_collection_forces_wait(stub):
+    state, url = stub
+    httpx.put(f"{url}/collections/sharded", json={"vectors": {"size": DIM, "distance": "Cosine"},
+                                                   "shard_number": 3}).raise_for_status()
+    index = QdrantIndex(url, "sharded", max_in_flight=4, wait=False)
+    report = index.ensure_collection(DIM)
+    assert report["layout"]["shard_number"] == 3
+    assert index.wait
+
+    index.submit(_points(100), 16).result()
+    assert _applied(state, "sharded") == 100   # every batch waited for
+    index.barrier()
+    index.close()
+
+
+def test_barrier_refuses_unfenced_sharded_upserts(stub):
+    state, url = stub
+    httpx.put(f"{url}/collections/sharded", json={"vectors": {"size": DIM, "distance": "Cosine"},
+                                                   "shard_number": 2}).raise_for_status()
+    index = QdrantIndex(url, "sharded", max_in_flight=2, wait=False)
+    index.submit(_points(40), 16).result()
+    with pytest.raises(RuntimeError, match="cannot be fenced"):
+        index.barrier()
+    index.close()
+
+
+def test_writes_retry_like_the_read_clients(monkeypatch):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if request.url.path == "/broken":
+            return httpx.Response(501)
+        if len(calls) == 1:
+            raise httpx.RemoteProtocolError("server disconnected", request=request)
+        return httpx.Response(200, json={"result": {}})
+
+    monkeypatch.setattr("rag_pipeline.indexing.qdrant_index.time.sleep", lambda s: None)
+    index = QdrantIndex("http://qdrant", "c", max_retries=3)
+    index._client = httpx.Client(transport=httpx.MockTransport(handler))
+    assert index._send("GET", "/ok") == ({"result": {}}, 1)
+    with pytest.raises(httpx.HTTPStatusError):
+        index._send("GET", "/broken")   # 501 fails the same way every time
+    assert calls == ["/ok", "/ok", "/broken"]
+    index.close()
@@ -0,0 +1,28 @@
+import json
+import os
+
+from rag_pipeline.retrieval import cache
+from rag_pipeline.retrieval.cache import latest_corpus_version
+
+
+def _write(path, doc, mtime):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(doc, f)
+    os.utime(path, (mtime, mtime))
+
+
+def test_newest_ingest_manifest_wins_over_eval_reports(tmp_path):
+    runs = str(tmp_path)
+    _write(os.path.join(runs, "run1.json"), {"docs_indexed": 3, "corpus_version": "v1"}, 1000)
+    _write(os.path.join(runs, "run2.json"), {"docs_indexed": 3, "corpus_version": "v2"}, 2000)
+    for i in range(30):   # newer than every manifest, and more of them than the scan reads
+        _write(os.path.join(runs, f"eval_{i}.json"), {"docs_indexed": 0, "corpus_version": "eval"}, 3000 + i)
+    assert latest_corpus_version(runs) == "v2"
+
+
+def test_manifest_removed_during_the_scan_is_skipped(tmp_path, monkeypatch):
+    runs = str(tmp_path)
+    _write(os.path.join(runs, "run1.json"), {"docs_indexed": 3, "corpus_version": "v1"}, 1000)
+    monkeypatch.setattr(cache.glob, "glob", lambda pattern: [os.path.join(runs, "gone.json"),
+                                                             os.path.join(runs, "run1.json")])
+    assert latest_corpus_version(runs) == "v1"
@@ -0,0 +1,58 @@
+import json
+import os
+import uuid
+
+from rag_pipeline.indexing import sparse_index
+from rag_pipeline.indexing.sparse_index import MERGE_FACTOR, SparseIndex
+
+
+def _fill(index: SparseIndex, n: int, start: int = 0) -> None:
+    for i in range(start, start + n):
+        index.add(f"d{i}", [str(uuid.UUID(int=i))], [f"common word{i}"])
+        index.flush()
+
+
+def _segment_dirs(root: str) -> set:
+    return {n for n in os.listdir(root) if n.startswith("seg_")}
+
+
+def test_merged_segments_outlive_the_swap(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    writer = SparseIndex(root)
+    _fill(writer, MERGE_FACTOR)
+    assert writer.merges == 1
+    assert len(_segment_dirs(root)) == MERGE_FACTOR + 1   # retired inputs kept for readers
+
+    monkeypatch.setattr(sparse_index, "GC_GRACE_S", 0.0)
+    _fill(writer, 1, start=MERGE_FACTOR)
+    assert len(_segment_dirs(root)) == 2
+    with open(os.path.join(root, "sparse.json"), "r", encoding="utf-8") as f:
+        assert json.load(f)["retired"] == {}
+
+
+def test_refresh_rereads_manifest_when_a_listed_segment_is_gone(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    meta_path = os.path.join(root, "sparse.json")
+    monkeypatch.setattr(sparse_index, "GC_GRACE_S", 0.0)
+    writer = SparseIndex(root)
+    _fill(writer, MERGE_FACTOR - 1)
+    with open(meta_path, "rb") as f:
+        before = f.read()
+    _fill(writer, 1, start=MERGE_FACTOR - 1)   # merges, then collects the inputs at once
+    with open(meta_path, "rb") as f:
+        after = f.read()
+
+    # a reader that read sparse.json just before the writer swapped it
+    with open(meta_path, "wb") as f:
+        f.write(before)
+    load = SparseIndex._load_segment
+
+    def swap_then_load(self, info):
+        with open(meta_path, "wb") as f:
+            f.write(after)
+        return load(self, info)
+
+    monkeypatch.setattr(SparseIndex, "_load_segment", swap_then_load)
+    reader = SparseIndex(root)
+    assert reader.search("common", 100) == writer.search("common", 100)
+    assert len(reader.search("common", 100)) == MERGE_FACTOR